@@ -0,0 +1,138 @@
+# accounting_app/account_tree.py
+"""
+تجميع الأرصدة على شجرة الحسابات (Account.parent)
+
+  - الشجرة كلها تنقرأ مرة وحدة مع أرصدتها (استعلام الميزان الواحد)
+  - الترتيب الطوبولوجي (أب قبل أبنائه) محفوظ بكاش حسب شكل الشجرة،
+    فما بينحسب من جديد إلا إذا تغيّر (id, parent_id, code) لأي حساب
+  - المجاميع تطلع من الأوراق للأب بالذاكرة (bottom-up) بدون أي استعلام إضافي
+
+كل عقدة dict فيها نفس مفاتيح trial_balance_rows (مجمّعة مع الأبناء) +:
+  level (1 = جذر), is_leaf, children (list عقد), root_type (نوع الحساب الجذر),
+  own_move_debit/own_move_credit/own_opening_balance (حركة الحساب نفسه فقط)
+"""
+from functools import lru_cache
+
+from .balances import ZERO, split_balance, trial_balance_rows
+
+
+@lru_cache(maxsize=8)
+def _tree_order(links):
+    """
+    links: tuple of (id, parent_id) مرتبة حسب code.
+    ترجع tuple of (id, level) بترتيب preorder (الأب ثم أبناؤه حسب code).
+    أي حساب أبوه مش موجود (أو داخل حلقة) بيعتبر جذر.
+    """
+    ids = {acc_id for acc_id, _p in links}
+    children = {}
+    roots = []
+    for acc_id, parent_id in links:
+        if parent_id in ids and parent_id != acc_id:
+            children.setdefault(parent_id, []).append(acc_id)
+        else:
+            roots.append(acc_id)
+
+    order = []
+    seen = set()
+
+    def walk(start):
+        stack = [(start, 1)]
+        while stack:
+            acc_id, level = stack.pop()
+            if acc_id in seen:
+                continue
+            seen.add(acc_id)
+            order.append((acc_id, level))
+            # reversed عشان يطلعوا من الـ stack حسب code
+            for child_id in reversed(children.get(acc_id, [])):
+                stack.append((child_id, level + 1))
+
+    for root_id in roots:
+        walk(root_id)
+
+    # حلقات parent (مش المفروض تصير): نعرضها كجذور بدل ما تختفي
+    for acc_id, _p in links:
+        if acc_id not in seen:
+            walk(acc_id)
+
+    return tuple(order)
+
+
+def account_tree(start_date=None, end_date=None, max_level=None, include_zero=False, rows=None):
+    """
+    ترجع list عقد بترتيب الشجرة (preorder) مع مجاميع كل فرع.
+
+    max_level: لو محدد، ما بيرجع إلا العقد لحد هذا المستوى
+               (مجموع المستوى N = كل اللي تحته)
+    include_zero: عرض الحسابات اللي مجموعها صفر (شجرة الحسابات مثلاً)
+    rows: نتيجة trial_balance_rows(..., include_zero=True) جاهزة (لو الـ view محتاجها كمان)
+    """
+    if rows is None:
+        rows = trial_balance_rows(start_date, end_date, include_zero=True)
+    by_id = {r["id"]: r for r in rows}
+
+    order = _tree_order(tuple((r["id"], r["parent_id"]) for r in rows))
+
+    nodes = {}
+    for acc_id, level in order:
+        r = by_id[acc_id]
+        nodes[acc_id] = dict(
+            r,
+            level=level,
+            children=[],
+            own_opening_balance=r["opening_balance"],
+            own_move_debit=r["move_debit"],
+            own_move_credit=r["move_credit"],
+        )
+
+    # ✅ bottom-up: عكس الـ preorder بيضمن إن كل الأبناء خلصوا قبل الأب
+    for acc_id, level in reversed(order):
+        node = nodes[acc_id]
+        parent = nodes.get(node["parent_id"]) if level > 1 else None
+        if parent is None:
+            continue
+        parent["opening_balance"] += node["opening_balance"]
+        parent["move_debit"] += node["move_debit"]
+        parent["move_credit"] += node["move_credit"]
+
+    result = []
+    for acc_id, level in order:
+        node = nodes[acc_id]
+        parent = nodes.get(node["parent_id"]) if level > 1 else None
+        node["root_type"] = parent["root_type"] if parent else node["account_type"]
+        node["closing_balance"] = node["opening_balance"] + node["move_debit"] - node["move_credit"]
+        node["opening_debit"], node["opening_credit"] = split_balance(node["opening_balance"])
+        node["closing_debit"], node["closing_credit"] = split_balance(node["closing_balance"])
+
+        is_zero = node["opening_balance"] == 0 and node["move_debit"] == 0 and node["move_credit"] == 0
+        if is_zero and not include_zero:
+            continue
+        if max_level and level > max_level:
+            continue
+        if parent is not None and parent.get("_shown"):
+            parent["children"].append(node)
+        node["_shown"] = True
+        result.append(node)
+
+    for node in result:
+        node["is_leaf"] = not node["children"]
+        del node["_shown"]
+
+    return result
+
+
+def tree_roots(nodes):
+    """العقد اللي مستواها 1 (للعرض المتداخل بالقالب)."""
+    return [n for n in nodes if n["level"] == 1]
+
+
+def section_total(nodes, root_type, key):
+    """
+    مجموع قسم (أصول/خصوم/...) من الجذور فقط (level 1)،
+    عشان ما نجمع الأب وأبناءه مرتين.
+    """
+    total = ZERO
+    for n in nodes:
+        if n["root_type"] == root_type and n["level"] == 1:
+            total += n[key]
+    return total
@@ -4,7 +4,8 @@ from django.utils.html import format_html
 from .models import (
     Account, AccountingPeriod, JournalEntry, JournalLine,
     Customer, Supplier, SalesInvoice, PurchaseInvoice,
-    AccountingConfig, DocumentSequence, OpeningBalance, Payment
+    AccountingConfig, DocumentSequence, OpeningBalance, Payment,
+    AccountPeriodBalance, ExportJob, PartyBalance,
 )
 
 # ==========================
@@ -246,6 +247,35 @@ class DocumentSequenceAdmin(admin.ModelAdmin):
     ordering = ("doc_type", "period")
 
 
+@admin.register(AccountPeriodBalance)
+class AccountPeriodBalanceAdmin(admin.ModelAdmin):
+    # جدول مشتق من القيود: للعرض فقط (يتعدل من الترحيل أو rebuild_balances)
+    list_display = ("account", "period", "debit_total", "credit_total", "line_count")
+    list_filter = ("period",)
+    search_fields = ("account__code", "account__name")
+    ordering = ("account__code",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PartyBalance)
+class PartyBalanceAdmin(admin.ModelAdmin):
+    # جدول مشتق من المستندات: للعرض فقط (يتعدل من الترحيل أو rebuild_party_balances)
+    list_display = ("customer", "supplier", "invoiced_total", "paid_total", "balance", "doc_count", "updated_at")
+    search_fields = ("customer__name", "supplier__name")
+    ordering = ("-balance",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # =========================
 # OpeningBalance + Payment (FIXED)
 # =========================
@@ -288,3 +318,20 @@ class PaymentAdmin(admin.ModelAdmin):
         return bool(obj.journal_entry_id)
     is_posted.boolean = True
     is_posted.short_description = "Posted"
+
+
+# =========================
+# Export jobs (قراءة فقط)
+# =========================
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "created_by", "created_at", "finished_at", "size")
+    list_filter = ("status", "kind")
+    readonly_fields = (
+        "kind", "params", "params_hash", "status", "created_by", "created_at",
+        "started_at", "finished_at", "filename", "content_type", "size", "error",
+    )
+    exclude = ("content",)
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,218 @@
+# accounting_app/aging.py
+"""
+أعمار الذمم (ذمم العملاء / مستحقات الموردين) لكل الأطراف دفعة وحدة
+
+استعلام SQL واحد:
+  1) لكل فاتورة: المجموع التراكمي لفواتير نفس الطرف (SUM OVER PARTITION BY ... ORDER BY date, id)
+  2) مجموع السندات لكل طرف (GROUP BY)
+  3) FIFO: السندات بتسدّد أقدم الفواتير أولاً، فالمفتوح من كل فاتورة =
+       min(الفاتورة، max(0، التراكمي - المدفوع))
+  4) كل فاتورة بتنزل بفئة عمرها (حدود الفئات تواريخ محسوبة بـ Python، فما في
+     دوال تاريخ خاصة بقاعدة البيانات) والنتيجة مجمّعة لكل طرف
+
+بس المستندات المرحّلة وغير المعكوسة (نفس PartyBalance.compute_from_documents)،
+فالمسودات والفواتير الملغية بقيد عكسي ما بتطلع مفتوحة.
+الطرف اللي دافع أكثر من فواتيره بيطلع عنده "دفعات زائدة" (رصيد له).
+المبالغ بالقروش (BIGINT) زي statements.py، فالنتيجة Decimal مضبوطة.
+"""
+import datetime
+import tempfile
+from decimal import Decimal
+
+from django.db import connection
+from openpyxl import Workbook
+
+from .models import Customer, Payment, PurchaseInvoice, SalesInvoice, Supplier
+from .statements import posted_sql
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+# (أقصى عمر بالأيام، العنوان) — آخر فئة مفتوحة
+BUCKETS = (
+    (30, "جاري (0-30)"),
+    (60, "31-60"),
+    (90, "61-90"),
+    (120, "91-120"),
+    (None, "+120"),
+)
+BUCKET_KEYS = ("current", "d60", "d90", "d120", "over120")
+
+AGING = {
+    "customer": {
+        "label": "أعمار ذمم العملاء",
+        "party_model": Customer,
+        "invoice_model": SalesInvoice,
+        "party_field": "customer_id",
+        "payment_type": Payment.RECEIPT,
+    },
+    "supplier": {
+        "label": "أعمار مستحقات الموردين",
+        "party_model": Supplier,
+        "invoice_model": PurchaseInvoice,
+        "party_field": "supplier_id",
+        "payment_type": Payment.DISBURSE,
+    },
+}
+
+SORTS = {
+    "name": lambda r: r["name"],
+    "total": lambda r: -r["balance"],
+    "over120": lambda r: -r["over120"],
+}
+
+EXCEL_HEADERS = ["الطرف"] + [label for _, label in BUCKETS] + ["إجمالي المفتوح", "دفعات زائدة", "الرصيد"]
+
+
+def _cents(expr):
+    return f"CAST(ROUND(({expr}) * 100) AS BIGINT)"
+
+
+def _from_cents(value):
+    return (Decimal(int(value or 0)) / 100).quantize(CENT)
+
+
+def _bucket_bounds(as_of):
+    """تاريخ أقدم فاتورة بكل فئة: الفاتورة بفئة i إذا date >= bounds[i] (والأقدم للفئة الأخيرة)."""
+    return [as_of - datetime.timedelta(days=days) for days, _ in BUCKETS if days is not None]
+
+
+def _aging_sql(spec):
+    qn = connection.ops.quote_name
+    inv = spec["invoice_model"]._meta
+    pay = Payment._meta
+    party = spec["party_model"]._meta
+    party_col = qn(spec["party_field"])
+
+    inv_date = qn(inv.get_field("date").column)
+    inv_total = qn(inv.get_field("total").column)
+    pay_amount = qn(pay.get_field("amount").column)
+    pay_date = qn(pay.get_field("date").column)
+    pay_type = qn(pay.get_field("payment_type").column)
+
+    # open_cents لكل فاتورة بعد FIFO
+    open_expr = (
+        "CASE WHEN i.cum - COALESCE(p.paid, 0) <= 0 THEN 0 "
+        "WHEN i.cum - COALESCE(p.paid, 0) >= i.total THEN i.total "
+        "ELSE i.cum - COALESCE(p.paid, 0) END"
+    )
+    bucket_cases = [
+        f"SUM(CASE WHEN i.idate >= %s THEN {open_expr} ELSE 0 END)",
+        f"SUM(CASE WHEN i.idate < %s AND i.idate >= %s THEN {open_expr} ELSE 0 END)",
+        f"SUM(CASE WHEN i.idate < %s AND i.idate >= %s THEN {open_expr} ELSE 0 END)",
+        f"SUM(CASE WHEN i.idate < %s AND i.idate >= %s THEN {open_expr} ELSE 0 END)",
+        f"SUM(CASE WHEN i.idate < %s THEN {open_expr} ELSE 0 END)",
+    ]
+
+    return f"""
+        WITH i AS (
+            SELECT {party_col} AS party, {inv_date} AS idate, {_cents(inv_total)} AS total,
+                   SUM({_cents(inv_total)}) OVER (
+                       PARTITION BY {party_col} ORDER BY {inv_date}, {qn(inv.pk.column)}
+                       ROWS UNBOUNDED PRECEDING
+                   ) AS cum
+            FROM {qn(inv.db_table)}
+            WHERE {inv_date} <= %s AND {posted_sql(inv)}
+        ),
+        p AS (
+            SELECT {party_col} AS party, SUM({_cents(pay_amount)}) AS paid
+            FROM {qn(pay.db_table)}
+            WHERE {pay_type} = %s AND {party_col} IS NOT NULL AND {pay_date} <= %s AND {posted_sql(pay)}
+            GROUP BY {party_col}
+        ),
+        a AS (
+            SELECT i.party AS party,
+                   {", ".join(bucket_cases)},
+                   SUM(i.total) AS invoiced,
+                   MAX(COALESCE(p.paid, 0)) AS paid
+            FROM i LEFT JOIN p ON p.party = i.party
+            GROUP BY i.party
+            UNION ALL
+            SELECT p.party, 0, 0, 0, 0, 0, 0, p.paid
+            FROM p WHERE NOT EXISTS (SELECT 1 FROM i WHERE i.party = p.party)
+        )
+        SELECT a.*, pt.{qn(party.get_field("name").column)}
+        FROM a JOIN {qn(party.db_table)} pt ON pt.{qn(party.pk.column)} = a.party
+    """
+
+
+def aging_rows(kind, as_of=None, include_settled=False):
+    """
+    list of dict لكل طرف: party_id, name, current, d60, d90, d120, over120,
+    open_total, unapplied (دفعات زائدة), balance (= open_total - unapplied)
+    include_settled=False: بيخفي الأطراف اللي رصيدها صفر.
+    """
+    spec = AGING[kind]
+    as_of = as_of or datetime.date.today()
+    b30, b60, b90, b120 = (d.isoformat() for d in _bucket_bounds(as_of))
+    params = [
+        as_of.isoformat(), False,
+        spec["payment_type"], as_of.isoformat(), False,
+        b30,
+        b30, b60,
+        b60, b90,
+        b90, b120,
+        b120,
+    ]
+
+    with connection.cursor() as cursor:
+        cursor.execute(_aging_sql(spec), params)
+        fetched = cursor.fetchall()
+
+    rows = []
+    for party_id, *buckets, invoiced, paid, name in fetched:
+        amounts = [_from_cents(v) for v in buckets]
+        open_total = sum(amounts, ZERO)
+        unapplied = max(ZERO, _from_cents(paid) - _from_cents(invoiced))
+        balance = open_total - unapplied
+        if not include_settled and not open_total and not unapplied:
+            continue
+        row = {"party_id": party_id, "name": name or ""}
+        row.update(zip(BUCKET_KEYS, amounts))
+        row.update(open_total=open_total, unapplied=unapplied, balance=balance)
+        rows.append(row)
+    return rows
+
+
+def aging_totals(rows):
+    totals = {key: ZERO for key in BUCKET_KEYS + ("open_total", "unapplied", "balance")}
+    for r in rows:
+        for key in totals:
+            totals[key] += r[key]
+    return totals
+
+
+def sort_rows(rows, sort):
+    return sorted(rows, key=SORTS.get(sort, SORTS["total"]))
+
+
+def write_aging_xlsx(fileobj, kind, as_of=None, sort="total"):
+    """Excel (write-only) على fileobj، ويرجع عدد الأطراف."""
+    as_of = as_of or datetime.date.today()
+    rows = sort_rows(aging_rows(kind, as_of), sort)
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Aging")
+    sheet.append([f"{AGING[kind]['label']} حتى {as_of.isoformat()}"])
+    sheet.append(EXCEL_HEADERS)
+
+    for r in rows:
+        sheet.append(
+            [r["name"]] + [r[key] for key in BUCKET_KEYS] + [r["open_total"], r["unapplied"], r["balance"]]
+        )
+
+    totals = aging_totals(rows)
+    sheet.append(
+        ["الإجمالي"] + [totals[key] for key in BUCKET_KEYS]
+        + [totals["open_total"], totals["unapplied"], totals["balance"]]
+    )
+    workbook.save(fileobj)
+    return len(rows)
+
+
+def aging_xlsx_tempfile(kind, as_of=None, sort="total"):
+    """ملف مؤقت جاهز للقراءة من أوله (بينحذف لحاله لما يتسكّر)."""
+    tmp = tempfile.TemporaryFile(suffix=".xlsx")
+    write_aging_xlsx(tmp, kind, as_of, sort)
+    tmp.seek(0)
+    return tmp
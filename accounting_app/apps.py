@@ -6,8 +6,20 @@ class AccountingAppConfig(AppConfig):
     name = "accounting_app"
 
     def ready(self):
+        from .models import connect_period_index_signals
+        from .pdf_toolkit import register_fonts
+        from .search import connect_signals
         from .seed_accounts import seed_accounts_if_empty
 
+        # ✅ الخط العربي للـ PDF مرة وحدة بالعملية (مش مع كل تصدير)
+        register_fonts()
+
+        # ✅ فهرس البحث الشامل بيتحدث مع كل حفظ/حذف
+        connect_signals()
+
+        # ✅ نسخة الفترات بتنقرأ مرة لكل طلب (برا الـ transactions)
+        connect_period_index_signals()
+
         def run_seed(sender, **kwargs):
             seed_accounts_if_empty()
 
@@ -0,0 +1,168 @@
+# accounting_app/balances.py
+"""
+محرك ميزان المراجعة (Trial Balance Engine)
+
+يحسب لكل الحسابات دفعة وحدة (استعلام واحد مجمّع):
+  - الافتتاحي: كل السطور قبل بداية الفترة
+  - الحركة: السطور داخل الفترة
+  - الختامي: الافتتاحي + الحركة
+
+بدل ما نعمل aggregate لكل حساب لحاله (N+1).
+كل القيم Decimal، والنتيجة مرتبة حسب Account.code.
+
+المصدر:
+  - AccountPeriodBalance (أرصدة جاهزة لكل حساب/فترة) إذا حدود التاريخ
+    منطبقة على حدود الفترات => O(حسابات × فترات) بدل مسح كل السطور
+  - وإلا JournalLine مباشرة (شرط تاريخ حر)
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Account, AccountingPeriod, AccountPeriodBalance
+
+ZERO = Decimal("0.00")
+
+
+def split_balance(balance):
+    """رصيد موقّع (مدين - دائن) -> (مدين, دائن)"""
+    if balance > 0:
+        return balance, ZERO
+    if balance < 0:
+        return ZERO, -balance
+    return ZERO, ZERO
+
+
+def _sum(path, condition):
+    return Coalesce(
+        Sum(path, filter=condition),
+        Value(ZERO),
+        output_field=DecimalField(max_digits=20, decimal_places=2),
+    )
+
+
+def can_use_balances(start_date=None, end_date=None):
+    """
+    هل نقدر نقرأ من AccountPeriodBalance بدل السطور؟
+    لازم: الفترات ما تتداخل، حدود التاريخ = حدود فترات،
+    وما في سطور خارج الفترات (period=None) لما في فلترة تاريخ.
+    """
+    if not start_date and not end_date:
+        # كل الحركات: المجموع صحيح مهما كان توزيع الفترات
+        return True
+
+    periods = list(AccountingPeriod.objects.order_by("start_date").values_list("start_date", "end_date"))
+    for (_s1, e1), (s2, _e2) in zip(periods, periods[1:]):
+        if s2 <= e1:
+            return False
+
+    if start_date and start_date not in {s for s, _e in periods}:
+        return False
+    if end_date and end_date not in {e for _s, e in periods}:
+        return False
+
+    return not AccountPeriodBalance.objects.filter(period__isnull=True).exclude(line_count=0).exists()
+
+
+def _line_conditions(start_date, end_date):
+    move_q = Q()
+    if start_date:
+        move_q &= Q(journalline__entry__date__gte=start_date)
+    if end_date:
+        move_q &= Q(journalline__entry__date__lte=end_date)
+    opening_q = Q(journalline__entry__date__lt=start_date) if start_date else None
+    return "journalline__debit", "journalline__credit", move_q, opening_q
+
+
+def _balance_conditions(start_date, end_date):
+    move_q = Q()
+    if start_date:
+        move_q &= Q(period_balances__period__start_date__gte=start_date)
+    if end_date:
+        move_q &= Q(period_balances__period__end_date__lte=end_date)
+    opening_q = Q(period_balances__period__end_date__lt=start_date) if start_date else None
+    return "period_balances__debit_total", "period_balances__credit_total", move_q, opening_q
+
+
+def trial_balance_rows(start_date=None, end_date=None, accounts=None, include_zero=False, use_balances=None):
+    """
+    ترجع list of dicts (حسب ترتيب code):
+      account, id, code, name, account_type, parent_id,
+      opening_balance, opening_debit, opening_credit,
+      move_debit, move_credit,
+      closing_balance, closing_debit, closing_credit
+
+    start_date/end_date اختيارية:
+      - بدون start_date: الافتتاحي = 0 والحركة من البداية
+      - بدون end_date: الحركة لحد آخر سطر
+    accounts: queryset اختياري لتقييد الحسابات (مثلاً إيرادات/مصاريف فقط)
+    use_balances: None = تلقائي، True/False لفرض المصدر
+    """
+    qs = accounts if accounts is not None else Account.objects.all()
+
+    if use_balances is None:
+        use_balances = can_use_balances(start_date, end_date)
+
+    conditions = _balance_conditions if use_balances else _line_conditions
+    debit_path, credit_path, move_q, opening_q = conditions(start_date, end_date)
+
+    annotations = {
+        "move_debit_sum": _sum(debit_path, move_q or None),
+        "move_credit_sum": _sum(credit_path, move_q or None),
+    }
+    if start_date:
+        annotations["opening_debit_sum"] = _sum(debit_path, opening_q)
+        annotations["opening_credit_sum"] = _sum(credit_path, opening_q)
+
+    qs = qs.annotate(**annotations).order_by("code")
+
+    rows = []
+    for acc in qs:
+        opening = ZERO
+        if start_date:
+            opening = acc.opening_debit_sum - acc.opening_credit_sum
+
+        move_debit = acc.move_debit_sum
+        move_credit = acc.move_credit_sum
+        closing = opening + move_debit - move_credit
+
+        # تجاهل الحسابات اللي صفر بالكامل
+        if not include_zero and opening == 0 and move_debit == 0 and move_credit == 0:
+            continue
+
+        opening_debit, opening_credit = split_balance(opening)
+        closing_debit, closing_credit = split_balance(closing)
+
+        rows.append({
+            "account": acc,
+            "id": acc.id,
+            "code": acc.code,
+            "name": acc.name,
+            "account_type": acc.account_type,
+            "parent_id": acc.parent_id,
+            "opening_balance": opening,
+            "opening_debit": opening_debit,
+            "opening_credit": opening_credit,
+            "move_debit": move_debit,
+            "move_credit": move_credit,
+            "closing_balance": closing,
+            "closing_debit": closing_debit,
+            "closing_credit": closing_credit,
+        })
+
+    return rows
+
+
+def trial_balance_totals(rows):
+    """مجاميع أعمدة ميزان المراجعة (Decimal)."""
+    keys = (
+        "opening_debit", "opening_credit",
+        "move_debit", "move_credit",
+        "closing_debit", "closing_credit",
+    )
+    totals = {k: ZERO for k in keys}
+    for r in rows:
+        for k in keys:
+            totals[k] += r[k]
+    return totals
@@ -0,0 +1,170 @@
+# accounting_app/cash_position.py
+"""
+مركز النقدية: كل حسابات الصندوق/البنوك بشاشة وحدة
+
+  - الحسابات: حساب النقدية بالإعدادات + كل أبناء أبوه (وأحفادهم)
+    + أي حساب مستعمل كـ Payment.cash_account
+  - استعلام واحد مجمّع: GROUP BY (الحساب، اليوم) لكل السطور لحد نهاية المدة،
+    واليوم بيصير NULL لكل شي قبل بدايتها (CASE) => نفس الاستعلام بيرجع
+    الرصيد الافتتاحي لكل حساب وحركة كل يوم
+  - الباقي بالذاكرة: مقبوضات/مدفوعات/ختامي لكل حساب، وسلسلة يومية
+    (كل الأيام، حتى اللي ما فيها حركة) برصيد متراكم
+
+مدين على حساب النقدية = قبض، دائن = صرف (زي cash_management).
+المبالغ بتنجمع بالقروش (BIGINT) زي statements.py، فالنتيجة Decimal مضبوطة.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import connection
+
+from .models import Account, AccountingConfig, JournalEntry, JournalLine, Payment
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+# أطول مدة للسلسلة اليومية (3 سنين تقريباً)
+MAX_DAYS = 1100
+
+
+def _cents(expr):
+    return f"CAST(ROUND(({expr}) * 100) AS BIGINT)"
+
+
+def _from_cents(value):
+    return (Decimal(int(value or 0)) / 100).quantize(CENT)
+
+
+def _grouped_sql(accounts, date_from, date_to):
+    """
+    (sql, params): SUM مدين/دائن بالقروش لكل (حساب، يوم)،
+    واليوم NULL لكل السطور قبل date_from (الرصيد الافتتاحي).
+    """
+    qn = connection.ops.quote_name
+    line = JournalLine._meta
+    entry = JournalEntry._meta
+    entry_date = f"e.{qn(entry.get_field('date').column)}"
+    account_col = f"l.{qn(line.get_field('account').column)}"
+    day = f"CASE WHEN {entry_date} < %s THEN NULL ELSE {entry_date} END"
+
+    sql = f"""
+        SELECT {account_col}, {day} AS day,
+               SUM({_cents(f"l.{qn(line.get_field('debit').column)}")}),
+               SUM({_cents(f"l.{qn(line.get_field('credit').column)}")})
+        FROM {qn(line.db_table)} l
+        JOIN {qn(entry.db_table)} e ON e.{qn(entry.pk.column)} = l.{qn(line.get_field('entry').column)}
+        WHERE {account_col} IN ({", ".join(["%s"] * len(accounts))}) AND {entry_date} <= %s
+        GROUP BY 1, 2
+    """
+    # ⚠️ GROUP BY بالترتيب مش بتكرار الـ CASE: مع ربط البارامترات بالسيرفر (PostgreSQL)
+    #    كل %s بيصير $n مختلف، فالتعبيرين ما بيعتبروا نفس التعبير
+    params = [date_from.isoformat(), *[a.id for a in accounts], date_to.isoformat()]
+    return sql, params
+
+
+def _descendants(roots, links):
+    """roots: ids، links: [(id, parent_id)] -> set فيها roots وكل أحفادهم."""
+    children = {}
+    for acc_id, parent_id in links:
+        children.setdefault(parent_id, []).append(acc_id)
+    found, stack = set(), list(roots)
+    while stack:
+        acc_id = stack.pop()
+        if acc_id in found:
+            continue
+        found.add(acc_id)
+        stack.extend(children.get(acc_id, ()))
+    return found
+
+
+def cash_accounts():
+    """
+    list of Account (حسب code) لحسابات الصندوق/البنوك.
+    بترجع [] إذا ما في حساب نقدية بالإعدادات ولا سندات مربوطة بحساب نقدية.
+    """
+    cfg = AccountingConfig.objects.select_related("cash_account").first()
+    cash = cfg.cash_account if cfg else None
+
+    roots = set(
+        Payment.objects.filter(cash_account__isnull=False)
+        .values_list("cash_account_id", flat=True).distinct()
+    )
+    if cash:
+        roots.add(cash.parent_id or cash.id)
+
+    links = list(Account.objects.values_list("id", "parent_id"))
+    ids = _descendants(roots, links)
+    if cash and cash.parent_id:
+        # الأب نفسه (مثلاً "النقدية وما في حكمها") مش حساب حركة
+        ids.discard(cash.parent_id)
+    return list(Account.objects.filter(id__in=ids).order_by("code"))
+
+
+def _days(date_from, date_to):
+    day = date_from
+    while day <= date_to:
+        yield day
+        day += datetime.timedelta(days=1)
+
+
+def cash_position(date_from, date_to, accounts=None):
+    """
+    يرجع dict:
+      accounts: [{"account", "id", "code", "name", "opening", "receipts", "disbursements", "closing"}, ...]
+      daily: [{"date", "receipts", "disbursements", "net", "balance"}, ...] (مجموع كل الحسابات)
+      totals: {"opening", "receipts", "disbursements", "closing"}
+    """
+    if accounts is None:
+        accounts = cash_accounts()
+    if not accounts or date_from > date_to:
+        return {"accounts": [], "daily": [], "totals": dict.fromkeys(("opening", "receipts", "disbursements", "closing"), ZERO)}
+
+    # ✅ استعلام واحد: الافتتاحي (day = NULL) + الحركة اليومية لكل حساب
+    per_account = {a.id: [0, 0, 0] for a in accounts}  # opening, receipts, disbursements (قروش)
+    per_day = {}
+    with connection.cursor() as cursor:
+        cursor.execute(*_grouped_sql(accounts, date_from, date_to))
+        for account_id, day, debit, credit in cursor.fetchall():
+            acc = per_account[account_id]
+            if day is None:
+                acc[0] += debit - credit
+                continue
+            acc[1] += debit
+            acc[2] += credit
+            if not isinstance(day, datetime.date):
+                day = datetime.date.fromisoformat(str(day))
+            d = per_day.setdefault(day, [0, 0])
+            d[0] += debit
+            d[1] += credit
+
+    rows = []
+    totals = dict.fromkeys(("opening", "receipts", "disbursements", "closing"), ZERO)
+    for a in accounts:
+        opening, receipts, disbursements = (_from_cents(v) for v in per_account[a.id])
+        closing = opening + receipts - disbursements
+        rows.append({
+            "account": a, "id": a.id, "code": a.code, "name": a.name,
+            "opening": opening,
+            "receipts": receipts,
+            "disbursements": disbursements,
+            "closing": closing,
+        })
+        totals["opening"] += opening
+        totals["receipts"] += receipts
+        totals["disbursements"] += disbursements
+        totals["closing"] += closing
+
+    daily = []
+    balance = totals["opening"]
+    for day in _days(date_from, date_to):
+        receipts, disbursements = (_from_cents(v) for v in per_day.get(day, (0, 0)))
+        balance += receipts - disbursements
+        daily.append({
+            "date": day,
+            "receipts": receipts,
+            "disbursements": disbursements,
+            "net": receipts - disbursements,
+            "balance": balance,
+        })
+
+    return {"accounts": rows, "daily": daily, "totals": totals}
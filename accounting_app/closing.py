@@ -0,0 +1,140 @@
+# accounting_app/closing.py
+"""
+إقفال الفترة المحاسبية (set-based)
+
+  - صافي كل حسابات الإيرادات/المصاريف داخل الفترة من استعلام الميزان الواحد
+    (trial_balance_rows، ومن AccountPeriodBalance إذا حدود الفترة مضبوطة)
+  - سطور قيد الإقفال بتنبني بالذاكرة وبتنكتب bulk_create، وأرصدة الفترة
+    بتتحدث بـ AccountPeriodBalance.bump_many (نفس طريقة posting.py)
+  - preview_closing(): نفس الحساب بدون أي كتابة (معاينة قبل الإقفال)
+
+كل حساب صافيه مش صفر بيتقفل بعكس رصيده:
+  إيراد دائن => مدين الإيراد، مصروف مدين => دائن المصروف
+  (وإذا الصافي معكوس، مثلاً مردودات أكبر من المبيعات، بيتقفل بالاتجاه الثاني)
+والفرق (صافي الربح/الخسارة) على حساب الأرباح المرحلة.
+"""
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .balances import trial_balance_rows
+from .models import Account, AccountingConfig, AccountPeriodBalance, JournalEntry, JournalLine
+
+ZERO = Decimal("0.00")
+
+NOTES = {
+    Account.REVENUE: "إقفال إيراد",
+    Account.EXPENSE: "إقفال مصروف",
+}
+
+
+def _closing_plan(period):
+    """
+    يرجع dict:
+      lines: [{"account", "debit", "credit", "note"}, ...] (آخر سطر الأرباح المرحلة)
+      total_income, total_expense, net_profit
+    """
+    cfg = AccountingConfig.get_config()
+    if not cfg.retained_earnings_account_id:
+        raise ValidationError("لا يوجد حساب الأرباح المرحلة داخل AccountingConfig.")
+
+    # اجمع الإيرادات/المصاريف داخل الفترة من القيود (استعلام واحد من محرك الميزان)
+    rows = trial_balance_rows(
+        period.start_date,
+        period.end_date,
+        accounts=Account.objects.filter(account_type__in=[Account.REVENUE, Account.EXPENSE]),
+    )
+
+    lines = []
+    total_income = ZERO
+    total_expense = ZERO
+    for r in rows:
+        # الرصيد المدين الصافي للحساب بالفترة => بنعكسه
+        net_debit = r["move_debit"] - r["move_credit"]
+        if net_debit == 0:
+            continue
+        if r["account_type"] == Account.REVENUE:
+            total_income -= net_debit
+        else:
+            total_expense += net_debit
+        lines.append({
+            "account": r["account"],
+            "debit": -net_debit if net_debit < 0 else ZERO,
+            "credit": net_debit if net_debit > 0 else ZERO,
+            "note": NOTES[r["account_type"]],
+        })
+
+    net_profit = total_income - total_expense
+
+    # إقفال على retained earnings: لو ربح => دائن، لو خسارة => مدين
+    if net_profit > 0:
+        lines.append({
+            "account": cfg.retained_earnings_account,
+            "debit": ZERO, "credit": net_profit, "note": "ترحيل صافي الربح للأرباح المرحلة",
+        })
+    elif net_profit < 0:
+        lines.append({
+            "account": cfg.retained_earnings_account,
+            "debit": -net_profit, "credit": ZERO, "note": "ترحيل صافي الخسارة للأرباح المرحلة",
+        })
+
+    return {
+        "lines": lines,
+        "total_income": total_income,
+        "total_expense": total_expense,
+        "net_profit": net_profit,
+    }
+
+
+def preview_closing(period):
+    """معاينة قيد الإقفال (بدون كتابة). بيرفع ValidationError إذا الإعدادات ناقصة."""
+    plan = _closing_plan(period)
+    plan["total_debit"] = sum((l["debit"] for l in plan["lines"]), ZERO)
+    plan["total_credit"] = sum((l["credit"] for l in plan["lines"]), ZERO)
+    return plan
+
+
+@transaction.atomic
+def close_period(period, user=None):
+    """
+    ينشئ قيد الإقفال (إذا في أرصدة) ويقفل الفترة.
+    يرجع (القيد أو None، plan).
+    """
+    period = type(period).objects.select_for_update().get(pk=period.pk)
+    if period.is_closed:
+        raise ValidationError("الفترة مقفلة مسبقًا.")
+
+    plan = _closing_plan(period)
+
+    je = None
+    if plan["lines"]:
+        # قيد الإقفال بتاريخ نهاية الفترة
+        je = JournalEntry.objects.create(
+            period=period,
+            date=period.end_date,
+            reference=f"CLOSE-{period.name}",
+            description=f"قيد إقفال الفترة {period.name}",
+            created_by=user,
+        )
+        JournalLine.objects.bulk_create(
+            [
+                JournalLine(entry=je, account=l["account"], debit=l["debit"], credit=l["credit"], note=l["note"])
+                for l in plan["lines"]
+            ],
+            batch_size=1000,
+        )
+
+        # السطور انكتبت بدون JournalLine.save => نحدّث الأرصدة دفعة وحدة
+        period_id = AccountPeriodBalance.period_id_for_date(je.date)
+        deltas = {}
+        for l in plan["lines"]:
+            d = deltas.setdefault((l["account"].id, period_id), [ZERO, ZERO, 0])
+            d[0] += l["debit"]
+            d[1] += l["credit"]
+            d[2] += 1
+        AccountPeriodBalance.bump_many(deltas)
+
+    period.is_closed = True
+    period.save(update_fields=["is_closed"])
+    return je, plan
@@ -0,0 +1,243 @@
+# accounting_app/export_jobs.py
+"""
+طابور التصدير بالخلفية (ExportJob)
+
+  - enqueue(): بيحط الطلب بالطابور، ولو نفس (kind + params) لنفس المستخدم موجود
+    بالانتظار/قيد التنفيذ بيرجع نفس الـ job (الملفات الجاهزة ما بتنعاد:
+    ممكن يكون انرحّل شي بعدها)
+  - visible_jobs(): كل مستخدم بيشوف/بينزّل jobs تبعه بس (الموظف is_staff بيشوف الكل)
+  - run_job(): بيشغّل نفس الـ view تبع التصدير (RequestFactory + نفس المستخدم)
+    وبيحفظ الملف الناتج، فما في منطق تصدير مكرر هون
+  - أمر run_export_worker بياخد الـ jobs من الطابور على threads
+"""
+import hashlib
+import json
+import re
+from urllib.parse import unquote
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import IntegrityError, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ExportJob
+
+MAX_ERROR_LENGTH = 2000
+
+# kind -> view + الباراميترات المسموحة
+#   url_kwargs: باراميترات بتنبعث للـ view كـ kwargs (زي customer_id)
+#   query: قيم ثابتة بتنضاف للـ GET (زي format=pdf)
+EXPORT_KINDS = {
+    "journal_pdf": {
+        "label": "القيود اليومية PDF",
+        "view": "accounting_app.views.export_journal_pdf",
+        "params": (),
+    },
+    "journal_excel": {
+        "label": "القيود اليومية Excel",
+        "view": "accounting_app.views.export_journal_excel",
+        "params": (),
+    },
+    "all_warehouses_pdf": {
+        "label": "مخزون كل المستودعات PDF",
+        "view": "inventory.views.export_all_warehouses_pdf",
+        "params": (),
+    },
+    "receipts_report_excel": {
+        "label": "تقرير سندات القبض Excel",
+        "view": "accounting_app.views.receipts_report_excel",
+        "params": ("from", "to", "customer", "cash_account"),
+    },
+    "disbursements_report_excel": {
+        "label": "تقرير سندات الصرف Excel",
+        "view": "accounting_app.views.disbursements_report_excel",
+        "params": ("from", "to", "supplier", "cash_account"),
+    },
+    "aging_excel": {
+        "label": "أعمار الذمم Excel",
+        "view": "accounting_app.views.aging_report",
+        "params": ("kind", "as_of", "sort"),
+        "query": {"format": "excel"},
+    },
+    "customer_statement_pdf": {
+        "label": "كشف حساب عميل PDF",
+        "view": "accounting_app.views.customer_statement",
+        "params": ("customer_id", "date_from", "date_to"),
+        "url_kwargs": ("customer_id",),
+        "query": {"format": "pdf"},
+    },
+    "supplier_statement_pdf": {
+        "label": "كشف حساب مورد PDF",
+        "view": "accounting_app.views.supplier_statement",
+        "params": ("supplier_id", "date_from", "date_to"),
+        "url_kwargs": ("supplier_id",),
+        "query": {"format": "pdf"},
+    },
+}
+
+
+def kind_label(kind):
+    spec = EXPORT_KINDS.get(kind)
+    return spec["label"] if spec else kind
+
+
+def clean_params(kind, raw):
+    """بس الباراميترات المسموحة لهذا النوع، كنصوص، بدون الفاضي."""
+    spec = EXPORT_KINDS[kind]
+    params = {}
+    for key in spec["params"]:
+        value = raw.get(key)
+        if value is None:
+            continue
+        value = str(value).strip()
+        if value:
+            params[key] = value
+    for key in spec.get("url_kwargs", ()):
+        if not str(params.get(key, "")).isdigit():
+            raise ValueError(f"الباراميتر {key} مطلوب")
+    return params
+
+
+def params_hash(kind, params, user_id=None):
+    # المستخدم جزء من البصمة: ملف مستخدم ما بيرجع لمستخدم ثاني طلب نفس التصدير
+    payload = json.dumps({"kind": kind, "params": params, "user": user_id}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _reusable(digest):
+    return (
+        ExportJob.objects.filter(params_hash=digest, status__in=ExportJob.ACTIVE_STATUSES)
+        .defer("content")
+        .order_by("-id")
+        .first()
+    )
+
+
+def enqueue(kind, raw_params, user=None):
+    """
+    يرجع (job, created).
+    created=False يعني في job بنفس الطلب بالطابور أو قيد التنفيذ.
+    """
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"نوع تصدير غير معروف: {kind}")
+    params = clean_params(kind, raw_params)
+    owner = user if getattr(user, "is_authenticated", False) else None
+    digest = params_hash(kind, params, owner.pk if owner else None)
+
+    while True:
+        existing = _reusable(digest)
+        if existing:
+            return existing, False
+
+        try:
+            with transaction.atomic():
+                job = ExportJob.objects.create(
+                    kind=kind,
+                    params=params,
+                    params_hash=digest,
+                    created_by=owner,
+                )
+            return job, True
+        except IntegrityError:
+            # request ثاني حطّ نفس الطلب بنفس اللحظة (exportjob_active_unique)
+            # => بنرجع الـ job تبعه، وإذا لحق يخلص بنحاول ننشئ من جديد
+            continue
+
+
+def visible_jobs(user):
+    """الـ jobs اللي بيقدر المستخدم يشوفها وينزّلها."""
+    jobs = ExportJob.objects.all()
+    if not user.is_staff:
+        jobs = jobs.filter(created_by=user)
+    return jobs
+
+
+def claim_next():
+    """ياخد أقدم job بالانتظار (UPDATE مشروط: worker واحد بس بينجح)."""
+    for job_id in ExportJob.objects.filter(status=ExportJob.PENDING).order_by("id").values_list("id", flat=True)[:20]:
+        claimed = ExportJob.objects.filter(id=job_id, status=ExportJob.PENDING).update(
+            status=ExportJob.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            return job_id
+    return None
+
+
+def requeue_stale(older_than):
+    """jobs علقت قيد التنفيذ (worker انقتل) بترجع للطابور."""
+    limit = timezone.now() - older_than
+    return ExportJob.objects.filter(status=ExportJob.RUNNING, started_at__lt=limit).update(
+        status=ExportJob.PENDING, started_at=None
+    )
+
+
+def purge_finished(older_than):
+    limit = timezone.now() - older_than
+    deleted, _ = ExportJob.objects.filter(
+        status__in=(ExportJob.DONE, ExportJob.FAILED), finished_at__lt=limit
+    ).delete()
+    return deleted
+
+
+def _response_filename(response, default):
+    disposition = response.get("Content-Disposition", "")
+    match = re.search(r"filename\*=utf-8''([^;]+)", disposition, re.IGNORECASE)
+    if match:
+        return unquote(match.group(1))
+    match = re.search(r'filename="?([^";]+)"?', disposition)
+    return match.group(1) if match else default
+
+
+def render_job(job):
+    """ينادي الـ view تبع التصدير ويرجع (filename, content_type, bytes)."""
+    spec = EXPORT_KINDS[job.kind]
+    view = import_string(spec["view"])
+
+    url_keys = spec.get("url_kwargs", ())
+    kwargs = {k: int(job.params[k]) for k in url_keys}
+    query = {k: v for k, v in job.params.items() if k not in url_keys}
+    query.update(spec.get("query", {}))
+
+    request = RequestFactory().get("/", data=query)
+    request.user = job.created_by or AnonymousUser()
+    # الـ view بيعرف إنه بالخلفية (بدون حدود الطلب المتزامن)
+    request.export_job = job
+
+    response = view(request, **kwargs)
+    if response.status_code != 200 or "Content-Disposition" not in response:
+        raise RuntimeError(f"التصدير ما رجع ملف (HTTP {response.status_code})")
+
+    if getattr(response, "streaming", False):
+        data = b"".join(response.streaming_content)
+    else:
+        data = response.content
+    response.close()
+
+    content_type = response.get("Content-Type", "application/octet-stream")
+    return _response_filename(response, f"{job.kind}_{job.id}"), content_type, data
+
+
+def run_job(job_id):
+    """يشغّل job (لازم تكون RUNNING من claim_next) ويحفظ النتيجة أو الخطأ."""
+    job = ExportJob.objects.select_related("created_by").get(id=job_id)
+    try:
+        filename, content_type, data = render_job(job)
+    except Exception as exc:  # noqa: BLE001
+        ExportJob.objects.filter(id=job.id).update(
+            status=ExportJob.FAILED,
+            error=f"{type(exc).__name__}: {exc}"[:MAX_ERROR_LENGTH],
+            finished_at=timezone.now(),
+        )
+        return False
+
+    ExportJob.objects.filter(id=job.id).update(
+        status=ExportJob.DONE,
+        filename=filename,
+        content_type=content_type,
+        content=data,
+        size=len(data),
+        error="",
+        finished_at=timezone.now(),
+    )
+    return True
@@ -1,5 +1,5 @@
 from django import forms
-from django.forms import inlineformset_factory, modelformset_factory
+from django.forms import BaseInlineFormSet, inlineformset_factory, modelformset_factory
 
 from .models import (
     JournalEntry, JournalLine, Account, AccountingPeriod,
@@ -158,8 +158,26 @@ class PurchaseItemForm(forms.ModelForm):
         }
 
 
-SalesItemFormSet = inlineformset_factory(SalesInvoice, SalesItem, form=SalesItemForm, extra=5, can_delete=True)
-PurchaseItemFormSet = inlineformset_factory(PurchaseInvoice, PurchaseItem, form=PurchaseItemForm, extra=5, can_delete=True)
+class BaseInvoiceItemFormSet(BaseInlineFormSet):
+    """
+    save() بيكتب كل البنود دفعة وحدة عبر invoice.save_items
+    (bulk_create/bulk_update + إجمالي واحد) بدل save لكل بند.
+    """
+
+    def save(self, commit=True):
+        instances = super().save(commit=False)
+        if commit:
+            self.instance.save_items(
+                new=self.new_objects,
+                changed=[obj for obj, _fields in self.changed_objects],
+                deleted=self.deleted_objects,
+                fields=list(self.form._meta.fields),
+            )
+        return instances
+
+
+SalesItemFormSet = inlineformset_factory(SalesInvoice, SalesItem, form=SalesItemForm, formset=BaseInvoiceItemFormSet, extra=5, can_delete=True)
+PurchaseItemFormSet = inlineformset_factory(PurchaseInvoice, PurchaseItem, form=PurchaseItemForm, formset=BaseInvoiceItemFormSet, extra=5, can_delete=True)
 
 
 class PaymentForm(forms.ModelForm):
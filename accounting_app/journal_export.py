@@ -0,0 +1,251 @@
+# accounting_app/journal_export.py
+"""
+تصدير القيود Excel/PDF بدون ما نحمّل كل شي بالذاكرة
+
+  - openpyxl write-only: كل سطر بينكتب ويتنسى (ما في خلايا محفوظة بالـ RAM)
+  - PDF: SimpleDocTemplate + جداول صغيرة (PDF_CHUNK_ROWS سطر) مع repeatRows،
+    فتكلفة التنسيق خطية بعدد السطور بدل جدول واحد ضخم بيتقسّم مرة بعد مرة،
+    و"صفحة X من Y" بـ form بينرسم مرة وحدة بالآخر (بدون تخزين كل الصفحات)
+  - السطور بتنقرأ values_list على دفعات keyset (entry_id تنازلي، id تصاعدي)
+    بدل JournalEntry + prefetch لكل السطور والحسابات
+  - الملف بينكتب على ملف مؤقت وبيتبعت للمتصفح على أجزاء (FileResponse)
+
+⚠️ DISABLE_SERVER_SIDE_CURSORS = True بالإعدادات، فـ .iterator() على PostgreSQL
+   كان رح يجيب النتيجة كلها مرة وحدة؛ الدفعات هون استعلامات منفصلة.
+"""
+import tempfile
+from decimal import Decimal
+
+from django.db.models import Q
+from django.utils import timezone
+from openpyxl import Workbook
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas as pdf_canvas
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+from .models import JournalLine
+from .pdf_toolkit import ar, arabic_font, arabic_style
+
+BATCH_SIZE = 5000
+
+HEADERS = ["الرقم المسلسل", "تاريخ المستند", "رقم الحساب", "اسم الحساب", "البيان", "مدين", "دائن"]
+
+LINE_FIELDS = (
+    "id", "entry_id",
+    "entry__serial_number", "entry__date",
+    "account__code", "account__name",
+    "note", "entry__description",
+    "debit", "credit",
+)
+
+
+def journal_line_rows(start_date=None, end_date=None, batch_size=BATCH_SIZE):
+    """
+    Generator: صف لكل سطر قيد (نفس أعمدة HEADERS)، الأحدث قيدًا أولاً.
+    كل دفعة = استعلام واحد "بعد آخر مفتاح" + LIMIT.
+    """
+    qs = JournalLine.objects.all()
+    if start_date:
+        qs = qs.filter(entry__date__gte=start_date)
+    if end_date:
+        qs = qs.filter(entry__date__lte=end_date)
+    qs = qs.order_by("-entry_id", "id").values_list(*LINE_FIELDS)
+
+    after = None
+    while True:
+        page = qs
+        if after:
+            last_entry, last_id = after
+            page = qs.filter(Q(entry_id__lt=last_entry) | Q(entry_id=last_entry, id__gt=last_id))
+        lines = list(page[:batch_size])
+        if not lines:
+            return
+
+        for line_id, entry_id, serial, date, code, name, note, description, debit, credit in lines:
+            yield [
+                serial,
+                date.strftime("%Y-%m-%d"),
+                code,
+                name,
+                note or description,
+                debit,
+                credit,
+            ]
+
+        if len(lines) < batch_size:
+            return
+        after = (lines[-1][1], lines[-1][0])
+
+
+def journal_line_count(start_date=None, end_date=None):
+    qs = JournalLine.objects.all()
+    if start_date:
+        qs = qs.filter(entry__date__gte=start_date)
+    if end_date:
+        qs = qs.filter(entry__date__lte=end_date)
+    return qs.count()
+
+
+def write_journal_xlsx(fileobj, start_date=None, end_date=None, batch_size=BATCH_SIZE):
+    """يكتب ملف xlsx (write-only) على fileobj ويرجع عدد السطور."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Journal Entries")
+
+    sheet.append(HEADERS)
+
+    count = 0
+    for row in journal_line_rows(start_date, end_date, batch_size=batch_size):
+        sheet.append(row)
+        count += 1
+
+    workbook.save(fileobj)
+    return count
+
+
+def journal_xlsx_tempfile(start_date=None, end_date=None, batch_size=BATCH_SIZE):
+    """ملف مؤقت جاهز للقراءة من أوله (بينحذف لحاله لما يتسكّر)."""
+    tmp = tempfile.TemporaryFile(suffix=".xlsx")
+    write_journal_xlsx(tmp, start_date, end_date, batch_size=batch_size)
+    tmp.seek(0)
+    return tmp
+
+
+# =========================
+# PDF
+# =========================
+PDF_CHUNK_ROWS = 300
+
+# ⚠️ حد أعلى للـ PDF جوا الطلب نفسه (~5000 سطر = ثواني)، والأكبر بيروح لطابور التصدير
+SYNC_PDF_MAX_LINES = 5000
+PAGE_COUNT_FORM = "journalPageCount"
+
+COMPANY_NAME = "مصنع المحبة للصناعات الغذائية"
+
+# نسب الأعمدة (نفس ترتيب HEADERS)
+PDF_COL_RATIOS = (0.08, 0.10, 0.09, 0.22, 0.29, 0.11, 0.11)
+
+
+class _PageCountCanvas(pdf_canvas.Canvas):
+    """
+    كل صفحة بتعمل doForm(PAGE_COUNT_FORM) مكان "Y"، وبالآخر (save)
+    بنعرّف الـ form مرة وحدة بعدد الصفحات الحقيقي.
+    """
+    font_name = "Helvetica"
+
+    def save(self):
+        total_pages = self.getPageNumber() - 1
+        self.beginForm(PAGE_COUNT_FORM)
+        self.setFont(self.font_name, 9)
+        self.drawRightString(0, 0, str(total_pages))
+        self.endForm()
+        super().save()
+
+
+def _money(value):
+    return f"{value:,.2f}" if value else "-"
+
+
+def _pdf_table(data, col_widths, with_total=False):
+    table = Table(data, colWidths=col_widths, repeatRows=1, hAlign="CENTER")
+    style = [
+        ("FONTNAME", (0, 0), (-1, -1), arabic_font()),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E6E6E6")),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("TOPPADDING", (0, 0), (-1, -1), 2),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+    ]
+    if with_total:
+        style.append(("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#F1F1F1")))
+    table.setStyle(TableStyle(style))
+    return table
+
+
+def write_journal_pdf(fileobj, rows=None, start_date=None, end_date=None, chunk_rows=PDF_CHUNK_ROWS):
+    """
+    يكتب PDF القيود على fileobj ويرجع عدد السطور.
+    rows: صفوف بنفس أعمدة HEADERS (الافتراضي journal_line_rows من الداتابيس)
+    """
+    if rows is None:
+        rows = journal_line_rows(start_date, end_date)
+
+    font_name = arabic_font()
+    page_w, page_h = landscape(A4)
+    margin = 24
+    doc = SimpleDocTemplate(
+        fileobj,
+        pagesize=(page_w, page_h),
+        leftMargin=margin, rightMargin=margin, topMargin=60, bottomMargin=36,
+        title="Journal Entries",
+    )
+    col_widths = [doc.width * r for r in PDF_COL_RATIOS]
+
+    header_style = arabic_style(10, alignment=1, leading=12)
+    text_style = arabic_style(9, alignment=1, leading=11)
+    header_row = [Paragraph(ar(h), header_style) for h in HEADERS]
+
+    printed = ar(f"تاريخ الطباعة: {timezone.localtime(timezone.now()).strftime('%Y-%m-%d %H:%M')}")
+    company = ar(COMPANY_NAME)
+
+    def on_page(canvas, doc_):
+        canvas.saveState()
+        canvas.setFont(font_name, 14)
+        canvas.drawCentredString(page_w / 2, page_h - 30, company)
+        canvas.setFont(font_name, 10)
+        canvas.drawCentredString(page_w / 2, page_h - 46, printed)
+
+        # "صفحة X من" + Y (form) على يسارها
+        canvas.setFont(font_name, 9)
+        label = ar(f"صفحة {doc_.page} من")
+        right_x = page_w - margin
+        canvas.drawRightString(right_x, 18, label)
+        canvas.translate(right_x - canvas.stringWidth(label, font_name, 9) - 3, 18)
+        canvas.doForm(PAGE_COUNT_FORM)
+        canvas.restoreState()
+
+    def make_canvas(*args, **kwargs):
+        c = _PageCountCanvas(*args, **kwargs)
+        c.font_name = font_name
+        return c
+
+    elements = []
+    chunk = [header_row]
+    total_debit = Decimal("0")
+    total_credit = Decimal("0")
+    count = 0
+
+    for serial, date, code, name, note, debit, credit in rows:
+        debit = debit or Decimal("0")
+        credit = credit or Decimal("0")
+        total_debit += debit
+        total_credit += credit
+        count += 1
+        # أرقام/تواريخ نص عادي (أسرع بكثير من Paragraph)، والنصوص اللي ممكن تلتف Paragraph
+        chunk.append([
+            str(serial or ""),
+            date,
+            str(code or ""),
+            Paragraph(ar(name), text_style),
+            Paragraph(ar(note), text_style),
+            _money(debit),
+            _money(credit),
+        ])
+        if len(chunk) > chunk_rows:
+            elements.append(_pdf_table(chunk, col_widths))
+            chunk = [header_row]
+
+    chunk.append(["", "", "", "", Paragraph(ar("الإجمالي"), header_style), _money(total_debit), _money(total_credit)])
+    elements.append(_pdf_table(chunk, col_widths, with_total=True))
+
+    doc.build(elements, onFirstPage=on_page, onLaterPages=on_page, canvasmaker=make_canvas)
+    return count
+
+
+def journal_pdf_tempfile(start_date=None, end_date=None):
+    tmp = tempfile.TemporaryFile(suffix=".pdf")
+    write_journal_pdf(tmp, start_date=start_date, end_date=end_date)
+    tmp.seek(0)
+    return tmp
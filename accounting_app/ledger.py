@@ -0,0 +1,172 @@
+# accounting_app/ledger.py
+"""
+دفتر الأستاذ بصفحات (keyset / cursor pagination)
+
+الترتيب ثابت: (entry.date, entry.id, line.id)
+كل صفحة = استعلام واحد: "بعد آخر مفتاح" + LIMIT حجم الصفحة،
+بدل OFFSET أو قص أول 2000 سطر وتحميل الباقي بالذاكرة.
+
+الـ cursor موقّع (django.core.signing) وفيه:
+  - آخر مفتاح (date, entry_id, line_id)
+  - الرصيد الجاري لحد آخر سطر بالصفحة
+  - الرصيد الافتتاحي ومجاميع الفترة (بينحسبوا مرة وحدة بأول صفحة)
+  - الفلاتر (حساب/تاريخ) عشان ما ينستعمل cursor مع فلاتر ثانية
+"""
+import datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import Count, Q, Sum
+
+from .models import JournalLine
+
+ZERO = Decimal("0.00")
+CURSOR_SALT = "accounting_app.ledger"
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 5000
+
+LINE_FIELDS = (
+    "id", "debit", "credit", "note",
+    "entry_id", "entry__date", "entry__serial_number", "entry__reference", "entry__description",
+    "account__code", "account__name",
+)
+
+
+def clamp_page_size(value):
+    try:
+        size = int(value or DEFAULT_PAGE_SIZE)
+    except (TypeError, ValueError):
+        size = DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(state):
+    return signing.dumps(state, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    """يرجع dict أو None إذا الـ cursor فاضي/معدّل."""
+    if not token:
+        return None
+    try:
+        return signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+
+
+def _filters_key(account_id, start_date, end_date):
+    return [
+        str(account_id or ""),
+        start_date.isoformat() if start_date else "",
+        end_date.isoformat() if end_date else "",
+    ]
+
+
+def _base_lines(account_id, start_date, end_date):
+    qs = JournalLine.objects.all()
+    if account_id:
+        qs = qs.filter(account_id=account_id)
+    if start_date:
+        qs = qs.filter(entry__date__gte=start_date)
+    if end_date:
+        qs = qs.filter(entry__date__lte=end_date)
+    return qs
+
+
+def _first_state(account_id, start_date, end_date):
+    """أول صفحة: الافتتاحي + مجاميع الفترة (مرة وحدة، تنحمل بالـ cursor بعدها)."""
+    opening = ZERO
+    if account_id and start_date:
+        s = JournalLine.objects.filter(
+            account_id=account_id, entry__date__lt=start_date
+        ).aggregate(d=Sum("debit"), c=Sum("credit"))
+        opening = (s["d"] or ZERO) - (s["c"] or ZERO)
+
+    t = _base_lines(account_id, start_date, end_date).aggregate(
+        d=Sum("debit"), c=Sum("credit"), n=Count("id")
+    )
+
+    return {
+        "filters": _filters_key(account_id, start_date, end_date),
+        "after": None,
+        "page": 1,
+        "opening": str(opening),
+        "running": str(opening),
+        "total_debit": str(t["d"] or ZERO),
+        "total_credit": str(t["c"] or ZERO),
+        "line_count": t["n"] or 0,
+    }
+
+
+def ledger_page(account_id=None, start_date=None, end_date=None, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    ترجع dict:
+      rows (dicts فيها balance للحساب الواحد), next_cursor (أو None),
+      page, opening_balance, total_debit, total_credit, line_count
+
+    cursor: نص من next_cursor لصفحة سابقة (بنفس الفلاتر)، وإلا بنبدأ من الأول.
+    """
+    state = decode_cursor(cursor)
+    if not state or state.get("filters") != _filters_key(account_id, start_date, end_date):
+        state = _first_state(account_id, start_date, end_date)
+
+    qs = _base_lines(account_id, start_date, end_date)
+
+    after = state["after"]
+    if after:
+        last_date = datetime.date.fromisoformat(after[0])
+        last_entry, last_line = after[1], after[2]
+        qs = qs.filter(
+            Q(entry__date__gt=last_date)
+            | Q(entry__date=last_date, entry_id__gt=last_entry)
+            | Q(entry__date=last_date, entry_id=last_entry, id__gt=last_line)
+        )
+
+    # ✅ سطر زيادة عشان نعرف إذا في صفحة بعدها بدون COUNT
+    lines = list(
+        qs.order_by("entry__date", "entry_id", "id").values(*LINE_FIELDS)[:page_size + 1]
+    )
+    has_next = len(lines) > page_size
+    lines = lines[:page_size]
+
+    running = Decimal(state["running"])
+    rows = []
+    for line in lines:
+        debit = line["debit"] or ZERO
+        credit = line["credit"] or ZERO
+        running += debit - credit
+        rows.append({
+            "line_id": line["id"],
+            "date": line["entry__date"],
+            "entry_serial": line["entry__serial_number"] or line["entry_id"],
+            "entry_id": line["entry_id"],
+            "reference": line["entry__reference"] or "-",
+            "description": line["entry__description"],
+            "account_code": line["account__code"],
+            "account_name": line["account__name"],
+            "note": line["note"] or "",
+            "debit": debit,
+            "credit": credit,
+            "balance": running,
+        })
+
+    next_cursor = None
+    if has_next:
+        last = lines[-1]
+        next_cursor = encode_cursor(dict(
+            state,
+            after=[last["entry__date"].isoformat(), last["entry_id"], last["id"]],
+            page=state["page"] + 1,
+            running=str(running),
+        ))
+
+    return {
+        "rows": rows,
+        "next_cursor": next_cursor,
+        "page": state["page"],
+        "opening_balance": Decimal(state["opening"]),
+        "total_debit": Decimal(state["total_debit"]),
+        "total_credit": Decimal(state["total_credit"]),
+        "line_count": state["line_count"],
+    }
@@ -0,0 +1,84 @@
+import datetime
+import io
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from accounting_app.aging import aging_rows, write_aging_xlsx
+from accounting_app.models import Customer, Payment, SalesInvoice
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'قياس تقرير أعمار الذمم على بيانات تجريبية (بترجع rollback بالآخر، ما بتنحفظ)'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=10000, help="عدد العملاء")
+        parser.add_argument("--invoices", type=int, default=10, help="فواتير لكل عميل")
+        parser.add_argument("--payments", type=int, default=4, help="سندات قبض لكل عميل")
+        parser.add_argument("--days", type=int, default=365, help="مدى تواريخ الفواتير (أيام قبل اليوم)")
+
+    def _seed(self, customers, invoices, payments, days):
+        rnd = random.Random(17)
+        today = datetime.date.today()
+
+        Customer.objects.bulk_create(
+            [Customer(name=f"عميل تجريبي {i}") for i in range(customers)], batch_size=2000
+        )
+        ids = list(Customer.objects.order_by("-id").values_list("id", flat=True)[:customers])
+
+        def day():
+            return today - datetime.timedelta(days=rnd.randint(0, days))
+
+        def amount():
+            return Decimal(rnd.randint(100, 500000)) / 100
+
+        SalesInvoice.objects.bulk_create(
+            [SalesInvoice(customer_id=c, date=day(), total=amount()) for c in ids for _ in range(invoices)],
+            batch_size=5000,
+        )
+        Payment.objects.bulk_create(
+            [
+                Payment(payment_type=Payment.RECEIPT, customer_id=c, date=day(), amount=amount())
+                for c in ids for _ in range(payments)
+            ],
+            batch_size=5000,
+        )
+
+    def handle(self, *args, **options):
+        customers = max(1, options["customers"])
+        invoices = max(1, options["invoices"])
+        payments = max(0, options["payments"])
+
+        self.stdout.write(
+            f"قاعدة البيانات: {connection.vendor} | عملاء: {customers} | "
+            f"فواتير: {customers * invoices} | سندات: {customers * payments}"
+        )
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                self._seed(customers, invoices, payments, max(1, options["days"]))
+                self.stdout.write(f"تجهيز البيانات: {time.perf_counter() - started:.1f} s")
+
+                started = time.perf_counter()
+                rows = aging_rows("customer")
+                report_s = time.perf_counter() - started
+                self.stdout.write(f"aging_rows: {report_s:.2f} s | أطراف برصيد: {len(rows)}")
+
+                started = time.perf_counter()
+                buffer = io.BytesIO()
+                write_aging_xlsx(buffer, "customer")
+                self.stdout.write(
+                    f"Excel: {time.perf_counter() - started:.2f} s | {len(buffer.getvalue()) / 1024:.0f} KB"
+                )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("✅ خلص (البيانات التجريبية انحذفت)"))
@@ -0,0 +1,152 @@
+import io
+import re
+import resource
+import tempfile
+import time
+from decimal import Decimal
+
+import arabic_reshaper
+from bidi.algorithm import get_display
+from django.core.management.base import BaseCommand
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+from accounting_app import pdf_toolkit
+from accounting_app.journal_export import write_journal_pdf
+
+
+class Command(BaseCommand):
+    help = 'قياس زمن PDF قيود كبير (الطريقة القديمة مقابل pdf_toolkit: خط مسجّل + كاش _ar + styles مشتركة)'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000, help="عدد سطور القيود بالتقرير")
+        parser.add_argument("--accounts", type=int, default=70, help="عدد أسماء الحسابات المختلفة")
+        parser.add_argument(
+            "--paged",
+            action="store_true",
+            help="قياس export_journal_pdf الجديد (صفحات + جداول صغيرة) على rows/10 و rows سطر",
+        )
+
+    def _rows(self, count, accounts):
+        names = [f"حساب رقم {i} - ذمم ومصاريف" for i in range(accounts)]
+        notes = [f"قيد فاتورة مبيعات رقم {i}" for i in range(max(1, count // 4))]
+        for i in range(count):
+            debit = Decimal(i % 997) + Decimal("0.25") if i % 2 == 0 else Decimal("0.00")
+            credit = Decimal("0.00") if i % 2 == 0 else Decimal(i % 997) + Decimal("0.25")
+            yield {
+                "serial": i // 2 + 1,
+                "date": "2025-01-15",
+                "code": str(1000 + i % accounts),
+                "name": names[i % accounts],
+                "note": notes[(i // 2) % len(notes)],
+                "debit": debit,
+                "credit": credit,
+            }
+
+    def _legacy_toolkit(self):
+        """نفس اللي كانت تعمله كل view: registerFont + getSampleStyleSheet + reshape لكل خلية."""
+        font_path = pdf_toolkit._font_candidates()
+        font_name = "Helvetica"
+        for path in font_path:
+            try:
+                pdfmetrics.registerFont(TTFont("AR_BENCH", path))
+                font_name = "AR_BENCH"
+                break
+            except Exception:
+                continue
+
+        def ar(txt):
+            return get_display(arabic_reshaper.reshape(str(txt or "")))
+
+        styles = getSampleStyleSheet()
+        cell = ParagraphStyle("cell_ar", parent=styles["Normal"], fontName=font_name, fontSize=11, alignment=1)
+        return font_name, ar, cell
+
+    def _shared_toolkit(self):
+        return pdf_toolkit.arabic_font(), pdf_toolkit.ar, pdf_toolkit.arabic_style(11, alignment=1)
+
+    def _build(self, rows, font_name, ar, cell):
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), leftMargin=24, rightMargin=24, topMargin=40, bottomMargin=30)
+
+        headers = ["رقم القيد", "التاريخ", "رمز الحساب", "اسم الحساب", "البيان", "مدين", "دائن"]
+        data = [[Paragraph(ar(h), cell) for h in headers]]
+
+        shape_s = 0.0
+        for r in rows:
+            started = time.perf_counter()
+            texts = [
+                ar(r["serial"]), ar(r["date"]), ar(r["code"]), ar(r["name"]), ar(r["note"]),
+                ar(f"{r['debit']:.2f}"), ar(f"{r['credit']:.2f}"),
+            ]
+            shape_s += time.perf_counter() - started
+            data.append([Paragraph(t, cell) for t in texts])
+
+        table = Table(data, repeatRows=1)
+        table.setStyle(TableStyle([
+            ("FONTNAME", (0, 0), (-1, -1), font_name),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ]))
+        doc.build([table])
+        return shape_s, len(buffer.getvalue())
+
+    def _run(self, label, make, rows):
+        started = time.perf_counter()
+        font_name, ar, cell = make()
+        setup_s = time.perf_counter() - started
+
+        shape_s, size = self._build(rows, font_name, ar, cell)
+        total_s = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{label}: الإعداد {setup_s * 1000:.1f} ms | العربي {shape_s * 1000:.1f} ms | "
+            f"الكل {total_s:.2f} s | الحجم {size / 1024:.0f} KB"
+        )
+        return total_s
+
+    def _run_paged(self, rows):
+        line_rows = (
+            [r["serial"], r["date"], r["code"], r["name"], r["note"], r["debit"], r["credit"]]
+            for r in rows
+        )
+        started = time.perf_counter()
+        with tempfile.TemporaryFile() as tmp:
+            write_journal_pdf(tmp, rows=line_rows)
+            elapsed = time.perf_counter() - started
+            size = tmp.tell()
+            tmp.seek(0)
+            pages = len(re.findall(rb"/Type /Page\b(?!s)", tmp.read()))
+
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(
+            f"سطور {len(rows)}: {elapsed:.2f} s | {pages} صفحة | {size / 1024 / 1024:.1f} MB | "
+            f"{len(rows) / elapsed:.0f} سطر/ثانية | أعلى RSS {peak_mb:.0f} MB"
+        )
+        return elapsed
+
+    def handle(self, *args, **options):
+        rows = list(self._rows(max(1, options["rows"]), max(1, options["accounts"])))
+
+        if options["paged"]:
+            self.stdout.write(f"PDF القيود بصفحات | الخط: {pdf_toolkit.arabic_font()}")
+            small = self._run_paged(rows[:max(1, len(rows) // 10)])
+            full = self._run_paged(rows)
+            self.stdout.write(self.style.SUCCESS(f"✅ نسبة الزمن (×10 سطور): {full / small:.1f}x"))
+            return
+
+        self.stdout.write(f"سطور: {len(rows)} | الخط: {pdf_toolkit.arabic_font()}")
+
+        pdf_toolkit._shape.cache_clear()
+        legacy = self._run("القديم ", self._legacy_toolkit, rows)
+        shared = self._run("المشترك (أول مرة)", self._shared_toolkit, rows)
+        warm = self._run("المشترك (كاش دافي)", self._shared_toolkit, rows)
+
+        info = pdf_toolkit._shape.cache_info()
+        self.stdout.write(f"كاش _ar: hits={info.hits} misses={info.misses} size={info.currsize}/{info.maxsize}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ التسريع: {legacy / shared:.2f}x (أول مرة) | {legacy / warm:.2f}x (كاش دافي)"
+        ))
@@ -0,0 +1,97 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+
+from accounting_app.models import DocumentSequence
+
+BENCH_DOC_TYPE = "BENCH"
+
+
+class Command(BaseCommand):
+    help = 'قياس سرعة حجز أرقام المستندات (DocumentSequence) مع عدة مرحّلين بنفس الوقت'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=16, help="عدد المرحّلين المتوازيين")
+        parser.add_argument("--count", type=int, default=200, help="عدد المستندات لكل مرحّل")
+        parser.add_argument("--block", type=int, default=1, help="حجم الـ block لكل حجز (1 = next عادي)")
+        parser.add_argument(
+            "--work-ms",
+            type=float,
+            default=2.0,
+            help="زمن شغل وهمي داخل الـ transaction بعد الحجز (محاكاة حفظ القيد)",
+        )
+
+    def _worker(self, count, block, work_s, numbers, errors):
+        try:
+            done = 0
+            while done < count:
+                n = min(block, count - done)
+                with transaction.atomic():
+                    first = DocumentSequence.next_block(BENCH_DOC_TYPE, n=n)
+                    if work_s:
+                        time.sleep(work_s)
+                numbers.extend(range(first, first + n))
+                done += n
+        except Exception as exc:  # noqa: BLE001
+            errors.append(repr(exc))
+        finally:
+            connections.close_all()
+
+    def _cleanup(self):
+        DocumentSequence.objects.filter(doc_type=BENCH_DOC_TYPE).delete()
+        if DocumentSequence._use_native():
+            name = DocumentSequence._native_name(BENCH_DOC_TYPE)
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP SEQUENCE IF EXISTS {name}")
+            DocumentSequence._native_ready.discard(name)
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        count = max(1, options["count"])
+        block = max(1, options["block"])
+        work_s = max(0.0, options["work_ms"]) / 1000
+
+        if connection.vendor == "sqlite":
+            # ⚠️ SQLite بيقفل الملف كله للكتابة: threads ورا قفل واحد ما بتقيس أي تنافس،
+            #    فبنشغّل نفس العدد الكلي على مرحّل واحد (رقم أساس تسلسلي بس)
+            self.stdout.write(self.style.WARNING(
+                "⚠️ SQLite: بدون threads (كاتب واحد). الرقم أساس تسلسلي وما بيقول شي عن التنافس، "
+                "القياس الحقيقي على PostgreSQL"
+            ))
+            count *= workers
+            workers = 1
+
+        mode = "SEQUENCE أصلي" if DocumentSequence._use_native() else "جدول + select_for_update"
+        self.stdout.write(
+            f"قاعدة البيانات: {connection.vendor} | الطريقة: {mode} | "
+            f"مرحّلين: {workers} × {count} | block: {block} | شغل: {work_s * 1000:.1f} ms"
+        )
+
+        self._cleanup()
+
+        numbers, errors = [], []
+        threads = [
+            threading.Thread(target=self._worker, args=(count, block, work_s, numbers, errors))
+            for _ in range(workers)
+        ]
+
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        self._cleanup()
+
+        duplicates = len(numbers) - len(set(numbers))
+        self.stdout.write(f"المستندات: {len(numbers)} | الزمن: {elapsed:.2f} s | السرعة: {len(numbers) / elapsed:.0f} مستند/ثانية")
+
+        if errors:
+            self.stdout.write(self.style.ERROR(f"أخطاء: {len(errors)} (أول خطأ: {errors[0]})"))
+        if duplicates:
+            self.stdout.write(self.style.ERROR(f"❌ أرقام مكررة: {duplicates}"))
+        elif not errors:
+            self.stdout.write(self.style.SUCCESS("✅ كل الأرقام فريدة"))
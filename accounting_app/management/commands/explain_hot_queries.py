@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+
+from accounting_app.balances import trial_balance_rows
+from accounting_app.models import Account, JournalLine, Payment, SalesInvoice
+from inventory.models import StockLayer
+
+
+class Command(BaseCommand):
+    help = 'عرض خطط التنفيذ (EXPLAIN) وزمن أهم استعلامات الدفاتر للتأكد إن الفهارس مستخدمة'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Postgres فقط: EXPLAIN ANALYZE (بينفّذ الاستعلام فعليًا)",
+        )
+
+    def _queries(self):
+        account = Account.objects.filter(journalline__isnull=False).order_by("code").first()
+        line = JournalLine.objects.select_related("entry").order_by("-id").first()
+        invoice = SalesInvoice.objects.order_by("-id").first()
+        payment = Payment.objects.exclude(customer__isnull=True).order_by("-id").first()
+        layer = StockLayer.objects.order_by("-id").first()
+
+        the_date = line.entry.date if line else None
+        account_id = account.id if account else 0
+
+        yield "دفتر أستاذ (حساب + فترة)", JournalLine.objects.filter(
+            account_id=account_id,
+            entry__date__gte=the_date or "2000-01-01",
+            entry__date__lte=the_date or "2000-01-01",
+        ).order_by("entry__date", "entry_id", "id")[:200]
+
+        yield "رصيد افتتاحي لحساب", JournalLine.objects.filter(
+            account_id=account_id, entry__date__lt=the_date or "2000-01-01",
+        ).values("account_id").annotate(d=Sum("debit"), c=Sum("credit"))
+
+        yield "فواتير عميل حسب التاريخ", SalesInvoice.objects.filter(
+            customer_id=invoice.customer_id if invoice else 0,
+        ).order_by("date", "id")
+
+        yield "سندات قبض عميل", Payment.objects.filter(
+            customer_id=payment.customer_id if payment else 0,
+            payment_type=Payment.RECEIPT,
+        ).order_by("date", "id")
+
+        yield "طبقات FIFO المفتوحة لمنتج", StockLayer.objects.filter(
+            product_id=layer.product_id if layer else 0, qty_remaining__gt=0,
+        ).order_by("created_at", "id")
+
+    def handle(self, *args, **options):
+        explain_kwargs = {}
+        if options["analyze"] and connection.vendor == "postgresql":
+            explain_kwargs["analyze"] = True
+
+        self.stdout.write(f"قاعدة البيانات: {connection.vendor} | سطور القيود: {JournalLine.objects.count()}")
+
+        for title, qs in self._queries():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {title}"))
+            self.stdout.write(qs.explain(**explain_kwargs))
+
+            started = time.perf_counter()
+            list(qs)
+            self.stdout.write(f"الزمن: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        started = time.perf_counter()
+        trial_balance_rows(use_balances=False)
+        self.stdout.write(self.style.MIGRATE_HEADING("\n== ميزان المراجعة من السطور"))
+        self.stdout.write(f"الزمن: {(time.perf_counter() - started) * 1000:.1f} ms")
@@ -0,0 +1,59 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from accounting_app.posting import DEFAULT_CHUNK_SIZE, KINDS, post_pending
+
+
+class Command(BaseCommand):
+    help = 'ترحيل جماعي لكل المستندات غير المرحّلة (مشتريات ثم مبيعات ثم سندات) على دفعات'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only",
+            choices=KINDS,
+            action="append",
+            help="نوع المستندات (ممكن تتكرر). الافتراضي: الكل",
+        )
+        parser.add_argument("--date-from", help="من تاريخ YYYY-MM-DD")
+        parser.add_argument("--date-to", help="إلى تاريخ YYYY-MM-DD")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f"عدد المستندات بكل transaction (الافتراضي {DEFAULT_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        date_from = parse_date(options["date_from"]) if options["date_from"] else None
+        date_to = parse_date(options["date_to"]) if options["date_to"] else None
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size لازم يكون 1 أو أكثر")
+
+        def progress(kind, posted, errors):
+            self.stdout.write(f"  {kind}: تم ترحيل {posted} (أخطاء: {errors})")
+
+        started = time.perf_counter()
+        try:
+            result = post_pending(
+                kinds=options["only"] or KINDS,
+                date_from=date_from,
+                date_to=date_to,
+                chunk_size=options["chunk_size"],
+                progress=progress,
+            )
+        except ValidationError as e:
+            raise CommandError("; ".join(e.messages))
+        elapsed = time.perf_counter() - started
+
+        for kind, msg_id, message in result["errors"][:50]:
+            self.stdout.write(self.style.WARNING(f"  {kind} #{msg_id}: {message}"))
+
+        total = sum(result["posted"].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"تم ترحيل {total} مستند خلال {elapsed:.1f} ثانية "
+            f"(مشتريات {result['posted']['purchases']}، مبيعات {result['posted']['sales']}، "
+            f"سندات {result['posted']['payments']})، أخطاء: {len(result['errors'])}"
+        ))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+
+from accounting_app.models import AccountPeriodBalance, JournalLine
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء جدول أرصدة الحسابات لكل فترة (AccountPeriodBalance) من سطور القيود والتحقق منه'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="تحقق فقط (بدون إعادة بناء): يقارن الجدول مع السطور ويفشل إذا في فرق",
+        )
+
+    def _diff(self):
+        """يقارن الجدول الحالي مع الحساب من السطور. يرجع list بالمفاتيح المختلفة."""
+        expected = AccountPeriodBalance.compute_from_lines()
+        current = {
+            (b["account_id"], b["period_id"]): [b["debit_total"], b["credit_total"], b["line_count"]]
+            for b in AccountPeriodBalance.objects.values(
+                "account_id", "period_id", "debit_total", "credit_total", "line_count"
+            )
+        }
+
+        zero = [0, 0, 0]
+        diffs = []
+        for key in set(expected) | set(current):
+            if expected.get(key, zero) != current.get(key, zero):
+                diffs.append((key, expected.get(key, zero), current.get(key, zero)))
+        return diffs
+
+    def handle(self, *args, **options):
+        diffs = self._diff()
+        if diffs:
+            self.stdout.write(self.style.WARNING(f"عدد الأرصدة غير المطابقة للسطور: {len(diffs)}"))
+            for (acc_id, period_id), exp, cur in diffs[:20]:
+                self.stdout.write(f"  account={acc_id} period={period_id} expected={exp} current={cur}")
+        else:
+            self.stdout.write("الجدول مطابق للسطور.")
+
+        if options["check"]:
+            if diffs:
+                raise CommandError("جدول الأرصدة غير مطابق. شغّلي rebuild_balances بدون --check.")
+            return
+
+        count = AccountPeriodBalance.rebuild()
+
+        # تحقق بعد البناء: صف بصف + المجاميع الكلية مقابل JournalLine
+        if self._diff():
+            raise CommandError("فشل التحقق بعد إعادة البناء.")
+
+        raw = JournalLine.objects.aggregate(d=Sum("debit"), c=Sum("credit"))
+        built = AccountPeriodBalance.objects.aggregate(d=Sum("debit_total"), c=Sum("credit_total"))
+        if (raw["d"] or 0) != (built["d"] or 0) or (raw["c"] or 0) != (built["c"] or 0):
+            raise CommandError("مجاميع الجدول لا تساوي مجاميع سطور القيود.")
+
+        self.stdout.write(self.style.SUCCESS(f"تمت إعادة بناء {count} رصيد بنجاح"))
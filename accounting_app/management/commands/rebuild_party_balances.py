@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting_app.models import PartyBalance
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء جدول أرصدة العملاء/الموردين (PartyBalance) من المستندات المرحّلة والتحقق منه'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="تحقق فقط (بدون إعادة بناء): يقارن الجدول مع المستندات ويفشل إذا في فرق",
+        )
+
+    def _diff(self):
+        """يقارن الجدول الحالي مع الحساب من المستندات. يرجع list بالأطراف المختلفة."""
+        expected = PartyBalance.compute_from_documents()
+        current = {}
+        for b in PartyBalance.objects.values("customer_id", "supplier_id", "invoiced_total", "paid_total", "balance", "doc_count"):
+            key = (PartyBalance.CUSTOMER, b["customer_id"]) if b["customer_id"] else (PartyBalance.SUPPLIER, b["supplier_id"])
+            if b["balance"] != b["invoiced_total"] - b["paid_total"]:
+                # رصيد مخزّن ما بيطابق مكوّناته
+                current[key] = [b["invoiced_total"], b["paid_total"], -1]
+            else:
+                current[key] = [b["invoiced_total"], b["paid_total"], b["doc_count"]]
+
+        zero = [0, 0, 0]
+        diffs = []
+        for key in set(expected) | set(current):
+            if expected.get(key, zero) != current.get(key, zero):
+                diffs.append((key, expected.get(key, zero), current.get(key, zero)))
+        return diffs
+
+    def handle(self, *args, **options):
+        diffs = self._diff()
+        if diffs:
+            self.stdout.write(self.style.WARNING(f"عدد الأرصدة غير المطابقة للمستندات: {len(diffs)}"))
+            for (party, party_id), exp, cur in diffs[:20]:
+                self.stdout.write(f"  {party}={party_id} expected={exp} current={cur}")
+        else:
+            self.stdout.write("الجدول مطابق للمستندات.")
+
+        if options["check"]:
+            if diffs:
+                raise CommandError("جدول أرصدة الأطراف غير مطابق. شغّلي rebuild_party_balances بدون --check.")
+            return
+
+        count = PartyBalance.rebuild()
+
+        if self._diff():
+            raise CommandError("فشل التحقق بعد إعادة البناء.")
+
+        self.stdout.write(self.style.SUCCESS(f"تمت إعادة بناء {count} رصيد بنجاح"))
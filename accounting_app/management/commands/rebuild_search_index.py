@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting_app.search import SOURCES, rebuild
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء فهرس البحث الشامل (SearchDocument + FTS5/trigram) من القيود والفواتير والسندات والأطراف والمنتجات'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind",
+            action="append",
+            choices=list(SOURCES),
+            help="نوع واحد بس (ممكن تتكرر). الافتراضي: كل الأنواع",
+        )
+
+    def handle(self, *args, **options):
+        kinds = options["kind"] or list(SOURCES)
+
+        def progress(kind, n):
+            if n % 10000 == 0:
+                self.stdout.write(f"  {kind}: {n}")
+
+        try:
+            counts = rebuild(kinds=kinds, progress=progress)
+        except Exception as e:
+            raise CommandError(f"فشل بناء الفهرس: {e}")
+
+        for kind, n in counts.items():
+            self.stdout.write(f"{SOURCES[kind]['label']}: {n}")
+        self.stdout.write(self.style.SUCCESS(f"تمت فهرسة {sum(counts.values())} مستند بنجاح"))
@@ -0,0 +1,77 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from accounting_app.export_jobs import claim_next, kind_label, purge_finished, requeue_stale, run_job
+from accounting_app.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = 'تشغيل طابور التصدير بالخلفية (ExportJob): PDF/Excel الكبيرة برا الـ request'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=2, help="عدد التصديرات بنفس الوقت")
+        parser.add_argument("--poll", type=float, default=2.0, help="ثواني الانتظار لما الطابور فاضي")
+        parser.add_argument("--once", action="store_true", help="يخلّص اللي بالطابور ويطلع")
+        parser.add_argument(
+            "--stale-minutes",
+            type=int,
+            default=30,
+            help="job قيد التنفيذ أقدم من هيك بترجع للطابور (worker انقتل)",
+        )
+        parser.add_argument("--keep-days", type=int, default=2, help="حذف الملفات الجاهزة/الفاشلة الأقدم من هيك")
+
+    def _run(self, job_id):
+        try:
+            job = ExportJob.objects.only("kind").get(id=job_id)
+            started = time.perf_counter()
+            ok = run_job(job_id)
+            elapsed = time.perf_counter() - started
+            label = kind_label(job.kind)
+            if ok:
+                self.stdout.write(self.style.SUCCESS(f"✅ #{job_id} {label} ({elapsed:.1f} s)"))
+            else:
+                self.stdout.write(self.style.ERROR(f"❌ #{job_id} {label} فشل"))
+        finally:
+            # كل thread إله اتصال DB خاص فيه
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        if threads < 1:
+            raise CommandError("--threads لازم يكون 1 أو أكثر")
+
+        requeued = requeue_stale(timedelta(minutes=options["stale_minutes"]))
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"رجّعنا {requeued} job للطابور"))
+        purged = purge_finished(timedelta(days=options["keep_days"]))
+        if purged:
+            self.stdout.write(f"حذف {purged} ملف قديم")
+
+        self.stdout.write(f"طابور التصدير شغّال ({threads} threads)")
+
+        running = set()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            try:
+                while True:
+                    while len(running) < threads:
+                        job_id = claim_next()
+                        if job_id is None:
+                            break
+                        running.add(pool.submit(self._run, job_id))
+
+                    if running:
+                        done, running = wait(running, timeout=options["poll"], return_when=FIRST_COMPLETED)
+                        for future in done:
+                            if future.exception():
+                                self.stderr.write(f"خطأ بالـ worker: {future.exception()!r}")
+                        continue
+
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll"])
+            except KeyboardInterrupt:
+                self.stdout.write("إيقاف... بنستنى التصديرات الشغّالة تخلص")
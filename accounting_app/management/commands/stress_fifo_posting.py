@@ -0,0 +1,172 @@
+import contextlib
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from accounting_app.models import (
+    AccountingConfig, AccountingPeriod, Customer, JournalLine, SalesInvoice, SalesItem, _stock_in,
+)
+from inventory.models import Product, ProductStockSummary, StockLayer
+
+STRESS_PREFIX = "STRESS-FIFO"
+
+
+def _layers_value(product_ids):
+    return sum(
+        (q * c for q, c in StockLayer.objects.filter(product_id__in=product_ids).values_list("qty_remaining", "cost")),
+        Decimal("0"),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'اختبار تحمّل لترحيل فواتير المبيعات (FIFO) من عدة threads بنفس الوقت: '
+        'بيتأكد إنه ما في deadlock وإن الطبقات والملخص وتكلفة المبيعات متطابقين. '
+        '⚠️ بيكتب بيانات حقيقية (منتجات/فواتير STRESS-FIFO)، شغّليه على قاعدة تجريبية'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--invoices", type=int, default=1000, help="عدد الفواتير")
+        parser.add_argument("--workers", type=int, default=16, help="عدد المرحّلين المتوازيين")
+        parser.add_argument("--products", type=int, default=8, help="عدد المنتجات المشتركة (أقل = تنافس أعلى)")
+        parser.add_argument("--lines", type=int, default=6, help="بنود لكل فاتورة (نفس المنتج ممكن يتكرر)")
+        parser.add_argument("--layers", type=int, default=20, help="طبقات وارد لكل منتج")
+
+    def _seed(self, invoices, products, lines, layers):
+        rnd = random.Random(24)
+        today = timezone.localdate()
+        tag = f"{STRESS_PREFIX}-{int(time.time())}"
+
+        customer = Customer.objects.create(name=tag)
+        prods = [Product.objects.create(name=f"{tag}-{i}", sku=f"{tag}-{i}") for i in range(products)]
+
+        # بنود عشوائية بترتيب منتجات عشوائي (هاد اللي كان بيعمل deadlock)
+        plan = [
+            [(rnd.choice(prods), Decimal(rnd.randint(1, 5))) for _ in range(lines)]
+            for _ in range(invoices)
+        ]
+        need = {}
+        for inv_lines in plan:
+            for product, qty in inv_lines:
+                need[product.id] = need.get(product.id, Decimal("0")) + qty
+
+        with transaction.atomic():
+            for product in prods:
+                per_layer = (need.get(product.id, Decimal("0")) / layers).quantize(Decimal("1")) + 1
+                for _ in range(layers):
+                    _stock_in(product, per_layer, Decimal(rnd.randint(100, 9999)) / 100, related_invoice=tag)
+
+            ids = []
+            for inv_lines in plan:
+                inv = SalesInvoice.objects.create(customer=customer, date=today)
+                inv.save_items(new=[
+                    SalesItem(product=product, qty=qty, price=Decimal(rnd.randint(100, 20000)) / 100)
+                    for product, qty in inv_lines
+                ])
+                ids.append(inv.id)
+        return prods, ids
+
+    def _worker(self, queue, queue_lock, writer_lock, errors):
+        try:
+            while True:
+                with queue_lock:
+                    if not queue:
+                        return
+                    invoice_id = queue.pop()
+                try:
+                    with writer_lock:
+                        SalesInvoice.objects.get(id=invoice_id).post_to_journal()
+                except Exception as exc:  # noqa: BLE001
+                    errors.append((invoice_id, repr(exc)))
+        finally:
+            connections.close_all()
+
+    def _check(self, prods, ids, initial_value):
+        """يرجع list بالمشاكل (فاضية = كل شي مطابق)."""
+        problems = []
+        product_ids = [p.id for p in prods]
+
+        unposted = SalesInvoice.objects.filter(id__in=ids, journal_entry__isnull=True).count()
+        if unposted:
+            problems.append(f"فواتير غير مرحّلة: {unposted}")
+
+        expected = ProductStockSummary.compute_from_layers()
+        for s in ProductStockSummary.objects.filter(product_id__in=product_ids):
+            qty, value = expected.get(s.product_id, (Decimal("0"), Decimal("0")))
+            if s.qty_on_hand != qty or abs(s.total_value - value) > Decimal("0.0001"):
+                problems.append(f"ملخص المنتج {s.product_id}: {s.qty_on_hand}/{s.total_value} != {qty}/{value}")
+
+        if StockLayer.objects.filter(product_id__in=product_ids, qty_remaining__lt=0).exists():
+            problems.append("طبقات برصيد سالب")
+
+        # قيمة الصادر من الطبقات = تكلفة المبيعات بالقيود
+        cfg = AccountingConfig.get_config()
+        cogs = JournalLine.objects.filter(
+            entry__sales_invoice__id__in=ids, account=cfg.cogs_account,
+        ).aggregate(t=Sum("debit"))["t"] or Decimal("0")
+        layer_out = initial_value - _layers_value(product_ids)
+        # تكلفة كل فاتورة متقربة لقرشين => الفرق أقل من نص قرش لكل فاتورة
+        if abs(cogs - layer_out) > Decimal("0.005") * len(ids):
+            problems.append(f"تكلفة المبيعات {cogs} != قيمة الصادر من الطبقات {layer_out}")
+        return problems
+
+    def handle(self, *args, **options):
+        invoices = max(1, options["invoices"])
+        workers = max(1, options["workers"])
+        products = max(1, options["products"])
+        lines = max(1, options["lines"])
+        layers = max(1, options["layers"])
+
+        cfg = AccountingConfig.get_config()
+        if not (cfg.ar_account and cfg.sales_account and cfg.cogs_account and cfg.inventory_account):
+            raise CommandError("إعدادات المحاسبة ناقصة (ذمم/مبيعات/تكلفة/مخزون).")
+        period = AccountingPeriod.get_for_date(timezone.localdate())
+        if not period or period.is_closed:
+            raise CommandError("لازم فترة مفتوحة تغطي تاريخ اليوم.")
+
+        self.stdout.write(
+            f"قاعدة البيانات: {connection.vendor} | فواتير: {invoices} × {lines} بند | "
+            f"منتجات: {products} | مرحّلين: {workers}"
+        )
+        if connection.vendor == "sqlite":
+            self.stdout.write(self.style.WARNING("⚠️ SQLite بيقفل الملف كله للكتابة، اختبار الـ deadlock الحقيقي على PostgreSQL"))
+            writer_lock = threading.Lock()
+        else:
+            writer_lock = contextlib.nullcontext()
+
+        prods, ids = self._seed(invoices, products, lines, layers)
+        initial_value = _layers_value([p.id for p in prods])
+
+        queue = list(reversed(ids))
+        queue_lock = threading.Lock()
+        errors = []
+        threads = [
+            threading.Thread(target=self._worker, args=(queue, queue_lock, writer_lock, errors))
+            for _ in range(workers)
+        ]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"الزمن: {elapsed:.2f} s | السرعة: {invoices / elapsed:.0f} فاتورة/ثانية")
+
+        deadlocks = [e for e in errors if "deadlock" in e[1].lower()]
+        if errors:
+            self.stdout.write(self.style.ERROR(f"أخطاء: {len(errors)} (deadlock: {len(deadlocks)}) أول خطأ: {errors[0]}"))
+
+        problems = self._check(prods, ids, initial_value)
+        for p in problems:
+            self.stdout.write(self.style.ERROR(f"❌ {p}"))
+
+        if errors or problems:
+            raise CommandError("فشل اختبار التحمّل.")
+        self.stdout.write(self.style.SUCCESS("✅ كل الفواتير ترحّلت بدون deadlock، والمخزون والتكلفة متطابقين"))
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:21
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_balances(apps, schema_editor):
+    """تعبئة أولية لجدول الأرصدة من القيود الموجودة (نفس منطق AccountPeriodBalance.rebuild)."""
+    AccountingPeriod = apps.get_model("accounting_app", "AccountingPeriod")
+    JournalLine = apps.get_model("accounting_app", "JournalLine")
+    AccountPeriodBalance = apps.get_model("accounting_app", "AccountPeriodBalance")
+
+    periods = list(AccountingPeriod.objects.order_by("-start_date").values_list("id", "start_date", "end_date"))
+
+    totals = {}
+    grouped = (
+        JournalLine.objects.values("account_id", "entry__date")
+        .annotate(d=Sum("debit"), c=Sum("credit"), n=Count("id"))
+        .order_by()
+    )
+    for g in grouped.iterator():
+        d = g["entry__date"]
+        period_id = next((pid for pid, s, e in periods if s <= d <= e), None)
+        t = totals.setdefault((g["account_id"], period_id), [Decimal("0"), Decimal("0"), 0])
+        t[0] += g["d"] or 0
+        t[1] += g["c"] or 0
+        t[2] += g["n"]
+
+    AccountPeriodBalance.objects.bulk_create(
+        [
+            AccountPeriodBalance(account_id=a, period_id=p, debit_total=d, credit_total=c, line_count=n)
+            for (a, p), (d, c, n) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_app', '0013_payment_is_locked'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountPeriodBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('debit_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('credit_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('line_count', models.IntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_balances', to='accounting_app.account')),
+                ('period', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='account_balances', to='accounting_app.accountingperiod')),
+            ],
+            options={
+                'unique_together': {('account', 'period')},
+            },
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
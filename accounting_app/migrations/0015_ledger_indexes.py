@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_app', '0014_accountperiodbalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['date', 'id'], name='je_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalline',
+            index=models.Index(fields=['account', 'entry'], name='jl_account_entry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['customer', 'payment_type', 'date'], name='pay_customer_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['supplier', 'payment_type', 'date'], name='pay_supplier_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseinvoice',
+            index=models.Index(fields=['supplier', 'date'], name='pinv_supplier_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesinvoice',
+            index=models.Index(fields=['customer', 'date'], name='sinv_customer_date_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:04
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_party_balances(apps, schema_editor):
+    """تعبئة أولية من المستندات المرحّلة (نفس منطق PartyBalance.rebuild)."""
+    SalesInvoice = apps.get_model("accounting_app", "SalesInvoice")
+    PurchaseInvoice = apps.get_model("accounting_app", "PurchaseInvoice")
+    Payment = apps.get_model("accounting_app", "Payment")
+    PartyBalance = apps.get_model("accounting_app", "PartyBalance")
+
+    posted = dict(journal_entry__isnull=False, journal_entry__is_reversed=False)
+    sources = (
+        ("customer", SalesInvoice.objects.filter(**posted), "customer_id", "total", 0),
+        ("supplier", PurchaseInvoice.objects.filter(**posted), "supplier_id", "total", 0),
+        ("customer", Payment.objects.filter(payment_type="RECEIPT", customer__isnull=False, **posted), "customer_id", "amount", 1),
+        ("supplier", Payment.objects.filter(payment_type="DISBURSE", supplier__isnull=False, **posted), "supplier_id", "amount", 1),
+    )
+
+    totals = {}
+    for party, qs, party_field, amount_field, slot in sources:
+        for g in qs.values(party_field).annotate(t=Sum(amount_field), n=Count("id")).order_by().iterator():
+            t = totals.setdefault((party, g[party_field]), [Decimal("0"), Decimal("0"), 0])
+            t[slot] += g["t"] or 0
+            t[2] += g["n"]
+
+    PartyBalance.objects.bulk_create(
+        [
+            PartyBalance(**{f"{party}_id": pid}, invoiced_total=i, paid_total=p, balance=i - p, doc_count=n)
+            for (party, pid), (i, p, n) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_app', '0016_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoiced_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('paid_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('doc_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='party_balance', to='accounting_app.customer')),
+                ('supplier', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='party_balance', to='accounting_app.supplier')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['balance'], name='partybal_balance_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('customer__isnull', False), ('supplier__isnull', True)), models.Q(('customer__isnull', True), ('supplier__isnull', False)), _connector='OR'), name='partybal_one_party')],
+            },
+        ),
+        migrations.RunPython(populate_party_balances, migrations.RunPython.noop),
+    ]
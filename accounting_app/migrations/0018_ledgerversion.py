@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:07
+
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    """صف العدّاد الوحيد (id=1)."""
+    LedgerVersion = apps.get_model("accounting_app", "LedgerVersion")
+    LedgerVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_app', '0017_partybalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:17
+
+from django.db import migrations, models
+
+FTS_TABLE = "accounting_app_searchfts"
+TRGM_INDEX = "searchdoc_body_trgm_idx"
+
+
+def create_search_structures(apps, schema_editor):
+    """SQLite: جدول FTS5 مربوط بـ SearchDocument.id، PostgreSQL: فهرس trigram على body."""
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                "USING fts5(title, body, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except Exception:
+            # ⚠️ SQLite بدون FTS5: البحث بيشتغل بـ LIKE على SearchDocument.body
+            pass
+    elif connection.vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON accounting_app_searchdocument "
+            "USING gin (body gin_trgm_ops)"
+        )
+
+
+def drop_search_structures(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {TRGM_INDEX}")
+
+
+def populate_search_index(apps, schema_editor):
+    from accounting_app.search import rebuild
+
+    rebuild(get_model=apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_app', '0018_ledgerversion'),
+        ('inventory', '0010_productstocksummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, default='', max_length=255)),
+                ('body', models.TextField(blank=True, default='')),
+                ('date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='searchdoc_kind_object_unique')],
+            },
+        ),
+        migrations.RunPython(create_search_structures, drop_search_structures),
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
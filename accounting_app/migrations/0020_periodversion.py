@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_app', '0019_searchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,11 +1,18 @@
-from django.db import models, transaction
-from django.db.models import F
+import re
+import threading
+import weakref
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import DatabaseError, IntegrityError, connection, models, transaction
+from django.db.models import Count, ExpressionWrapper, F, Sum
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 import decimal
 
-from inventory.models import Product, StockLayer, StockMovement
+from inventory.models import Product, ProductStockSummary, StockLayer, StockLayerConsumption, StockMovement
 
 
 # =======================
@@ -33,47 +40,159 @@ def _stock_in(product: Product, qty, unit_cost, related_invoice: str = ""):
         related_invoice=related_invoice,
     )
 
+    # ✅ ملخص المنتج (كمية + قيمة) بنفس الـ transaction
+    # (التكلفة بتنحفظ بالطبقة على 4 خانات، فنحسب القيمة بنفس التقريب)
+    ProductStockSummary.apply(product.id, qty, qty * unit_cost.quantize(decimal.Decimal("0.0001")))
+
+
+class _FifoBook:
+    """
+    طبقات FIFO المفتوحة لمجموعة منتجات: جلب واحد مع قفل، مرتب حسب product_id
+    => ترتيب قفل ثابت، فمستندين (أو ترحيل جماعي) بنفس الوقت ما بيعملوا deadlock
+    مهما كان ترتيب بنودهم. نفس الـ book بيخدم مستند واحد (_fifo_allocate_lines)
+    أو chunk كامل من الترحيل الجماعي (posting.py).
+
+    - allocate(): بنود مستند واحد. الكمية بتنجمع لكل منتج وبتنفحص قبل أي صرف،
+      فالمستند يا بينصرف كامل يا ما بيتغيّر شي (ValidationError)
+    - مؤشر لكل منتج على أول طبقة فيها رصيد => مرور واحد على الطبقات لكل الـ book
+    - flush(): bulk_update واحد للطبقات + ProductStockSummary لكل منتج حسب product_id
+    """
+
+    def __init__(self, product_ids):
+        zero = decimal.Decimal("0")
+        self.layers = {}
+        self.available = {}
+        layers = (
+            StockLayer.objects.select_for_update()
+            .filter(product_id__in=sorted(set(product_ids)), qty_remaining__gt=0)
+            .order_by("product_id", "created_at", "id")
+            .only("id", "product_id", "qty_remaining", "cost")
+        )
+        for layer in layers:
+            self.layers.setdefault(layer.product_id, []).append(layer)
+            self.available[layer.product_id] = self.available.get(layer.product_id, zero) + layer.qty_remaining
+        self.position = {}
+        self.touched = {}
+        self.out = {}
+
+    def allocate(self, lines):
+        """
+        lines = [(product, qty), ...] (نفس ترتيب البنود). التكلفة بتتوزع على البنود بالترتيب
+        (أول بند بياخذ أقدم الطبقات، نفس نتيجة الصرف بند بند).
 
-def _fifo_consume(product: Product, qty, related_invoice: str = ""):
-    """Consume qty from StockLayer FIFO. Returns total_cost (Decimal) and avg unit cost."""
-    qty = decimal.Decimal(qty)
-    if qty <= 0:
-        return decimal.Decimal("0"), decimal.Decimal("0")
-
-    remaining = qty
-    total_cost = decimal.Decimal("0")
-
-    layers = (
-        StockLayer.objects.select_for_update()
-        .filter(product=product, qty_remaining__gt=0)
-        .order_by("created_at", "id")
-    )
-
-    for layer in layers:
-        if remaining <= 0:
-            break
-
-        take = min(layer.qty_remaining, remaining)
-        total_cost += take * layer.cost
-
-        layer.qty_remaining = layer.qty_remaining - take
-        layer.save(update_fields=["qty_remaining"])
-        remaining -= take
-
-    if remaining > 0:
-        raise ValidationError(f"المخزون غير كافي للمنتج {product.sku}. المطلوب {qty}.")
-
-    avg = (total_cost / qty) if qty else decimal.Decimal("0")
-
-    StockMovement.objects.create(
-        product=product,
-        movement_type="out",
-        qty=qty,
-        unit_cost=avg,
-        related_invoice=related_invoice,
-    )
-
-    return total_cost, avg
+        ترجع list بطول lines: (allocations, total_cost) لكل بند، حيث allocations = list of dicts
+        (layer_id, qty, unit_cost, cost, qty_before, qty_after) بتنحفظ كـ StockLayerConsumption (_write_out_movements).
+        """
+        zero = decimal.Decimal("0")
+        demands = {}
+        for product, qty in lines:
+            qty = decimal.Decimal(qty)
+            if qty > 0:
+                demands.setdefault(product.id, [product, zero])[1] += qty
+        for product_id, (product, qty) in demands.items():
+            if self.available.get(product_id, zero) < qty:
+                raise ValidationError(f"المخزون غير كافي للمنتج {product.sku}. المطلوب {qty}.")
+
+        results = []
+        for product, qty in lines:
+            qty = decimal.Decimal(qty)
+            if qty <= 0:
+                results.append(([], zero))
+                continue
+            remaining = qty
+            total_cost = zero
+            allocations = []
+            product_layers = self.layers[product.id]
+            while remaining > 0:
+                i = self.position.get(product.id, 0)
+                layer = product_layers[i]
+                if layer.qty_remaining <= 0:
+                    self.position[product.id] = i + 1
+                    continue
+                take = min(layer.qty_remaining, remaining)
+                cost = take * layer.cost
+                total_cost += cost
+                allocations.append({
+                    "layer_id": layer.id,
+                    "qty": take,
+                    "unit_cost": layer.cost,
+                    "cost": cost,
+                    "qty_before": layer.qty_remaining,
+                    "qty_after": layer.qty_remaining - take,
+                })
+                layer.qty_remaining -= take
+                self.touched[layer.id] = layer
+                remaining -= take
+            self.available[product.id] -= qty
+            results.append((allocations, total_cost))
+            o = self.out.setdefault(product.id, [zero, zero])
+            o[0] += qty
+            o[1] += total_cost
+        return results
+
+    def flush(self):
+        # ✅ UPDATE واحد (CASE WHEN) لكل الطبقات، والملخص بنفس ترتيب القفل
+        if self.touched:
+            StockLayer.objects.bulk_update(list(self.touched.values()), ["qty_remaining"], batch_size=1000)
+        for product_id in sorted(self.out):
+            ProductStockSummary.apply(product_id, -self.out[product_id][0], -self.out[product_id][1])
+        self.touched = {}
+        self.out = {}
+
+
+def _fifo_allocate_lines(lines):
+    """
+    FIFO لكل بنود مستند دفعة وحدة (_FifoBook لمنتجات المستند + flush).
+    ترجع (allocations, total_cost) لكل بند بنفس ترتيب lines.
+    """
+    product_ids = [product.id for product, qty in lines if decimal.Decimal(qty) > 0]
+    if not product_ids:
+        return [([], decimal.Decimal("0")) for _ in lines]
+    book = _FifoBook(product_ids)
+    results = book.allocate(lines)
+    book.flush()
+    return results
+
+
+def _write_out_movements(movements):
+    """
+    movements = [(StockMovement "out", allocations من _FifoBook.allocate), ...]
+    => bulk_create للحركات + سجل التدقيق (StockLayerConsumption) لكل طبقة انصرف منها.
+    """
+    StockMovement.objects.bulk_create([m for m, _allocations in movements], batch_size=1000)
+    StockLayerConsumption.objects.bulk_create([
+        StockLayerConsumption(
+            movement=m, layer_id=a["layer_id"], qty=a["qty"], unit_cost=a["unit_cost"], qty_after=a["qty_after"],
+        )
+        for m, allocations in movements
+        for a in allocations
+    ], batch_size=1000)
+
+
+def _fifo_consume_lines(lines, related_invoice: str = ""):
+    """
+    يصرف كل بنود المستند FIFO دفعة وحدة (_fifo_allocate_lines) + حركة "out" لكل بند
+    مع سجل الطبقات اللي انصرف منها (_write_out_movements).
+    ترجع list بتكلفة كل بند (Decimal) بنفس ترتيب lines.
+    """
+    results = _fifo_allocate_lines(lines)
+
+    movements = []
+    costs = []
+    for (product, qty), (allocations, total_cost) in zip(lines, results):
+        qty = decimal.Decimal(qty)
+        costs.append(total_cost)
+        if qty <= 0:
+            continue
+        movements.append((StockMovement(
+            product=product,
+            movement_type="out",
+            qty=qty,
+            unit_cost=total_cost / qty,
+            related_invoice=related_invoice,
+        ), allocations))
+    _write_out_movements(movements)
+    return costs
 
 
 # =======================
@@ -130,6 +249,18 @@ class Account(models.Model):
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        # شجرة/أنواع الحسابات بتدخل بالتقارير => نسخة دفتر جديدة
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            LedgerVersion.bump()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            LedgerVersion.bump()
+            return result
+
 
 # =======================
 # العملاء / الموردين
@@ -150,9 +281,187 @@ class Customer(models.Model):
         return self.name
 
 
+# =======================
+# علامة "لسا في on_commit معلّق" لكل thread
+# =======================
+class _CommitHook:
+    def __init__(self, pending, value, callback):
+        self.pending = pending
+        self.value = value
+        self.callback = callback
+
+    def __call__(self):
+        self.pending.clear()
+        if self.callback:
+            self.callback()
+
+
+class _PendingCommit:
+    """
+    قيمة بتعيش لآخر الـ transaction الحالي (لكل thread)، بـ API عام بس (transaction.on_commit).
+
+    الـ hook بينحفظ بقائمة on_commit تبع Django وبس؛ عندنا weakref عليه.
+    بعد الـ commit بيشتغل وبيمسح العلامة، ومع الـ rollback (أو rollback لـ savepoint
+    سجّله) Django بيرمي القائمة => الـ hook بيموت والـ weakref بيرجع None.
+    فالعلامة ما بتعلق لـ transaction جاي حتى لو ما صار commit.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self):
+        """الـ hook المعلّق بالـ transaction الحالي (فيه .value)، أو None."""
+        ref = getattr(self._local, "ref", None)
+        return ref() if ref is not None else None
+
+    def set(self, value=None, callback=None):
+        """برا أي transaction الـ callback بيشتغل فوراً والعلامة ما بتنحفظ."""
+        hook = _CommitHook(self, value, callback)
+        self._local.ref = weakref.ref(hook)
+        transaction.on_commit(hook)
+        return hook
+
+    def clear(self):
+        self._local.ref = None
+
+
 # =======================
 # الفترات المحاسبية
 # =======================
+class PeriodVersion(models.Model):
+    """
+    عدّاد واحد (صف id=1) بيزيد مع كل save/delete لفترة، بنفس الـ transaction
+    (فبيبان للعمليات الثانية مع الـ commit نفسه، مش قبل ولا بعد).
+    _PeriodIndex بيقارن نسخته فيه قبل ما يستعمل الفهرس بالذاكرة.
+    """
+    SINGLETON_ID = 1
+
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Periods v{self.version}"
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=cls.SINGLETON_ID).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        """جوا transaction تعديل الفترة (قفل الصف لحد الـ commit، والتعديلات نادرة)."""
+        updated = cls.objects.filter(pk=cls.SINGLETON_ID).update(version=F("version") + 1)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(pk=cls.SINGLETON_ID, version=1)
+            except IntegrityError:
+                # process ثاني أنشأه بنفس اللحظة
+                cls.bump()
+
+
+class _PeriodIndex:
+    """
+    فهرس الفترات بالذاكرة (لكل عملية): مرتب حسب start_date + bisect
+    => get_for_date / is_closed بدون استعلامات على الفترات أثناء الترحيل.
+
+    الصلاحية من الـ DB مش من الكاش: PeriodVersion بينقرأ (PK) مرة لكل transaction،
+    ومرة لكل طلب HTTP برا الـ transactions (request_started/request_finished)،
+    وإذا تغيّر الفهرس بيتعاد تحميله.
+    => إقفال فترة من أي عملية/سيرفر بيبان لكل العمليات من أول transaction/طلب بعد الـ commit.
+    برا الطلبات وبرا أي transaction (أوامر، threads) بينقرأ مع كل لوك أب.
+
+    جوا transaction عدّلت فترة (ولسا ما صار commit) اللوك أب بيروح للـ DB مباشرة،
+    عشان الفهرس المشترك ما يشوف بيانات ممكن ترجع rollback.
+    """
+
+    FIELDS = ("id", "name", "start_date", "end_date", "is_closed")
+
+    def __init__(self):
+        self._data = None  # (version, starts, rows, max_end, by_id)
+        self._dirty = _PendingCommit()  # الـ transaction الحالي عدّل فترة
+        self._txn_version = _PendingCommit()  # النسخة المقروءة بالـ transaction الحالي
+        self._request = threading.local()  # .version للطلب الحالي (None = لسا ما انقرأت)
+
+    def mark_dirty(self):
+        """من AccountingPeriod.save/delete (جوا الـ transaction)."""
+        PeriodVersion.bump()
+        if self._dirty.get() is None:
+            self._dirty.set(callback=self.forget_request)
+
+    def start_request(self, **kwargs):
+        self._request.version = None
+        self._request.active = True
+
+    def end_request(self, **kwargs):
+        self._request.version = None
+        self._request.active = False
+
+    def forget_request(self):
+        # تعديل فترة بهالطلب صار commit => اللوك أب الجاي بيقرأ النسخة الجديدة
+        self._request.version = None
+
+    def _bypass(self):
+        return self._dirty.get() is not None and transaction.get_connection().in_atomic_block
+
+    def _db_version(self):
+        if transaction.get_connection().in_atomic_block:
+            hook = self._txn_version.get()
+            if hook is None:
+                hook = self._txn_version.set(PeriodVersion.current())
+            return hook.value
+        if not getattr(self._request, "active", False):
+            return PeriodVersion.current()
+        if self._request.version is None:
+            self._request.version = PeriodVersion.current()
+        return self._request.version
+
+    def _snapshot(self, model):
+        version = self._db_version()
+        data = self._data
+        if data is not None and data[0] == version:
+            return data
+
+        rows = list(model.objects.order_by("start_date", "id").values_list(*self.FIELDS))
+        max_end = []
+        for _id, _name, _start, end, _closed in rows:
+            max_end.append(max(end, max_end[-1]) if max_end else end)
+        data = (version, [r[2] for r in rows], rows, max_end, {r[0]: r for r in rows})
+        # ✅ tuple وحدة بتتبدل مرة وحدة => threads ثانية بتشوف القديمة أو الجديدة كاملة
+        self._data = data
+        return data
+
+    def _instance(self, model, row):
+        # نسخة جديدة لكل طلب (المستدعي ممكن يعدّل عليها)
+        return model.from_db(model.objects.db, self.FIELDS, row)
+
+    def for_date(self, model, d):
+        """نفس get_for_date: أحدث فترة (start_date) بتغطي d، أو None."""
+        if self._bypass():
+            return model.objects.filter(start_date__lte=d, end_date__gte=d).order_by("-start_date").first()
+        _version, starts, rows, max_end, _by_id = self._snapshot(model)
+        i = bisect_right(starts, d) - 1
+        # max_end[i] = أبعد نهاية لكل الفترات لحد i => إذا أقل من d ما في داعي نرجع لورا
+        while i >= 0 and max_end[i] >= d:
+            if rows[i][3] >= d:
+                return self._instance(model, rows[i])
+            i -= 1
+        return None
+
+    def by_id(self, model, period_id):
+        if self._bypass():
+            return model.objects.filter(pk=period_id).first()
+        row = self._snapshot(model)[4].get(period_id)
+        return self._instance(model, row) if row else None
+
+
+_PERIOD_INDEX = _PeriodIndex()
+
+
+def connect_period_index_signals():
+    """من AccountingAppConfig.ready: نسخة الفترات مرة لكل طلب HTTP."""
+    request_started.connect(_PERIOD_INDEX.start_request, dispatch_uid="period_index_start_request")
+    request_finished.connect(_PERIOD_INDEX.end_request, dispatch_uid="period_index_end_request")
+
+
 class AccountingPeriod(models.Model):
     name = models.CharField(max_length=50)  # مثال: 2025-01
     start_date = models.DateField()
@@ -163,6 +472,41 @@ class AccountingPeriod(models.Model):
         status = "مقفلة" if self.is_closed else "مفتوحة"
         return f"{self.name} ({status})"
 
+    @staticmethod
+    def _bounds():
+        """كل الفترات (id, start, end) بترتيب get_for_date، لإعادة توزيع الأرصدة."""
+        return list(AccountingPeriod.objects.order_by("-start_date").values_list("id", "start_date", "end_date"))
+
+    def save(self, *args, **kwargs):
+        ranges = [(self.start_date, self.end_date)]
+        if not self._state.adding:
+            old = AccountingPeriod.objects.filter(pk=self.pk).values("start_date", "end_date").first()
+            if old and (old["start_date"], old["end_date"]) == ranges[0]:
+                ranges = []
+            elif old:
+                ranges.append((old["start_date"], old["end_date"]))
+
+        with transaction.atomic():
+            old_bounds = self._bounds() if ranges else None
+            super().save(*args, **kwargs)
+            _PERIOD_INDEX.mark_dirty()
+            # حدود الفترات بتحدد لأي فترة ينتمي كل سطر => نعيد توزيع سطور المدى القديم/الجديد بس
+            if ranges:
+                AccountPeriodBalance.rebucket(old_bounds, ranges)
+            # إقفال/فتح الفترة كمان
+            LedgerVersion.bump()
+
+    def delete(self, *args, **kwargs):
+        period_id, ranges = self.pk, [(self.start_date, self.end_date)]
+        with transaction.atomic():
+            old_bounds = self._bounds()
+            result = super().delete(*args, **kwargs)
+            _PERIOD_INDEX.mark_dirty()
+            # أرصدة الفترة نفسها انحذفت معها (CASCADE)
+            AccountPeriodBalance.rebucket(old_bounds, ranges, deleted_period_id=period_id)
+            LedgerVersion.bump()
+            return result
+
     @classmethod
     def get_for_date(cls, dt):
         """
@@ -173,7 +517,13 @@ class AccountingPeriod(models.Model):
             d = timezone.now().date()
         else:
             d = dt.date() if hasattr(dt, "date") else dt
-        return cls.objects.filter(start_date__lte=d, end_date__gte=d).order_by("-start_date").first()
+        # ✅ من الفهرس بالذاكرة (بدون استعلام)
+        return _PERIOD_INDEX.for_date(cls, d)
+
+    @classmethod
+    def get_cached(cls, period_id):
+        """الفترة حسب id من نفس الفهرس (is_closed محدّث مع كل إقفال/فتح)."""
+        return _PERIOD_INDEX.by_id(cls, period_id) if period_id else None
 
     # Alias لأن Payment عندك يستخدم get_period_for_date
     @classmethod
@@ -212,16 +562,122 @@ class DocumentSequence(models.Model):
 
     @classmethod
     def next(cls, doc_type: str, period=None) -> int:
+        return cls.next_block(doc_type, period=period, n=1)
+
+    @classmethod
+    def next_block(cls, doc_type: str, period=None, n: int = 1) -> int:
+        """
+        يحجز n أرقام متتالية بقفل واحد (للترحيل الجماعي).
+        يرجع أول رقم بالمجموعة: الأرقام = first .. first + n - 1
+
+        مع DOCUMENT_SEQUENCE_NATIVE على PostgreSQL: الحجز من SEQUENCE أصلي
+        (ما في قفل على صف الجدول لحد نهاية الـ transaction).
+        """
+        if n < 1:
+            raise ValueError("n لازم يكون 1 أو أكثر")
+        if cls._use_native():
+            return cls._native_block(doc_type, period, n)
         with transaction.atomic():
             obj, _ = cls.objects.select_for_update().get_or_create(
                 doc_type=doc_type,
                 period=period,
                 defaults={"last_number": 0},
             )
-            obj.last_number = F("last_number") + 1
+            # ✅ إذا كان في SEQUENCE أصلي قبل (DOCUMENT_SEQUENCE_NATIVE انطفى) بنكمل بعد آخر رقم فيه
+            high = cls._native_high_water(doc_type, period)
+            if high:
+                cls.objects.filter(pk=obj.pk, last_number__lt=high).update(last_number=high)
+            obj.last_number = F("last_number") + n
             obj.save(update_fields=["last_number"])
             obj.refresh_from_db(fields=["last_number"])
-            return obj.last_number
+            return obj.last_number - n + 1
+
+    # -----------------------
+    # PostgreSQL SEQUENCE (اختياري)
+    # -----------------------
+    # ⚠️ nextval ما بيرجع مع rollback: ممكن تصير فجوات بالأرقام،
+    #    وجدول DocumentSequence ما بيتحدّث مع كل رقم (الـ SEQUENCE هو المصدر).
+    # ✅ التحويل بالاتجاهين آمن: الـ SEQUENCE بيبدأ/بيكمل بعد last_number،
+    #    والجدول بيكمل بعد آخر رقم بالـ SEQUENCE (_native_high_water).
+    _native_ready = set()
+    _native_synced = set()
+    # آخر رقم طلع من الـ SEQUENCE (قبل أول nextval: last_value = START وما طلع)
+    _SEQ_HIGH = "CASE WHEN is_called THEN last_value ELSE last_value - 1 END"
+
+    @classmethod
+    def _use_native(cls) -> bool:
+        return (
+            getattr(settings, "DOCUMENT_SEQUENCE_NATIVE", False)
+            and connection.vendor == "postgresql"
+        )
+
+    @classmethod
+    def _native_name(cls, doc_type: str, period=None) -> str:
+        period_id = getattr(period, "pk", period) or 0
+        safe_type = re.sub(r"[^a-z0-9]", "", str(doc_type).lower())
+        return f"docseq_{safe_type}_{period_id}"
+
+    @classmethod
+    def _ensure_native(cls, cursor, name: str, doc_type: str, period=None):
+        if name in cls._native_ready:
+            return
+        # يبدأ بعد آخر رقم بالجدول عشان ما يتكرر رقم عند التحويل
+        last = (
+            cls.objects.filter(doc_type=doc_type, period=period)
+            .values_list("last_number", flat=True)
+            .first()
+        ) or 0
+        try:
+            with transaction.atomic():
+                cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {name} START WITH {int(last) + 1}")
+        except DatabaseError:
+            # worker ثاني أنشأه بنفس اللحظة
+            pass
+        # SEQUENCE قديم (من قبل ما ينطفى الـ native) والجدول كمّل بعده => نقدّمه
+        cursor.execute(f"SELECT {cls._SEQ_HIGH} FROM {name}")
+        if cursor.fetchone()[0] < last:
+            cursor.execute("SELECT setval(%s, %s)", [name, int(last)])
+        transaction.on_commit(lambda: cls._native_ready.add(name))
+
+    @classmethod
+    def _native_high_water(cls, doc_type: str, period=None) -> int:
+        """آخر رقم بالـ SEQUENCE الأصلي لهالنوع/الفترة (0 إذا مش PostgreSQL أو ما في SEQUENCE)، مرة لكل process."""
+        if connection.vendor != "postgresql":
+            return 0
+        name = cls._native_name(doc_type, period)
+        if name in cls._native_synced:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            exists = cursor.fetchone()[0] is not None
+            high = 0
+            if exists:
+                cursor.execute(f"SELECT {cls._SEQ_HIGH} FROM {name}")
+                high = cursor.fetchone()[0]
+        transaction.on_commit(lambda: cls._native_synced.add(name))
+        return high
+
+    @classmethod
+    def _native_block(cls, doc_type: str, period, n: int) -> int:
+        name = cls._native_name(doc_type, period)
+        with connection.cursor() as cursor:
+            cls._ensure_native(cursor, name, doc_type, period)
+            # الأرقام المفردة بقفل مشترك (ما بيوقفوا بعض)، والـ block بقفل حصري
+            # قصير (مش لحد الـ commit) عشان يطلع متتالي بدون رقم مفرد بالنص
+            lock = "pg_advisory_lock" if n > 1 else "pg_advisory_lock_shared"
+            cursor.execute(f"SELECT {lock}(hashtext(%s))", [name])
+            try:
+                cursor.execute("SELECT nextval(%s)", [name])
+                first = cursor.fetchone()[0]
+                if n > 1:
+                    cursor.execute("SELECT setval(%s, %s)", [name, first + n - 1])
+            finally:
+                cursor.execute(
+                    "SELECT pg_advisory_unlock(hashtext(%s))" if n > 1
+                    else "SELECT pg_advisory_unlock_shared(hashtext(%s))",
+                    [name],
+                )
+            return first
 
 
 # =======================
@@ -336,9 +792,16 @@ class JournalEntry(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # ✅ كل التقارير بتفلتر/بترتب حسب التاريخ ثم id
+            models.Index(fields=["date", "id"], name="je_date_id_idx"),
+        ]
+
     def _ensure_period_open(self):
         if self.period_id:
-            if self.period.is_closed:
+            period = AccountingPeriod.get_cached(self.period_id)
+            if period and period.is_closed:
                 raise ValidationError("لا يمكن الإضافة/التعديل/الحذف داخل فترة محاسبية مقفلة")
             return
 
@@ -350,15 +813,34 @@ class JournalEntry(models.Model):
         self._ensure_period_open()
 
         if self._state.adding and not self.serial_number:
-            seq = DocumentSequence.next("JE", period=self.period if self.period_id else None)
-            period_part = self.period.name if self.period_id else "NO-PERIOD"
+            period = None
+            if self.period_id:
+                # ✅ إذا القيد انعمل بـ period_id بس، من فهرس الفترات بدل استعلام
+                period = self.period if JournalEntry.period.is_cached(self) else AccountingPeriod.get_cached(self.period_id)
+            seq = DocumentSequence.next("JE", period=period)
+            period_part = period.name if period else "NO-PERIOD"
             self.serial_number = f"JE-{period_part}-{seq:06d}"
 
-        super().save(*args, **kwargs)
+        old_date = None
+        if not self._state.adding and self.pk:
+            old_date = JournalEntry.objects.filter(pk=self.pk).values_list("date", flat=True).first()
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # تغيير تاريخ القيد ممكن ينقل سطوره لفترة ثانية => ننقل أرصدتها كمان
+            if old_date is not None and old_date != _as_date(self.date):
+                AccountPeriodBalance.apply_entry(self.pk, old_date, sign=-1)
+                AccountPeriodBalance.apply_entry(self.pk, self.date, sign=1)
+            LedgerVersion.bump()
 
     def delete(self, *args, **kwargs):
         self._ensure_period_open()
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            # السطور بتنحذف CASCADE بدون JournalLine.delete => نطرح أرصدتها هون
+            AccountPeriodBalance.apply_entry(self.pk, self.date, sign=-1)
+            LedgerVersion.bump()
+            return super().delete(*args, **kwargs)
 
     def total_debit(self):
         return sum(line.debit for line in self.lines.all())
@@ -385,21 +867,44 @@ class JournalLine(models.Model):
     credit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
     note = models.CharField(max_length=255, blank=True)
 
+    class Meta:
+        indexes = [
+            # ✅ دفتر الأستاذ/الميزان/النقدية/الكشوف: account ثم join على القيد
+            models.Index(fields=["account", "entry"], name="jl_account_entry_idx"),
+        ]
+
     def _ensure_period_open(self):
         if not self.entry_id:
             return
 
-        p = self.entry.period if self.entry.period_id else AccountingPeriod.get_for_date(self.entry.date)
+        # ✅ من فهرس الفترات (مش self.entry.period => استعلام لكل سطر)
+        p = AccountingPeriod.get_cached(self.entry.period_id) if self.entry.period_id else AccountingPeriod.get_for_date(self.entry.date)
         if p and p.is_closed:
             raise ValidationError("لا يمكن تعديل/حذف سطور قيد داخل فترة محاسبية مقفلة")
 
     def save(self, *args, **kwargs):
         self._ensure_period_open()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            old = None
+            if not self._state.adding and self.pk:
+                old = JournalLine.objects.filter(pk=self.pk).values(
+                    "account_id", "debit", "credit", "entry__date"
+                ).first()
+            super().save(*args, **kwargs)
+            AccountPeriodBalance.on_line_saved(self, old)
 
     def delete(self, *args, **kwargs):
         self._ensure_period_open()
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            AccountPeriodBalance.bump(
+                self.account_id,
+                AccountPeriodBalance.period_id_for_date(self.entry.date),
+                debit=-(self.debit or 0),
+                credit=-(self.credit or 0),
+                count=-1,
+            )
+            return result
 
     def clean(self):
         if self.debit > 0 and self.credit > 0:
@@ -411,6 +916,337 @@ class JournalLine(models.Model):
         return f"{self.account} | مدين {self.debit} | دائن {self.credit}"
 
 
+def _as_date(value):
+    """نفس تحويل DateField (datetime aware -> تاريخ محلي)."""
+    return JournalEntry._meta.get_field("date").to_python(value)
+
+
+# =======================
+# ✅ أرصدة الحسابات لكل فترة (Materialized)
+# =======================
+def _period_resolver(bounds):
+    """
+    تاريخ => period_id من bounds = [(id, start, end), ...] مرتبة -start_date
+    (نفس منطق get_for_date: أحدث فترة تغطي التاريخ)، مع كاش لكل تاريخ.
+    """
+    cache = {}
+
+    def period_for(d):
+        if d not in cache:
+            cache[d] = next((pid for pid, s, e in bounds if s <= d <= e), None)
+        return cache[d]
+
+    return period_for
+
+
+class AccountPeriodBalance(models.Model):
+    """
+    مجموع مدين/دائن وعدد السطور لكل (حساب، فترة).
+    الفترة تتحدد من تاريخ القيد، و period=None يعني تاريخ خارج كل الفترات.
+
+    يتحدث داخل نفس الـ transaction مع JournalLine.save/delete و JournalEntry.delete،
+    وأمر rebuild_balances يعيد بناءه من الصفر ويتحقق منه مقابل السطور.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name="period_balances")
+    period = models.ForeignKey(
+        "AccountingPeriod",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="account_balances",
+    )
+    debit_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    credit_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    line_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("account", "period")
+
+    def __str__(self):
+        p = self.period.name if self.period_id else "NO-PERIOD"
+        return f"{self.account.code} / {p}: مدين {self.debit_total} | دائن {self.credit_total}"
+
+    @staticmethod
+    def period_id_for_date(d):
+        p = AccountingPeriod.get_for_date(_as_date(d))
+        return p.id if p else None
+
+    @classmethod
+    def bump(cls, account_id, period_id, debit=0, credit=0, count=0):
+        if not debit and not credit and not count:
+            return
+        with transaction.atomic():
+            LedgerVersion.bump()
+            obj, _ = cls.objects.select_for_update().get_or_create(
+                account_id=account_id,
+                period_id=period_id,
+            )
+            cls.objects.filter(pk=obj.pk).update(
+                debit_total=F("debit_total") + debit,
+                credit_total=F("credit_total") + credit,
+                line_count=F("line_count") + count,
+            )
+
+    @classmethod
+    def bump_many(cls, deltas):
+        """
+        deltas: {(account_id, period_id): [debit, credit, count]}
+        (للترحيل الجماعي وقيد الإقفال اللي بيكتبوا السطور bulk_create بدون JournalLine.save)
+
+        ✅ set-based: قفل كل صفوف الفترة باستعلام واحد + إنشاء الناقص bulk_create
+           + bulk_update، بدل get_or_create و update لكل مفتاح
+        """
+        deltas = {key: d for key, d in deltas.items() if any(d)}
+        if not deltas:
+            return
+
+        by_period = {}
+        for account_id, period_id in deltas:
+            by_period.setdefault(period_id, []).append(account_id)
+
+        def locked(period_id, account_ids):
+            qs = cls.objects.select_for_update().filter(account_id__in=account_ids)
+            qs = qs.filter(period_id=period_id) if period_id else qs.filter(period__isnull=True)
+            # ترتيب ثابت للأقفال (تفادي deadlock بين عمليتين ترحيل)
+            return {obj.account_id: obj for obj in qs.order_by("account_id")}
+
+        with transaction.atomic():
+            LedgerVersion.bump()
+            rows = []
+            for period_id in sorted(by_period, key=lambda p: p or 0):
+                account_ids = by_period[period_id]
+                existing = locked(period_id, account_ids)
+                missing = [a for a in account_ids if a not in existing]
+                if missing:
+                    # ignore_conflicts: عملية ثانية أنشأت نفس الصف بنفس اللحظة
+                    # (مش مع period=None لأن NULL ما بيتعارض بالـ unique)
+                    cls.objects.bulk_create(
+                        [cls(account_id=a, period_id=period_id) for a in missing],
+                        batch_size=1000,
+                        ignore_conflicts=period_id is not None,
+                    )
+                    existing.update(locked(period_id, missing))
+
+                for account_id in account_ids:
+                    obj = existing[account_id]
+                    debit, credit, count = deltas[(account_id, period_id)]
+                    obj.debit_total += decimal.Decimal(debit)
+                    obj.credit_total += decimal.Decimal(credit)
+                    obj.line_count += count
+                    rows.append(obj)
+
+            cls.objects.bulk_update(rows, ["debit_total", "credit_total", "line_count"], batch_size=1000)
+
+    @classmethod
+    def on_line_saved(cls, line, old=None):
+        """يطبّق الفرق بين القيم القديمة (إن وجدت) والجديدة لسطر قيد."""
+        if old:
+            cls.bump(
+                old["account_id"],
+                cls.period_id_for_date(old["entry__date"]),
+                debit=-(old["debit"] or 0),
+                credit=-(old["credit"] or 0),
+                count=-1,
+            )
+        cls.bump(
+            line.account_id,
+            cls.period_id_for_date(line.entry.date),
+            debit=decimal.Decimal(line.debit or 0),
+            credit=decimal.Decimal(line.credit or 0),
+            count=1,
+        )
+
+    @classmethod
+    def apply_entry(cls, entry_id, entry_date, sign=1):
+        """يضيف (sign=1) أو يطرح (sign=-1) كل سطور قيد من رصيد فترة تاريخه."""
+        period_id = cls.period_id_for_date(entry_date)
+        sums = (
+            JournalLine.objects.filter(entry_id=entry_id)
+            .values("account_id")
+            .annotate(d=Sum("debit"), c=Sum("credit"), n=Count("id"))
+            .order_by()
+        )
+        for s in sums:
+            cls.bump(s["account_id"], period_id, sign * s["d"], sign * s["c"], sign * s["n"])
+
+    @classmethod
+    def compute_from_lines(cls):
+        """
+        يحسب الأرصدة من JournalLine مباشرة.
+        يرجع dict: {(account_id, period_id): [debit, credit, count]}
+        """
+        period_for = _period_resolver(AccountingPeriod._bounds())
+
+        grouped = (
+            JournalLine.objects.values("account_id", "entry__date")
+            .annotate(d=Sum("debit"), c=Sum("credit"), n=Count("id"))
+            .order_by()
+        )
+
+        totals = {}
+        for g in grouped.iterator():
+            key = (g["account_id"], period_for(g["entry__date"]))
+            t = totals.setdefault(key, [decimal.Decimal("0"), decimal.Decimal("0"), 0])
+            t[0] += g["d"] or 0
+            t[1] += g["c"] or 0
+            t[2] += g["n"]
+        return totals
+
+    @classmethod
+    def rebucket(cls, old_bounds, ranges, deleted_period_id=None):
+        """
+        بعد إنشاء/تعديل حدود/حذف فترة: سطور التواريخ اللي بـ ranges (المدى القديم والجديد
+        للفترة) بس هي اللي ممكن تتغير فترتها، فبننقل مجاميعها من الفترة القديمة
+        (old_bounds = AccountingPeriod._bounds() قبل التعديل) للجديدة بـ bump_many،
+        بدل rebuild لكل الدفتر. ترجع عدد المفاتيح اللي تغيّرت.
+        """
+        old_for = _period_resolver(old_bounds)
+        new_for = _period_resolver(AccountingPeriod._bounds())
+
+        in_ranges = models.Q()
+        for start, end in ranges:
+            in_ranges |= models.Q(entry__date__gte=start, entry__date__lte=end)
+        grouped = (
+            JournalLine.objects.filter(in_ranges)
+            .values("account_id", "entry__date")
+            .annotate(d=Sum("debit"), c=Sum("credit"), n=Count("id"))
+            .order_by()
+        )
+
+        deltas = {}
+        for g in grouped.iterator():
+            old_pid, new_pid = old_for(g["entry__date"]), new_for(g["entry__date"])
+            if old_pid == new_pid:
+                continue
+            for period_id, sign in ((old_pid, -1), (new_pid, 1)):
+                if period_id is not None and period_id == deleted_period_id:
+                    continue
+                t = deltas.setdefault((g["account_id"], period_id), [decimal.Decimal("0"), decimal.Decimal("0"), 0])
+                t[0] += sign * decimal.Decimal(g["d"] or 0).quantize(decimal.Decimal("0.01"))
+                t[1] += sign * decimal.Decimal(g["c"] or 0).quantize(decimal.Decimal("0.01"))
+                t[2] += sign * g["n"]
+
+        cls.bump_many(deltas)
+        return len(deltas)
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls):
+        """يحذف الجدول ويعيد بناءه من السطور. يرجع عدد الصفوف."""
+        LedgerVersion.bump()
+        totals = cls.compute_from_lines()
+        cls.objects.all().delete()
+        cls.objects.bulk_create(
+            [
+                cls(account_id=acc_id, period_id=period_id, debit_total=d, credit_total=c, line_count=n)
+                for (acc_id, period_id), (d, c, n) in totals.items()
+            ],
+            batch_size=1000,
+        )
+        return len(totals)
+
+
+# =======================
+# نسخة الدفتر (لكاش التقارير)
+# =======================
+_LEDGER_BUMP_PENDING = _PendingCommit()
+
+
+class LedgerVersion(models.Model):
+    """
+    عدّاد واحد (صف id=1) بيزيد مع أي كتابة على القيود/السطور/الحسابات/الفترات.
+    report_cache.py بيحطه بمفتاح الكاش، فأي تقرير محفوظ بنسخة قديمة ما بينقرأ أبداً.
+
+    ✅ الزيادة بعد الـ commit ومرة وحدة لكل transaction (on_commit)،
+       فالترحيل ما بيمسك قفل على هالصف لآخر الـ transaction.
+    """
+    SINGLETON_ID = 1
+
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Ledger v{self.version}"
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=cls.SINGLETON_ID).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def _increment(cls):
+        updated = cls.objects.filter(pk=cls.SINGLETON_ID).update(
+            version=F("version") + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(pk=cls.SINGLETON_ID, version=1)
+            except IntegrityError:
+                # process ثاني أنشأه بنفس اللحظة
+                cls._increment()
+
+    @classmethod
+    def bump(cls):
+        """
+        بيسجّل زيادة بعد الـ commit (وفوراً إذا ما في transaction).
+        إذا الـ transaction رجع rollback ما بتصير زيادة، وما في داعي.
+        """
+        # زيادة معلّقة بنفس الـ transaction => خلص (بتنمسح مع الـ commit أو الـ rollback)
+        if _LEDGER_BUMP_PENDING.get() is None:
+            _LEDGER_BUMP_PENDING.set(callback=cls._increment)
+
+
+def _create_journal_lines(je, lines):
+    """سطور القيد من journal_lines() تبع المستند: (account, debit, credit, note)."""
+    for account, debit, credit, note in lines:
+        JournalLine.objects.create(entry=je, account=account, debit=debit, credit=credit, note=note)
+
+
+# =======================
+# بنود الفواتير (مشترك بين المبيعات والمشتريات)
+# =======================
+ITEM_FIELDS = ["product", "qty", "price"]
+
+
+def _items_total(items):
+    """
+    مجموع qty * price بالـ DB (Sum واحد بدل تحميل كل البنود).
+    ✅ الضرب بيتقرّب لـ 8 خانات (الدقة الكاملة لـ 4 × 4 خانات) قبل التقريب لقرشين،
+       فخطأ الـ float على SQLite ما بيأثر على التقريب.
+    """
+    line = ExpressionWrapper(F("qty") * F("price"), output_field=models.DecimalField(max_digits=30, decimal_places=8))
+    total = items.aggregate(t=Sum(line))["t"] or decimal.Decimal("0")
+    return total.quantize(decimal.Decimal("0.01"))
+
+
+def _save_invoice_items(invoice, new=(), changed=(), deleted=(), fields=ITEM_FIELDS):
+    """
+    حفظ بنود فاتورة دفعة وحدة:
+      - فحص "الفاتورة مش مرحّلة والفترة مفتوحة" مرة وحدة (بدل مرة لكل بند بـ save)
+      - bulk_create للجديد، bulk_update للمعدّل، delete واحد للمحذوف
+      - recalc_total مرة وحدة بالآخر (Sum بالـ DB)
+    """
+    if invoice.journal_entry_id:
+        raise ValidationError("لا يمكن تعديل/حذف بنود فاتورة مرحّلة إلى القيود.")
+    invoice._ensure_period_open()
+
+    items = invoice.items
+    fk_name = items.field.name
+    for item in new:
+        setattr(item, fk_name, invoice)
+
+    with transaction.atomic():
+        deleted_ids = [i.pk for i in deleted if i.pk]
+        if deleted_ids:
+            items.model.objects.filter(pk__in=deleted_ids, **{fk_name: invoice}).delete()
+        if new:
+            items.model.objects.bulk_create(list(new), batch_size=500)
+        changed = [i for i in changed if i.pk and i.pk not in deleted_ids]
+        if changed:
+            items.model.objects.bulk_update(changed, fields, batch_size=500)
+        return invoice.recalc_total()
+
+
 # =======================
 # فواتير المشتريات
 # =======================
@@ -429,13 +1265,17 @@ class PurchaseInvoice(models.Model):
         verbose_name="القيد الناتج عن الفاتورة",
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["supplier", "date"], name="pinv_supplier_date_idx"),
+        ]
+
     def recalc_total(self):
         # ممنوع إعادة احتساب/تعديل الإجمالي إذا الفاتورة مرحّلة
         if self.pk and self.journal_entry_id:
             raise ValidationError("لا يمكن تعديل فاتورة مرحّلة إلى القيود.")
 
-        tot = sum((i.line_total() for i in self.items.all()), decimal.Decimal("0"))
-        tot = tot.quantize(decimal.Decimal("0.01"))
+        tot = _items_total(self.items.all())
 
         if self.total != tot:
             self.total = tot
@@ -443,6 +1283,10 @@ class PurchaseInvoice(models.Model):
 
         return self.total
 
+    def save_items(self, new=(), changed=(), deleted=(), fields=ITEM_FIELDS):
+        """حفظ البنود دفعة وحدة + إجمالي واحد (انظر _save_invoice_items). يرجع الإجمالي."""
+        return _save_invoice_items(self, new, changed, deleted, fields)
+
 
 
     def _ensure_period_open(self):
@@ -490,28 +1334,40 @@ class PurchaseInvoice(models.Model):
             self.total = total
             super(PurchaseInvoice, self).save(update_fields=["total"])
 
+        lines = self.journal_lines(cfg, total)
         je = JournalEntry.objects.create(
             period=period,
             date=self.date,
             reference=self.invoice_number or "",
-            description=f"قيد فاتورة مشتريات رقم {self.invoice_number}",
+            description=self.journal_description(),
             created_by=user,
         )
-
-        debit_account = cfg.inventory_account or cfg.purchases_account
-        if not debit_account:
-            raise ValidationError("يرجى تحديد حساب المخزون أو المشتريات ضمن إعدادات المحاسبة.")
-
-        JournalLine.objects.create(entry=je, account=debit_account, debit=total, credit=0, note=f"مشتريات - {self.supplier.name}")
-        JournalLine.objects.create(entry=je, account=cfg.ap_account, debit=0, credit=total, note="ذمم دائنين")
+        _create_journal_lines(je, lines)
 
         for item in self.items.select_related("product"):
             _stock_in(item.product, item.qty, item.price, related_invoice=self.invoice_number or "")
 
         PurchaseInvoice.objects.filter(id=self.id, journal_entry__isnull=True).update(journal_entry=je)
         self.journal_entry = je
+        PartyBalance.apply_document(self)
+        SearchDocument.reindex(self)
         return je
 
+    # ✅ قاعدة القيد بمكان واحد: post_to_journal والترحيل الجماعي (posting.py) بيستعملوها
+    def journal_description(self):
+        return f"قيد فاتورة مشتريات رقم {self.invoice_number}"
+
+    def journal_lines(self, cfg, total):
+        """سطور القيد: list of (account, debit, credit, note)."""
+        debit_account = cfg.inventory_account or cfg.purchases_account
+        if not debit_account:
+            raise ValidationError("يرجى تحديد حساب المخزون أو المشتريات ضمن إعدادات المحاسبة.")
+        zero = decimal.Decimal("0")
+        return [
+            (debit_account, total, zero, f"مشتريات - {self.supplier.name}"),
+            (cfg.ap_account, zero, total, "ذمم دائنين"),
+        ]
+
     def __str__(self):
         return self.invoice_number or f"PI-{self.id}"
 
@@ -564,13 +1420,18 @@ class SalesInvoice(models.Model):
         verbose_name="القيد الناتج عن الفاتورة",
     )
 
+    class Meta:
+        indexes = [
+            # ✅ كشف حساب العميل: فواتير عميل حسب التاريخ
+            models.Index(fields=["customer", "date"], name="sinv_customer_date_idx"),
+        ]
+
     def recalc_total(self):
         # ممنوع إعادة احتساب/تعديل الإجمالي إذا الفاتورة مرحّلة
         if self.pk and self.journal_entry_id:
             raise ValidationError("لا يمكن تعديل فاتورة مرحّلة إلى القيود.")
 
-        tot = sum((i.line_total() for i in self.items.all()), decimal.Decimal("0"))
-        tot = tot.quantize(decimal.Decimal("0.01"))
+        tot = _items_total(self.items.all())
 
         if self.total != tot:
             self.total = tot
@@ -578,6 +1439,10 @@ class SalesInvoice(models.Model):
 
         return self.total
 
+    def save_items(self, new=(), changed=(), deleted=(), fields=ITEM_FIELDS):
+        """حفظ البنود دفعة وحدة + إجمالي واحد (انظر _save_invoice_items). يرجع الإجمالي."""
+        return _save_invoice_items(self, new, changed, deleted, fields)
+
 
 
     def _ensure_period_open(self):
@@ -625,32 +1490,53 @@ class SalesInvoice(models.Model):
             self.total = total
             super(SalesInvoice, self).save(update_fields=["total"])
 
+        total_cost = decimal.Decimal("0")
+        if cfg.cogs_account and cfg.inventory_account:
+            # ✅ كل البنود دفعة وحدة: FIFO مرة لكل منتج وقفل مرتب حسب المنتج
+            items = list(self.items.select_related("product").order_by("id"))
+            costs = _fifo_consume_lines(
+                [(item.product, item.qty) for item in items],
+                related_invoice=self.invoice_number or "",
+            )
+            total_cost = sum(costs, decimal.Decimal("0"))
+
         je = JournalEntry.objects.create(
             period=period,
             date=self.date,
             reference=self.invoice_number or "",
-            description=f"قيد فاتورة مبيعات رقم {self.invoice_number}",
+            description=self.journal_description(),
             created_by=user,
         )
-
-        JournalLine.objects.create(entry=je, account=cfg.ar_account, debit=total, credit=0, note=f"ذمم عملاء - {self.customer.name}")
-        JournalLine.objects.create(entry=je, account=cfg.sales_account, debit=0, credit=total, note="إيراد مبيعات")
-
-        if cfg.cogs_account and cfg.inventory_account:
-            total_cost = decimal.Decimal("0")
-            for item in self.items.select_related("product"):
-                cost, _avg = _fifo_consume(item.product, item.qty, related_invoice=self.invoice_number or "")
-                total_cost += cost
-
-            total_cost = total_cost.quantize(decimal.Decimal("0.01"))
-            if total_cost > 0:
-                JournalLine.objects.create(entry=je, account=cfg.cogs_account, debit=total_cost, credit=0, note="تكلفة بضاعة مباعة")
-                JournalLine.objects.create(entry=je, account=cfg.inventory_account, debit=0, credit=total_cost, note="تخفيض مخزون")
+        _create_journal_lines(je, self.journal_lines(cfg, total, total_cost))
 
         SalesInvoice.objects.filter(id=self.id, journal_entry__isnull=True).update(journal_entry=je)
         self.journal_entry = je
+        PartyBalance.apply_document(self)
+        SearchDocument.reindex(self)
         return je
 
+    # ✅ قاعدة القيد بمكان واحد: post_to_journal والترحيل الجماعي (posting.py) بيستعملوها
+    def journal_description(self):
+        return f"قيد فاتورة مبيعات رقم {self.invoice_number}"
+
+    def journal_lines(self, cfg, total, total_cost):
+        """
+        سطور القيد: list of (account, debit, credit, note).
+        total_cost = تكلفة FIFO للبنود (بتتقرّب لقرشين هون)، وسطور التكلفة بس إذا حساباتها محددة.
+        """
+        zero = decimal.Decimal("0")
+        lines = [
+            (cfg.ar_account, total, zero, f"ذمم عملاء - {self.customer.name}"),
+            (cfg.sales_account, zero, total, "إيراد مبيعات"),
+        ]
+        total_cost = total_cost.quantize(decimal.Decimal("0.01"))
+        if cfg.cogs_account and cfg.inventory_account and total_cost > 0:
+            lines += [
+                (cfg.cogs_account, total_cost, zero, "تكلفة بضاعة مباعة"),
+                (cfg.inventory_account, zero, total_cost, "تخفيض مخزون"),
+            ]
+        return lines
+
     def __str__(self):
         return self.invoice_number or f"SI-{self.id}"
 
@@ -725,6 +1611,13 @@ class Payment(models.Model):
         verbose_name="القيد الناتج عن السند",
     )
 
+    class Meta:
+        indexes = [
+            # ✅ كشوف العملاء/الموردين وتقارير السندات
+            models.Index(fields=["customer", "payment_type", "date"], name="pay_customer_type_date_idx"),
+            models.Index(fields=["supplier", "payment_type", "date"], name="pay_supplier_type_date_idx"),
+        ]
+
     # -----------------------
     # Helpers
     # -----------------------
@@ -809,39 +1702,210 @@ class Payment(models.Model):
             self.voucher_number = f"{self._doc_type()}-{period.name}-{seq:06d}"
             Payment.objects.filter(id=self.id).update(voucher_number=self.voucher_number)
 
-        cash_acc = self.cash_account or cfg.cash_account
-        if not cash_acc:
-            raise ValidationError("يرجى تحديد حساب الصندوق/البنك ضمن إعدادات المحاسبة أو داخل السند.")
-
+        lines = self.journal_lines(cfg)
         je = JournalEntry.objects.create(
             period=period,
             date=self.date,
             reference=self.voucher_number or "",
-            description=("سند قبض" if self.payment_type == self.RECEIPT else "سند صرف") + (f" - {self.note}" if self.note else ""),
+            description=self.journal_description(),
             created_by=user,
         )
-
-        if self.payment_type == self.RECEIPT:
-            if not cfg.ar_account:
-                raise ValidationError("يرجى تحديد حساب الذمم المدينة (AR) ضمن إعدادات المحاسبة.")
-            JournalLine.objects.create(entry=je, account=cash_acc, debit=self.amount, credit=0, note="قبض")
-            JournalLine.objects.create(entry=je, account=cfg.ar_account, debit=0, credit=self.amount, note=f"سداد من {self.customer.name}")
-        else:
-            if not cfg.ap_account:
-                raise ValidationError("يرجى تحديد حساب الذمم الدائنة (AP) ضمن إعدادات المحاسبة.")
-            JournalLine.objects.create(entry=je, account=cfg.ap_account, debit=self.amount, credit=0, note=f"سداد إلى {self.supplier.name}")
-            JournalLine.objects.create(entry=je, account=cash_acc, debit=0, credit=self.amount, note="صرف")
+        _create_journal_lines(je, lines)
 
         Payment.objects.filter(id=self.id, journal_entry__isnull=True).update(journal_entry=je, is_locked=True)
         self.journal_entry = je
         self.is_locked = True
+        PartyBalance.apply_document(self)
+        SearchDocument.reindex(self)
         return je
 
+    # ✅ قاعدة القيد بمكان واحد: post_to_journal والترحيل الجماعي (posting.py) بيستعملوها
+    def journal_description(self):
+        return ("سند قبض" if self.payment_type == self.RECEIPT else "سند صرف") + (f" - {self.note}" if self.note else "")
+
+    def journal_lines(self, cfg):
+        """سطور القيد: list of (account, debit, credit, note). بيتحقق من الحسابات المطلوبة."""
+        cash_acc = self.cash_account or cfg.cash_account
+        if not cash_acc:
+            raise ValidationError("يرجى تحديد حساب الصندوق/البنك ضمن إعدادات المحاسبة أو داخل السند.")
+        zero = decimal.Decimal("0")
+        if self.payment_type == self.RECEIPT:
+            if not cfg.ar_account:
+                raise ValidationError("يرجى تحديد حساب الذمم المدينة (AR) ضمن إعدادات المحاسبة.")
+            return [
+                (cash_acc, self.amount, zero, "قبض"),
+                (cfg.ar_account, zero, self.amount, f"سداد من {self.customer.name}"),
+            ]
+        if not cfg.ap_account:
+            raise ValidationError("يرجى تحديد حساب الذمم الدائنة (AP) ضمن إعدادات المحاسبة.")
+        return [
+            (cfg.ap_account, self.amount, zero, f"سداد إلى {self.supplier.name}"),
+            (cash_acc, zero, self.amount, "صرف"),
+        ]
+
     def __str__(self):
         who = self.customer.name if self.customer_id else (self.supplier.name if self.supplier_id else "")
         return f"{self.get_payment_type_display()} - {who} - {self.amount}"
 
 
+# =======================
+# أرصدة العملاء/الموردين (جاهزة)
+# =======================
+class PartyBalance(models.Model):
+    """
+    رصيد كل عميل/مورد من المستندات المرحّلة (غير المعكوسة):
+      عميل: فواتير بيع - سندات قبض
+      مورد: فواتير شراء - سندات صرف
+
+    يتحدث داخل نفس الـ transaction مع post_to_journal والترحيل الجماعي (posting.py)
+    وعكس القيد، فقوائم العملاء/الموردين بتعرض وبترتّب حسب الرصيد باستعلام واحد
+    بدل كشف حساب لكل سطر. أمر rebuild_party_balances يعيد بناءه ويتحقق منه.
+
+    ✅ نفس التعريف بكشف الحساب (statements.posted_sql) وأعمار الذمم: المسودات
+    والمستندات المعكوسة ما بتدخل، فالرصيد هون = الرصيد الختامي لكشف نفس الطرف.
+    """
+    CUSTOMER = "customer"
+    SUPPLIER = "supplier"
+
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, null=True, blank=True, related_name="party_balance"
+    )
+    supplier = models.OneToOneField(
+        Supplier, on_delete=models.CASCADE, null=True, blank=True, related_name="party_balance"
+    )
+    invoiced_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    paid_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    doc_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["balance"], name="partybal_balance_idx"),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(customer__isnull=False, supplier__isnull=True)
+                    | models.Q(customer__isnull=True, supplier__isnull=False)
+                ),
+                name="partybal_one_party",
+            ),
+        ]
+
+    def __str__(self):
+        who = self.customer or self.supplier
+        return f"{who}: {self.balance}"
+
+    @staticmethod
+    def document_delta(doc):
+        """
+        ((party, party_id), invoiced, paid) لمستند، أو None إذا ما إله طرف
+        (سند قبض بدون عميل مثلاً).
+        """
+        if isinstance(doc, SalesInvoice):
+            return (PartyBalance.CUSTOMER, doc.customer_id), doc.total or 0, 0
+        if isinstance(doc, PurchaseInvoice):
+            return (PartyBalance.SUPPLIER, doc.supplier_id), doc.total or 0, 0
+        if isinstance(doc, Payment):
+            if doc.payment_type == Payment.RECEIPT and doc.customer_id:
+                return (PartyBalance.CUSTOMER, doc.customer_id), 0, doc.amount or 0
+            if doc.payment_type == Payment.DISBURSE and doc.supplier_id:
+                return (PartyBalance.SUPPLIER, doc.supplier_id), 0, doc.amount or 0
+        return None
+
+    @classmethod
+    def bump(cls, party, party_id, invoiced=0, paid=0, count=0):
+        if not party_id or (not invoiced and not paid and not count):
+            return
+        with transaction.atomic():
+            obj, _ = cls.objects.select_for_update().get_or_create(**{f"{party}_id": party_id})
+            cls.objects.filter(pk=obj.pk).update(
+                invoiced_total=F("invoiced_total") + invoiced,
+                paid_total=F("paid_total") + paid,
+                balance=F("balance") + invoiced - paid,
+                doc_count=F("doc_count") + count,
+            )
+
+    @classmethod
+    def bump_many(cls, deltas):
+        """deltas: {(party, party_id): [invoiced, paid, count]} (للترحيل الجماعي)"""
+        # ترتيب ثابت للأقفال (تفادي deadlock بين عمليتين ترحيل)
+        for (party, party_id), (invoiced, paid, count) in sorted(deltas.items()):
+            cls.bump(party, party_id, invoiced, paid, count)
+
+    @classmethod
+    def apply_document(cls, doc, sign=1):
+        """يضيف (sign=1 بعد الترحيل) أو يطرح (sign=-1 بعد العكس) مستند من رصيد طرفه."""
+        delta = cls.document_delta(doc)
+        if delta:
+            (party, party_id), invoiced, paid = delta
+            cls.bump(party, party_id, sign * invoiced, sign * paid, sign)
+
+    @classmethod
+    def apply_entry(cls, entry_id, sign=-1):
+        """المستند المرتبط بقيد (إن وجد) بعد عكس القيد."""
+        for model in (SalesInvoice, PurchaseInvoice, Payment):
+            doc = model.objects.filter(journal_entry_id=entry_id).first()
+            if doc:
+                cls.apply_document(doc, sign=sign)
+                return doc
+        return None
+
+    @staticmethod
+    def compute_from_documents():
+        """
+        يحسب الأرصدة من المستندات المرحّلة غير المعكوسة مباشرة.
+        يرجع dict: {(party, party_id): [invoiced, paid, count]}
+        """
+        posted = dict(journal_entry__isnull=False, journal_entry__is_reversed=False)
+        sources = (
+            (PartyBalance.CUSTOMER, SalesInvoice.objects.filter(**posted), "customer_id", "total", 0),
+            (PartyBalance.SUPPLIER, PurchaseInvoice.objects.filter(**posted), "supplier_id", "total", 0),
+            (
+                PartyBalance.CUSTOMER,
+                Payment.objects.filter(payment_type=Payment.RECEIPT, customer__isnull=False, **posted),
+                "customer_id", "amount", 1,
+            ),
+            (
+                PartyBalance.SUPPLIER,
+                Payment.objects.filter(payment_type=Payment.DISBURSE, supplier__isnull=False, **posted),
+                "supplier_id", "amount", 1,
+            ),
+        )
+
+        totals = {}
+        for party, qs, party_field, amount_field, slot in sources:
+            grouped = qs.values(party_field).annotate(t=Sum(amount_field), n=Count("id")).order_by()
+            for g in grouped.iterator():
+                t = totals.setdefault((party, g[party_field]), [decimal.Decimal("0"), decimal.Decimal("0"), 0])
+                # SQLite بيرجع SUM كـ float، فبنقرّب للقرش
+                t[slot] += decimal.Decimal(g["t"] or 0).quantize(decimal.Decimal("0.01"))
+                t[2] += g["n"]
+        return totals
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls):
+        """يحذف الجدول ويعيد بناءه من المستندات. يرجع عدد الصفوف."""
+        totals = cls.compute_from_documents()
+        cls.objects.all().delete()
+        cls.objects.bulk_create(
+            [
+                cls(
+                    **{f"{party}_id": party_id},
+                    invoiced_total=invoiced,
+                    paid_total=paid,
+                    balance=invoiced - paid,
+                    doc_count=count,
+                )
+                for (party, party_id), (invoiced, paid, count) in totals.items()
+            ],
+            batch_size=1000,
+        )
+        return len(totals)
+
+
 # =======================
 # Opening Balances
 # =======================
@@ -876,3 +1940,97 @@ class OpeningBalance(models.Model):
 
     def __str__(self):
         return f"Opening {self.period.name} - {self.account.code}"
+
+
+# =======================
+# تصدير بالخلفية (PDF/Excel كبير)
+# =======================
+class ExportJob(models.Model):
+    """
+    طلب تصدير بينحط بالطابور وبيشتغل عليه أمر run_export_worker بدل الـ request.
+    الملف الناتج بينحفظ بالجدول نفسه (web و worker ممكن ما يشتركوا بنفس القرص).
+
+    params_hash = بصمة (kind + params + المستخدم) عشان نفس الطلب ما يتكرر وهو لسا بالطابور.
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "بالانتظار"),
+        (RUNNING, "قيد التنفيذ"),
+        (DONE, "جاهز"),
+        (FAILED, "فشل"),
+    )
+    ACTIVE_STATUSES = (PENDING, RUNNING)
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    params_hash = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="export_jobs")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    filename = models.CharField(max_length=255, blank=True, default="")
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    content = models.BinaryField(null=True, blank=True, editable=False)
+    size = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        ordering = ("-id",)
+        indexes = [
+            models.Index(fields=["status", "id"], name="exportjob_status_idx"),
+        ]
+        constraints = [
+            # ✅ نفس الطلب ما بيكون إلا مرة وحدة بالطابور (بالانتظار/قيد التنفيذ)
+            models.UniqueConstraint(
+                fields=["params_hash"],
+                condition=models.Q(status__in=("pending", "running")),
+                name="exportjob_active_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+
+# =======================
+# فهرس البحث الشامل
+# =======================
+class SearchDocument(models.Model):
+    """
+    سطر لكل قيد/فاتورة/سند/عميل/مورد/منتج بنص مطبّع (search.normalize_arabic).
+    على SQLite بينربط بجدول FTS5 (rowid = id)، وعلى PostgreSQL عليه فهرس trigram.
+    بيتحدث مع الحفظ (search.connect_signals) والترحيل الجماعي، وأمر
+    rebuild_search_index بيعيد بناءه من الصفر.
+    """
+    kind = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True, default="")
+    body = models.TextField(blank=True, default="")
+    date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="searchdoc_kind_object_unique"),
+        ]
+
+    @classmethod
+    def reindex(cls, *objs):
+        """للأماكن اللي بتكتب بـ update() (ما في post_save)، مثل post_to_journal."""
+        from .search import index_objects
+
+        index_objects(objs)
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}: {self.title}"
@@ -0,0 +1,115 @@
+# accounting_app/pdf_toolkit.py
+"""
+أدوات PDF مشتركة (ReportLab) لكل تقارير البرنامج
+
+  - الخط العربي بيتسجّل مرة وحدة بالعملية (من AppConfig.ready)
+    بدل registerFont(TTFont(...)) وقراءة ملف الـ TTF مع كل تصدير
+  - ar(): reshape + bidi مع كاش LRU محدود
+    (أسماء الحسابات/العناوين بتتكرر آلاف المرات بنفس التقرير)
+  - arabic_style(): ParagraphStyle مشتركة حسب (الحجم، المحاذاة، ...)
+"""
+import os
+import threading
+from functools import lru_cache
+
+import arabic_reshaper
+from bidi.algorithm import get_display
+from django.conf import settings
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+FONT_NAME = "AR_FONT"
+FALLBACK_FONT = "Helvetica"
+
+AR_CACHE_SIZE = 8192
+
+_font_lock = threading.Lock()
+_font_name = None
+
+
+def _font_candidates():
+    base = settings.BASE_DIR
+    return [
+        os.path.join(base, "accounting_app", "static", "fonts", "Amiri-Regular.ttf"),
+        os.path.join(base, "inventory", "static", "inventory", "fonts", "Amiri-Regular.ttf"),
+        os.path.join(base, "inventory", "static", "fonts", "Amiri-Regular.ttf"),
+        os.path.join(base, "static", "fonts", "Amiri-Regular.ttf"),
+        r"C:\Windows\Fonts\arial.ttf",
+        # سيرفر Linux بدون Amiri: DejaVu فيه حروف عربية
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    ]
+
+
+def register_fonts() -> str:
+    """
+    يسجّل الخط العربي (أول مسار موجود) مرة وحدة ويرجع اسمه.
+    إذا ما في ولا خط: Helvetica (التصدير ما بيوقف، بس العربي ما بيطلع).
+    """
+    global _font_name
+    if _font_name:
+        return _font_name
+
+    with _font_lock:
+        if _font_name:
+            return _font_name
+
+        name = FALLBACK_FONT
+        for path in _font_candidates():
+            if not os.path.exists(path):
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont(FONT_NAME, path))
+                name = FONT_NAME
+                break
+            except Exception:
+                continue
+
+        _font_name = name
+        return name
+
+
+def arabic_font() -> str:
+    """اسم الخط الجاهز للاستعمال (بيسجّله لو لسا ما تسجّل)."""
+    return _font_name or register_fonts()
+
+
+@lru_cache(maxsize=AR_CACHE_SIZE)
+def _shape(text: str) -> str:
+    return get_display(arabic_reshaper.reshape(text))
+
+
+def ar(txt) -> str:
+    """شكل عربي + اتجاه صحيح (None = نص فاضي)."""
+    if txt is None:
+        return ""
+    text = str(txt)
+    # ✅ أرقام/تواريخ/أكواد لاتينية: ما بدها shaping وما بنعبّي الكاش فيها
+    if text.isascii():
+        return text
+    return _shape(text)
+
+
+@lru_cache(maxsize=None)
+def _sample_styles():
+    return getSampleStyleSheet()
+
+
+@lru_cache(maxsize=64)
+def arabic_style(size=11, alignment=1, leading=None, parent="Normal", space_after=None, font_name=None):
+    """
+    ParagraphStyle مشتركة (نفس الكائن لنفس الإعدادات).
+    alignment: 0 يسار، 1 وسط، 2 يمين
+    ⚠️ لا تعدّلي الـ style الراجع، اطلبي واحد بإعدادات ثانية.
+    """
+    font_name = font_name or arabic_font()
+    kwargs = dict(fontName=font_name, fontSize=size, alignment=alignment)
+    if leading:
+        kwargs["leading"] = leading
+    if space_after is not None:
+        kwargs["spaceAfter"] = space_after
+    return ParagraphStyle(
+        f"ar_{parent}_{size}_{alignment}_{leading or 0}_{space_after or 0}_{font_name}",
+        parent=_sample_styles()[parent],
+        **kwargs,
+    )
@@ -0,0 +1,333 @@
+# accounting_app/posting.py
+"""
+الترحيل الجماعي للمستندات غير المرحّلة (مبيعات / مشتريات / سندات)
+
+بدل post_to_journal لكل مستند لحاله (قفل تسلسل + create لكل سطر + FIFO لكل بند):
+  - المستندات بتنقسم chunks، وكل chunk = transaction وحدة
+  - أرقام القيود والسندات بتنحجز block لكل (نوع، فترة)
+  - JournalEntry / JournalLine / StockLayer / StockMovement بـ bulk_create
+  - FIFO للمبيعات: _FifoBook واحد لكل الـ chunk (نفس المخصّص وترتيب القفل تبع post_to_journal)
+  - أرصدة الفترات وأرصدة العملاء/الموردين وملخص المخزون بتتجمع بالذاكرة وبتنكتب مرة وحدة
+
+نفس القيود والأرقام والتحققات اللي بيعملها post_to_journal (سطور القيد من
+journal_lines/journal_description تبع كل مستند، نفس اللي بيستعمله post_to_journal)؛ المستند اللي فيه
+مشكلة (فترة مقفلة، مخزون غير كافي، ...) بينتسجل بالأخطاء وما بيوقف الباقي.
+الترتيب: المشتريات أولاً (عشان طبقاتها تكون متاحة للمبيعات) ثم المبيعات ثم السندات.
+"""
+import decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch
+
+from inventory.models import ProductStockSummary, StockLayer, StockMovement
+
+from .models import (
+    _FifoBook, _write_out_movements, AccountingConfig, AccountingPeriod, AccountPeriodBalance, DocumentSequence,
+    JournalEntry, JournalLine, PartyBalance, Payment, PurchaseInvoice, PurchaseItem,
+    SalesInvoice, SalesItem,
+)
+from .search import index_objects
+
+ZERO = decimal.Decimal("0")
+CENT = decimal.Decimal("0.01")
+
+KINDS = ("purchases", "sales", "payments")
+DEFAULT_CHUNK_SIZE = 500
+
+
+class _Periods:
+    """كل الفترات بالذاكرة (نفس منطق get_for_date: أحدث فترة تغطي التاريخ)."""
+
+    def __init__(self):
+        self.periods = list(AccountingPeriod.objects.order_by("-start_date"))
+        self._cache = {}
+
+    def for_date(self, d):
+        if d not in self._cache:
+            self._cache[d] = next((p for p in self.periods if p.start_date <= d <= p.end_date), None)
+        return self._cache[d]
+
+
+class _Batch:
+    """قيود chunk واحد قبل ما تنكتب (entries + lines + أرصدة)."""
+
+    def __init__(self, user):
+        self.user = user
+        self.entries = []      # (doc, JournalEntry, [JournalLine...])
+        self.deltas = {}       # (account_id, period_id) -> [debit, credit, count]
+
+    def add(self, doc, period, date, reference, description, lines):
+        je = JournalEntry(
+            period=period,
+            date=date,
+            reference=reference,
+            description=description,
+            created_by=self.user,
+        )
+        jls = []
+        for account, debit, credit, note in lines:
+            jls.append(JournalLine(account=account, debit=debit, credit=credit, note=note))
+            d = self.deltas.setdefault((account.id, period.id), [ZERO, ZERO, 0])
+            d[0] += debit
+            d[1] += credit
+            d[2] += 1
+        self.entries.append((doc, je, jls))
+
+    def write(self):
+        """يحجز أرقام القيود، ويكتب القيود والسطور والأرصدة."""
+        if not self.entries:
+            return
+
+        by_period = {}
+        for _doc, je, _lines in self.entries:
+            by_period.setdefault(je.period.id, []).append(je)
+        for period_id in sorted(by_period):
+            entries = by_period[period_id]
+            period = entries[0].period
+            first = DocumentSequence.next_block("JE", period=period, n=len(entries))
+            for i, je in enumerate(entries):
+                je.serial_number = f"JE-{period.name}-{first + i:06d}"
+
+        JournalEntry.objects.bulk_create([je for _d, je, _l in self.entries], batch_size=1000)
+
+        lines = []
+        for _doc, je, jls in self.entries:
+            for jl in jls:
+                jl.entry = je
+                lines.append(jl)
+        JournalLine.objects.bulk_create(lines, batch_size=1000)
+
+        AccountPeriodBalance.bump_many(self.deltas)
+
+        party_deltas = {}
+        for doc, je, _lines in self.entries:
+            doc.journal_entry = je
+            delta = PartyBalance.document_delta(doc)
+            if delta:
+                key, invoiced, paid = delta
+                d = party_deltas.setdefault(key, [ZERO, ZERO, 0])
+                d[0] += invoiced
+                d[1] += paid
+                d[2] += 1
+        PartyBalance.bump_many(party_deltas)
+
+
+def _check_period(periods, d):
+    p = periods.for_date(d)
+    if not p:
+        raise ValidationError("لا توجد فترة محاسبية تغطي تاريخ المستند. أنشئي فترة أولاً.")
+    if p.is_closed:
+        raise ValidationError(f"لا يمكن الترحيل: الفترة {p.name} مقفلة")
+    return p
+
+
+def _items_total(items):
+    return sum((i.line_total() for i in items), ZERO).quantize(CENT)
+
+
+def _post_purchases(docs, cfg, periods, batch):
+    layers, movements = [], []
+    qty_in, value_in = {}, {}
+    posted, errors = [], []
+
+    for inv in docs:
+        try:
+            period = _check_period(periods, inv.date)
+            items = list(inv.items.all())
+            if not items:
+                raise ValidationError("لا يمكن ترحيل فاتورة مشتريات بدون بنود أصناف.")
+            total = _items_total(items)
+            if total <= 0:
+                raise ValidationError("إجمالي الفاتورة يجب أن يكون أكبر من صفر.")
+            lines = inv.journal_lines(cfg, total)
+        except ValidationError as e:
+            errors.append(("purchases", inv.id, "; ".join(e.messages)))
+            continue
+
+        inv.total = total
+        batch.add(inv, period, inv.date, inv.invoice_number or "", inv.journal_description(), lines)
+
+        # نفس _stock_in لكن bulk
+        for item in items:
+            qty = decimal.Decimal(item.qty)
+            cost = decimal.Decimal(item.price).quantize(decimal.Decimal("0.0001"))
+            if qty <= 0:
+                continue
+            layers.append(StockLayer(product_id=item.product_id, qty_remaining=qty, cost=cost))
+            movements.append(StockMovement(
+                product_id=item.product_id, movement_type="in", qty=qty, unit_cost=cost,
+                related_invoice=inv.invoice_number or "",
+            ))
+            qty_in[item.product_id] = qty_in.get(item.product_id, ZERO) + qty
+            value_in[item.product_id] = value_in.get(item.product_id, ZERO) + qty * cost
+        posted.append(inv)
+
+    def finish():
+        StockLayer.objects.bulk_create(layers, batch_size=1000)
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+        for product_id in sorted(qty_in):
+            ProductStockSummary.apply(product_id, qty_in[product_id], value_in[product_id])
+        PurchaseInvoice.objects.bulk_update(posted, ["journal_entry", "total"], batch_size=1000)
+
+    return posted, errors, finish
+
+
+def _post_sales(docs, cfg, periods, batch):
+    with_cost = bool(cfg.cogs_account and cfg.inventory_account)
+
+    book = None
+    if with_cost:
+        product_ids = {item.product_id for inv in docs for item in inv.items.all()}
+        book = _FifoBook(product_ids)
+
+    movements = []
+    posted, errors = [], []
+
+    for inv in docs:
+        try:
+            period = _check_period(periods, inv.date)
+            items = list(inv.items.all())
+            if not items:
+                raise ValidationError("لا يمكن ترحيل فاتورة مبيعات بدون بنود أصناف.")
+            total = _items_total(items)
+            if total <= 0:
+                raise ValidationError("إجمالي الفاتورة يجب أن يكون أكبر من صفر.")
+
+            inv_movements = []
+            total_cost = ZERO
+            if with_cost:
+                # الفاتورة يا بتنصرف كاملة يا ما بتغيّر شي بالـ book (الفحص قبل الصرف)
+                results = book.allocate([(item.product, item.qty) for item in items])
+                for item, (allocations, cost) in zip(items, results):
+                    qty = decimal.Decimal(item.qty)
+                    if qty <= 0:
+                        continue
+                    total_cost += cost
+                    inv_movements.append((StockMovement(
+                        product_id=item.product_id, movement_type="out", qty=qty, unit_cost=cost / qty,
+                        related_invoice=inv.invoice_number or "",
+                    ), allocations))
+        except ValidationError as e:
+            errors.append(("sales", inv.id, "; ".join(e.messages)))
+            continue
+
+        inv.total = total
+        batch.add(
+            inv, period, inv.date, inv.invoice_number or "", inv.journal_description(),
+            inv.journal_lines(cfg, total, total_cost),
+        )
+        movements += inv_movements
+        posted.append(inv)
+
+    def finish():
+        if book:
+            book.flush()
+        _write_out_movements(movements)
+        SalesInvoice.objects.bulk_update(posted, ["journal_entry", "total"], batch_size=1000)
+
+    return posted, errors, finish
+
+
+def _post_payments(docs, cfg, periods, batch):
+    posted, errors = [], []
+    missing_numbers = {}
+
+    for p in docs:
+        try:
+            period = _check_period(periods, p.date)
+            lines = p.journal_lines(cfg)
+        except ValidationError as e:
+            errors.append(("payments", p.id, "; ".join(e.messages)))
+            continue
+
+        if not p.voucher_number:
+            missing_numbers.setdefault((p._doc_type(), period.id), (period, []))[1].append(p)
+
+        p.is_locked = True
+        posted.append((p, period, p.journal_description(), lines))
+
+    # أرقام السندات الناقصة: block لكل (نوع، فترة)
+    for (doc_type, _pid), (period, payments) in sorted(missing_numbers.items()):
+        first = DocumentSequence.next_block(doc_type, period=period, n=len(payments))
+        for i, p in enumerate(payments):
+            p.voucher_number = f"{doc_type}-{period.name}-{first + i:06d}"
+
+    for p, period, description, lines in posted:
+        batch.add(p, period, p.date, p.voucher_number or "", description, lines)
+
+    posted = [p for p, *_rest in posted]
+
+    def finish():
+        Payment.objects.bulk_update(posted, ["journal_entry", "is_locked", "voucher_number"], batch_size=1000)
+
+    return posted, errors, finish
+
+
+def _pending_queryset(kind, date_from=None, date_to=None, ids=None):
+    if kind == "purchases":
+        qs = PurchaseInvoice.objects.select_related("supplier").prefetch_related(
+            Prefetch("items", queryset=PurchaseItem.objects.order_by("id"))
+        )
+    elif kind == "sales":
+        qs = SalesInvoice.objects.select_related("customer").prefetch_related(
+            Prefetch("items", queryset=SalesItem.objects.select_related("product").order_by("id"))
+        )
+    else:
+        qs = Payment.objects.select_related("customer", "supplier", "cash_account")
+
+    qs = qs.filter(journal_entry__isnull=True)
+    if date_from:
+        qs = qs.filter(date__gte=date_from)
+    if date_to:
+        qs = qs.filter(date__lte=date_to)
+    if ids is not None:
+        qs = qs.filter(id__in=ids)
+    return qs.order_by("date", "id")
+
+
+POSTERS = {
+    "purchases": _post_purchases,
+    "sales": _post_sales,
+    "payments": _post_payments,
+}
+
+
+def post_pending(kinds=KINDS, date_from=None, date_to=None, ids=None, chunk_size=DEFAULT_CHUNK_SIZE, user=None, progress=None):
+    """
+    يرحّل كل المستندات غير المرحّلة (أو ids محددة لكل نوع: {"sales": [..], ...}).
+    كل chunk = transaction؛ لو صار خطأ DB بـ chunk، الـ chunks اللي قبله بتضل مرحّلة.
+
+    ترجع dict: {"posted": {kind: n}, "errors": [(kind, id, message), ...]}
+    progress: callable اختياري (kind, posted_so_far, errors_so_far)
+    """
+    cfg = AccountingConfig.get_config()
+    result = {"posted": {k: 0 for k in KINDS}, "errors": []}
+
+    for kind in KINDS:
+        if kind not in kinds:
+            continue
+        kind_ids = ids.get(kind, []) if ids is not None else None
+        pending = list(_pending_queryset(kind, date_from, date_to, kind_ids).values_list("id", flat=True))
+
+        for start in range(0, len(pending), chunk_size):
+            chunk_ids = pending[start:start + chunk_size]
+            with transaction.atomic():
+                # قفل المستندات نفسها + إعادة الفحص (ممكن تترحّل من مكان ثاني بهالأثناء)
+                docs = list(
+                    _pending_queryset(kind, ids=chunk_ids).select_for_update(of=("self",))
+                )
+                periods = _Periods()
+                batch = _Batch(user)
+                posted, errors, finish = POSTERS[kind](docs, cfg, periods, batch)
+                batch.write()
+                finish()
+                # القيود والمستندات انكتبت bulk/update => فهرس البحث يدوي
+                index_objects([je for _doc, je, _lines in batch.entries] + list(posted))
+
+            result["posted"][kind] += len(posted)
+            result["errors"] += errors
+            if progress:
+                progress(kind, result["posted"][kind], len(result["errors"]))
+
+    return result
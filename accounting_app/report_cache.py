@@ -0,0 +1,47 @@
+# accounting_app/report_cache.py
+"""
+كاش نتائج التقارير (ميزان المراجعة، قائمة الدخل، الميزانية)
+
+المفتاح = (اسم التقرير، الفلاتر، LedgerVersion):
+  - أي كتابة على القيود/السطور/الحسابات/الفترات بتزيد النسخة (models.LedgerVersion)
+    فالمفتاح بيتغيّر لحاله وما في داعي نمسح شي — النسخ القديمة بتنتهي بالـ TIMEOUT
+  - فتح التقرير مرة ثانية بدون ترحيل = استعلام واحد (النسخة) + قراءة من الكاش
+
+⚠️ بنخزّن البيانات بس (dict/list/Decimal) مش الـ HTML، لأن الصفحة فيها
+   المستخدم والرسائل والـ csrf.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import LedgerVersion
+
+CACHE_ALIAS = "reports"
+
+
+def _cache():
+    alias = CACHE_ALIAS if CACHE_ALIAS in settings.CACHES else "default"
+    return caches[alias]
+
+
+def report_key(name, params, version):
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+    return f"report:{name}:v{version}:{digest}"
+
+
+def cached_report(name, params, compute):
+    """
+    يرجع نتيجة compute() من الكاش إذا محسوبة لنفس الفلاتر ونفس نسخة الدفتر.
+    ✅ النسخة بتنقرأ قبل الحساب: إذا صار ترحيل بالنص النتيجة بتنحفظ على
+       النسخة القديمة (اللي ما حدا رح يطلبها بعد هيك)، فما في نتيجة قديمة بتنرجع.
+    """
+    key = report_key(name, params, LedgerVersion.current())
+    cache = _cache()
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, getattr(settings, "REPORT_CACHE_TIMEOUT", 3600))
+    return result
@@ -0,0 +1,496 @@
+# accounting_app/search.py
+"""
+البحث الشامل (قيود، فواتير مبيعات/مشتريات، سندات، عملاء، موردين، منتجات)
+
+  - كل مستند إله سطر بـ SearchDocument: عنوان + نص مطبّع (body)
+  - SQLite: جدول FTS5 (accounting_app_searchfts، rowid = SearchDocument.id)
+    والترتيب بـ bm25 (العنوان وزنه أعلى)
+  - PostgreSQL: فهرس GIN trigram على body (pg_trgm) والترتيب بـ word_similarity
+  - غير هيك: LIKE عادي على body (نفس النتائج، بدون فهرس)
+
+التطبيع العربي (نفسه للفهرسة وللبحث):
+  أ إ آ ٱ => ا ، ى => ي ، ة => ه ، ؤ => و ، ئ => ي ، بدون تشكيل وتطويل،
+  والأرقام العربية/الفارسية => 0-9
+وبالفهرسة بنضيف صيغ إضافية: الكلمة بدون "ال" (الشركة => شركه)
+والأرقام بدون الأصفار البادئة (000123 => 123) عشان "123" تلاقي JE-2025-01-000123.
+
+الفهرس بيتحدث مع كل save/delete (connect_signals)، ومع post_to_journal والترحيل
+الجماعي (لأنهم بيكتبوا بـ update/bulk)، وأمر rebuild_search_index بيعيد بناءه.
+"""
+import re
+
+from django.apps import apps
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.urls import reverse
+from django.utils.http import urlencode
+
+FTS_TABLE = "accounting_app_searchfts"
+PAGE_SIZE = 20
+
+_TASHKEEL = re.compile("[ً-ْٰـ]")
+_CHARS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # ٠-٩
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # ۰-۹ (فارسي)
+})
+_WORD = re.compile(r"\w+")
+_ARTICLES = ("وال", "بال", "كال", "فال", "ال", "لل")
+
+
+def normalize_arabic(text):
+    """نص => نص مطبّع (حروف صغيرة، بدون تشكيل، همزات/ياء/تاء مربوطة موحدة)."""
+    if not text:
+        return ""
+    return _TASHKEEL.sub("", str(text)).translate(_CHARS).lower()
+
+
+def _strip_article(word):
+    for prefix in _ARTICLES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+            return word[len(prefix):]
+    return word
+
+
+def _variants(words):
+    """الصيغ الإضافية للفهرسة: بدون "ال" وبدون أصفار بادئة."""
+    extra = []
+    for w in words:
+        bare = _strip_article(w)
+        if bare != w:
+            extra.append(bare)
+        if w.isdigit() and w.startswith("0") and w.strip("0"):
+            extra.append(w.lstrip("0"))
+    return extra
+
+
+def index_text(*parts):
+    """نص الـ body للفهرسة: كل الأجزاء مطبّعة + الصيغ الإضافية."""
+    text = normalize_arabic(" ".join(str(p) for p in parts if p))
+    words = _WORD.findall(text)
+    return " ".join([text, *_variants(words)]).strip()
+
+
+def query_terms(q):
+    """كلمات البحث المطبّعة (بدون "ال")."""
+    return [_strip_article(w) for w in _WORD.findall(normalize_arabic(q))]
+
+
+# =======================
+# المصادر
+# =======================
+def _je_title(je):
+    return je.serial_number or f"قيد #{je.id}"
+
+
+def _serial(obj):
+    je = obj.journal_entry
+    return je.serial_number if je else ""
+
+
+def _party_name(obj):
+    party = obj.customer or obj.supplier
+    return party.name if party else ""
+
+
+SOURCES = {
+    "journal_entry": {
+        "model": "accounting_app.JournalEntry",
+        "label": "قيد يومية",
+        "related": (),
+        "title": _je_title,
+        "subtitle": lambda je: je.description,
+        "text": lambda je: (je.serial_number, je.reference, je.description),
+        "date": lambda je: je.date,
+        "url": lambda doc: reverse("account:journal_entries") + "?" + urlencode({"q": doc.title}),
+    },
+    "sales_invoice": {
+        "model": "accounting_app.SalesInvoice",
+        "label": "فاتورة مبيعات",
+        "related": ("customer", "journal_entry"),
+        "title": lambda inv: f"فاتورة مبيعات {inv.invoice_number or '#' + str(inv.id)}",
+        "subtitle": lambda inv: f"{inv.customer.name} - {inv.total}",
+        "text": lambda inv: (inv.invoice_number, inv.customer.name, _serial(inv)),
+        "date": lambda inv: inv.date,
+        "url": lambda doc: reverse("account:sales_invoice_pdf", args=[doc.object_id]),
+    },
+    "purchase_invoice": {
+        "model": "accounting_app.PurchaseInvoice",
+        "label": "فاتورة مشتريات",
+        "related": ("supplier", "journal_entry"),
+        "title": lambda inv: f"فاتورة مشتريات {inv.invoice_number or '#' + str(inv.id)}",
+        "subtitle": lambda inv: f"{inv.supplier.name} - {inv.total}",
+        "text": lambda inv: (inv.invoice_number, inv.supplier.name, _serial(inv)),
+        "date": lambda inv: inv.date,
+        "url": lambda doc: reverse("account:purchase_invoice_pdf", args=[doc.object_id]),
+    },
+    "payment": {
+        "model": "accounting_app.Payment",
+        "label": "سند",
+        "related": ("customer", "supplier", "journal_entry"),
+        "title": lambda p: ("سند قبض" if p.payment_type == "RECEIPT" else "سند صرف") + f" {p.voucher_number or '#' + str(p.id)}",
+        "subtitle": lambda p: f"{_party_name(p)} - {p.amount}",
+        "text": lambda p: (p.voucher_number, _party_name(p), p.note, _serial(p)),
+        "date": lambda p: p.date,
+        "url": lambda doc: reverse("account:payment_print", args=[doc.object_id]),
+    },
+    "customer": {
+        "model": "accounting_app.Customer",
+        "label": "عميل",
+        "related": (),
+        "title": lambda c: c.name,
+        "subtitle": lambda c: c.contact[:255],
+        "text": lambda c: (c.name, c.contact),
+        "date": lambda c: None,
+        "url": lambda doc: reverse("account:customer_statement", args=[doc.object_id]),
+        # اسم العميل جزء من نص فواتيره وسنداته
+        "dependents": (("sales_invoice", "customer"), ("payment", "customer")),
+    },
+    "supplier": {
+        "model": "accounting_app.Supplier",
+        "label": "مورد",
+        "related": (),
+        "title": lambda s: s.name,
+        "subtitle": lambda s: s.contact[:255],
+        "text": lambda s: (s.name, s.contact),
+        "date": lambda s: None,
+        "url": lambda doc: reverse("account:supplier_statement", args=[doc.object_id]),
+        "dependents": (("purchase_invoice", "supplier"), ("payment", "supplier")),
+    },
+    "product": {
+        "model": "inventory.Product",
+        "label": "منتج",
+        "related": (),
+        "title": lambda p: p.name,
+        "subtitle": lambda p: p.sku,
+        "text": lambda p: (p.name, p.sku),
+        "date": lambda p: None,
+        "url": lambda doc: reverse("inventory:product_detail", args=[doc.object_id]),
+    },
+}
+
+KIND_CHOICES = [(kind, spec["label"]) for kind, spec in SOURCES.items()]
+_KIND_BY_MODEL = {spec["model"].lower(): kind for kind, spec in SOURCES.items()}
+
+
+def kind_for(obj):
+    return _KIND_BY_MODEL.get(obj._meta.label_lower)
+
+
+def _use_fts():
+    """SQLite + جدول FTS5 موجود (الترحيل 0019 بينشئه إذا FTS5 متاح)."""
+    if connection.vendor != "sqlite":
+        return False
+    if getattr(connection, "_search_fts_ready", False):
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        ready = cursor.fetchone() is not None
+    # ✅ بنحفظ "موجود" بس (الجدول ممكن ينخلق بعدين بالترحيل)
+    connection._search_fts_ready = ready
+    return ready
+
+
+# =======================
+# الفهرسة
+# =======================
+def _document_values(kind, obj):
+    spec = SOURCES[kind]
+    return {
+        "title": str(spec["title"](obj) or "")[:255],
+        "subtitle": str(spec["subtitle"](obj) or "")[:255],
+        "body": index_text(*spec["text"](obj)),
+        "date": spec["date"](obj),
+    }
+
+
+def _write_fts(docs):
+    """docs: [(id, title, body)] => نفس الصفوف بجدول FTS5."""
+    if not docs or not _use_fts():
+        return
+    with connection.cursor() as cursor:
+        ids = [d[0] for d in docs]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(chunk))})", chunk,
+            )
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+            [(doc_id, normalize_arabic(title), body) for doc_id, title, body in docs],
+        )
+
+
+def index_objects(objs, get_model=apps.get_model):
+    """
+    يحدّث/ينشئ SearchDocument لكل obj (أي موديل من SOURCES، والباقي بيتجاهل).
+    بيكتب بس الصفوف اللي تغيّرت. يرجع set من (kind, object_id) اللي تغيّرت.
+    """
+    SearchDocument = get_model("accounting_app", "SearchDocument")
+    by_kind = {}
+    for obj in objs:
+        kind = kind_for(obj)
+        if kind and obj.pk:
+            by_kind.setdefault(kind, {})[obj.pk] = obj
+
+    changed = set()
+    fts_rows = []
+    for kind, objects in by_kind.items():
+        existing = {
+            d.object_id: d
+            for d in SearchDocument.objects.filter(kind=kind, object_id__in=list(objects))
+        }
+        to_create, to_update = [], []
+        for object_id, obj in objects.items():
+            values = _document_values(kind, obj)
+            doc = existing.get(object_id)
+            if doc is None:
+                to_create.append(SearchDocument(kind=kind, object_id=object_id, **values))
+            elif any(getattr(doc, f) != v for f, v in values.items()):
+                for f, v in values.items():
+                    setattr(doc, f, v)
+                to_update.append(doc)
+            else:
+                continue
+            changed.add((kind, object_id))
+
+        if to_create:
+            SearchDocument.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+            # ✅ ids الجديدة (ignore_conflicts ما بيرجعها)
+            new_ids = [d.object_id for d in to_create]
+            to_create = list(SearchDocument.objects.filter(kind=kind, object_id__in=new_ids))
+        if to_update:
+            SearchDocument.objects.bulk_update(to_update, ["title", "subtitle", "body", "date", "updated_at"], batch_size=500)
+        fts_rows += [(d.id, d.title, d.body) for d in to_create + to_update]
+
+    _write_fts(fts_rows)
+    return changed
+
+
+def remove_objects(objs, get_model=apps.get_model):
+    SearchDocument = get_model("accounting_app", "SearchDocument")
+    keys = {}
+    for obj in objs:
+        kind = kind_for(obj)
+        if kind:
+            keys.setdefault(kind, []).append(obj.pk)
+    for kind, object_ids in keys.items():
+        qs = SearchDocument.objects.filter(kind=kind, object_id__in=object_ids)
+        doc_ids = list(qs.values_list("id", flat=True))
+        qs.delete()
+        if doc_ids and _use_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(doc_ids))})", doc_ids,
+                )
+
+
+def source_queryset(kind, get_model=apps.get_model):
+    spec = SOURCES[kind]
+    qs = get_model(spec["model"]).objects.all()
+    if spec["related"]:
+        qs = qs.select_related(*spec["related"])
+    return qs
+
+
+def reindex_dependents(kind, object_id, get_model=apps.get_model):
+    """عميل/مورد تغيّر اسمه => فواتيره وسنداته."""
+    for dep_kind, field in SOURCES[kind].get("dependents", ()):
+        qs = source_queryset(dep_kind, get_model).filter(**{f"{field}_id": object_id})
+        for start_objs in _chunks(qs.order_by("id").iterator(chunk_size=1000), 1000):
+            index_objects(start_objs, get_model)
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def rebuild(get_model=apps.get_model, kinds=None, progress=None):
+    """يمسح الفهرس ويبنيه من الصفر. يرجع {kind: عدد المستندات}."""
+    SearchDocument = get_model("accounting_app", "SearchDocument")
+    kinds = list(kinds or SOURCES)
+    SearchDocument.objects.filter(kind__in=kinds).delete()
+    if _use_fts():
+        with connection.cursor() as cursor:
+            if set(kinds) == set(SOURCES):
+                cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            else:
+                cursor.execute(
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid NOT IN (SELECT id FROM {SearchDocument._meta.db_table})"
+                )
+
+    counts = {}
+    for kind in kinds:
+        counts[kind] = 0
+        qs = source_queryset(kind, get_model).order_by("pk")
+        for chunk in _chunks(qs.iterator(chunk_size=1000), 1000):
+            counts[kind] += len(index_objects(chunk, get_model))
+            if progress:
+                progress(kind, counts[kind])
+    return counts
+
+
+# =======================
+# البحث
+# =======================
+def _fts_match(terms):
+    # كل كلمة prefix ("شرك"* بتلاقي شركه)، والكلمات AND.
+    # ("123" OR "123"*): المطابقة الكاملة بتنحسب مرتين بـ bm25 => بتطلع قبل 12399
+    # و"000123" بتطابق كمان 123 (الصيغة المفهرسة بدون أصفار)
+    parts = []
+    for t in terms:
+        quoted = '"{}"'.format(t.replace('"', '""'))
+        alternatives = [quoted, f"{quoted}*"]
+        if t.isdigit() and t.startswith("0") and t.strip("0"):
+            alternatives.append('"{}"'.format(t.lstrip("0")))
+        parts.append("(" + " OR ".join(alternatives) + ")")
+    return " AND ".join(parts)
+
+
+class SearchResults:
+    """
+    نتائج مرتبة حسب الصلة (ثم الأحدث). بتدعم count() والـ slicing => Paginator.
+    كل عنصر SearchDocument ومعه .url و .kind_label
+    """
+
+    def __init__(self, q, kind=None):
+        from .models import SearchDocument
+
+        self.model = SearchDocument
+        self.terms = query_terms(q)
+        self.kind = kind if kind in SOURCES else None
+        self._count = None
+
+    def _orm_queryset(self):
+        qs = self.model.objects.all()
+        if self.kind:
+            qs = qs.filter(kind=self.kind)
+        for t in self.terms:
+            qs = qs.filter(body__contains=t)
+        return qs
+
+    def count(self):
+        if self._count is None:
+            if not self.terms:
+                self._count = 0
+            elif _use_fts():
+                sql, params = self._fts_sql("COUNT(*)")
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    self._count = cursor.fetchone()[0]
+            else:
+                self._count = self._orm_queryset().count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def _fts_sql(self, select, tail=""):
+        doc_table = self.model._meta.db_table
+        sql = (
+            f"SELECT {select} FROM {FTS_TABLE} f CROSS JOIN {doc_table} d ON d.id = f.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s"
+        )
+        params = [_fts_match(self.terms)]
+        if self.kind:
+            sql += " AND d.kind = %s"
+            params.append(self.kind)
+        return sql + tail, params
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = key.stop if key.stop is not None else self.count()
+        if not self.terms or stop <= start:
+            return []
+
+        if _use_fts():
+            sql, params = self._fts_sql(
+                "d.id", f" ORDER BY bm25({FTS_TABLE}, 10.0, 1.0), d.date DESC, d.id DESC LIMIT %s OFFSET %s",
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params + [stop - start, start])
+                ids = [r[0] for r in cursor.fetchall()]
+            found = self.model.objects.in_bulk(ids)
+            docs = [found[i] for i in ids if i in found]
+        else:
+            qs = self._orm_queryset()
+            if connection.vendor == "postgresql":
+                from django.db.models.expressions import RawSQL
+
+                qs = qs.annotate(rank=RawSQL("word_similarity(%s, body)", [" ".join(self.terms)]))
+                qs = qs.order_by("-rank", "-date", "-id")
+            else:
+                qs = qs.order_by("-date", "-id")
+            docs = list(qs[start:stop])
+
+        for doc in docs:
+            spec = SOURCES.get(doc.kind)
+            doc.kind_label = spec["label"] if spec else doc.kind
+            doc.url = spec["url"](doc) if spec else ""
+        return docs
+
+
+def search(q, kind=None):
+    return SearchResults(q, kind)
+
+
+def matching_ids(kind, q):
+    """
+    subquery لـ object_id المطابقة (للفلترة بـ id__in داخل شاشات القوائم):
+        JournalEntry.objects.filter(id__in=matching_ids("journal_entry", q))
+    """
+    from django.db.models.expressions import RawSQL
+
+    from .models import SearchDocument
+
+    terms = query_terms(q)
+    qs = SearchDocument.objects.filter(kind=kind)
+    if not terms:
+        return qs.none().values("object_id")
+    if _use_fts():
+        # ✅ CROSS JOIN = SQLite بيلتزم بالترتيب: FTS أولاً ثم المستند بالـ id
+        #    (بدونه ممكن يمسح كل مستندات النوع ويعمل MATCH لكل صف => ثواني)
+        return RawSQL(
+            f"SELECT d.object_id FROM {FTS_TABLE} f CROSS JOIN {SearchDocument._meta.db_table} d ON d.id = f.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND d.kind = %s",
+            [_fts_match(terms), kind],
+        )
+    return qs.filter(Q(*[Q(body__contains=t) for t in terms])).values("object_id")
+
+
+# =======================
+# التحديث مع الحفظ
+# =======================
+def _on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    kind = kind_for(instance)
+    related = SOURCES[kind]["related"]
+    if related:
+        # ✅ save() ما بيحمّل العلاقات؛ نجيبها مرة وحدة
+        instance = source_queryset(kind).filter(pk=instance.pk).first() or instance
+    changed = index_objects([instance])
+    if changed and SOURCES[kind].get("dependents") and not kwargs.get("created"):
+        reindex_dependents(kind, instance.pk)
+
+
+def _on_delete(sender, instance, **kwargs):
+    remove_objects([instance])
+
+
+def connect_signals():
+    for kind, spec in SOURCES.items():
+        model = apps.get_model(spec["model"])
+        post_save.connect(_on_save, sender=model, dispatch_uid=f"search_index_save_{kind}")
+        post_delete.connect(_on_delete, sender=model, dispatch_uid=f"search_index_delete_{kind}")
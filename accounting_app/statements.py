@@ -0,0 +1,291 @@
+# accounting_app/statements.py
+"""
+محرك كشف حساب العميل/المورد
+
+  - الرصيد الافتتاحي: استعلام واحد SUM على (فواتير UNION ALL سندات) قبل بداية الفترة
+  - الحركات: UNION ALL للفواتير والسندات مرتبة بالداتابيس (date, kind, id)
+  - الرصيد الجاري: SUM(...) OVER (ORDER BY ...) بالداتابيس
+  - صفحات keyset: كل صفحة = "بعد آخر مفتاح" + LIMIT لكل فرع من الـ UNION،
+    والرصيد الجاري لآخر سطر بيتحمل بالـ cursor (زي ledger.py)،
+    فالصفحة ما بتقرأ إلا سطورها حتى لو العميل عنده 50 ألف فاتورة
+
+✅ بس المستندات المرحّلة وقيدها مش معكوس (posted_sql)، نفس تعريف PartyBalance
+   وأعمار الذمم: الرصيد الختامي للكشف = الرصيد بقائمة العملاء/الموردين.
+   المسودات (بدون قيد) والمستندات الملغية بقيد عكسي ما بتطلع بالكشف.
+
+✅ المبالغ بتنجمع كـ قروش (BIGINT) بالـ SQL، فالنتيجة Decimal مضبوطة
+   حتى على SQLite (اللي بيخزّن الـ Decimal كـ REAL) — بدون float بالحساب.
+"""
+import datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.db import connection
+
+from .models import JournalEntry, Payment, PurchaseInvoice, SalesInvoice
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+CURSOR_SALT = "accounting_app.statements"
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 5000
+
+# kind: ترتيب الحركات بنفس التاريخ (نفس ترتيب المرجع القديم: RC قبل SI، PI قبل PV)
+#   side: وين بينزل المبلغ (debit/credit)
+#   sign: الرصيد = sign × (مدين - دائن)
+#         عميل: الفاتورة بتزيد الذمم (مدين)، مورد: الفاتورة بتزيد المستحق له (دائن)
+STATEMENTS = {
+    "customer": {
+        "party_field": "customer_id",
+        "sign": 1,
+        "branches": (
+            {
+                "model": Payment, "kind": 0, "amount": "amount", "side": "credit",
+                "note": "note", "doc": "سند قبض", "prefix": "RC",
+                "extra": ("payment_type", Payment.RECEIPT),
+            },
+            {
+                "model": SalesInvoice, "kind": 1, "amount": "total", "side": "debit",
+                "note": None, "doc": "فاتورة بيع", "prefix": "SI",
+            },
+        ),
+    },
+    "supplier": {
+        "party_field": "supplier_id",
+        "sign": -1,
+        "branches": (
+            {
+                "model": PurchaseInvoice, "kind": 0, "amount": "total", "side": "credit",
+                "note": None, "doc": "فاتورة شراء", "prefix": "PI",
+            },
+            {
+                "model": Payment, "kind": 1, "amount": "amount", "side": "debit",
+                "note": "note", "doc": "سند صرف", "prefix": "PV",
+                "extra": ("payment_type", Payment.DISBURSE),
+            },
+        ),
+    },
+}
+
+
+def clamp_page_size(value):
+    try:
+        size = int(value or DEFAULT_PAGE_SIZE)
+    except (TypeError, ValueError):
+        size = DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(state):
+    return signing.dumps(state, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    """يرجع dict أو None إذا الـ cursor فاضي/معدّل."""
+    if not token:
+        return None
+    try:
+        return signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+
+
+def _iso(value):
+    return value.isoformat() if value else ""
+
+
+def _filters_key(kind, party_id, date_from, date_to):
+    return [kind, int(party_id), _iso(date_from), _iso(date_to)]
+
+
+def _cents(expr):
+    return f"CAST(ROUND(({expr}) * 100) AS BIGINT)"
+
+
+def _from_cents(value):
+    return (Decimal(int(value or 0)) / 100).quantize(CENT)
+
+
+def posted_sql(meta):
+    """شرط "مرحّل وقيده مش معكوس" على جدول مستند (journal_entry_id)، ببارامتر واحد (False)."""
+    qn = connection.ops.quote_name
+    je = JournalEntry._meta
+    return (
+        f"{qn(meta.get_field('journal_entry').column)} IN ("
+        f"SELECT {qn(je.pk.column)} FROM {qn(je.db_table)} WHERE {qn(je.get_field('is_reversed').column)} = %s)"
+    )
+
+
+def _branch(branch, party_field, party_id, date_from=None, date_to=None, before=None, after=None, limit=None):
+    """
+    SELECT لفرع واحد (فواتير أو سندات) + params.
+    after: (date_iso, kind, id) آخر مفتاح بالصفحة السابقة
+    """
+    qn = connection.ops.quote_name
+    meta = branch["model"]._meta
+    date_col = qn(meta.get_field("date").column)
+    id_col = qn(meta.pk.column)
+    amount = qn(meta.get_field(branch["amount"]).column)
+    debit = _cents(amount) if branch["side"] == "debit" else "0"
+    credit = _cents(amount) if branch["side"] == "credit" else "0"
+    note = qn(meta.get_field(branch["note"]).column) if branch["note"] else "''"
+
+    where = [f"{qn(party_field)} = %s", posted_sql(meta)]
+    params = [party_id, False]
+    if branch.get("extra"):
+        field, value = branch["extra"]
+        where.append(f"{qn(meta.get_field(field).column)} = %s")
+        params.append(value)
+    if date_from:
+        where.append(f"{date_col} >= %s")
+        params.append(_iso(date_from))
+    if date_to:
+        where.append(f"{date_col} <= %s")
+        params.append(_iso(date_to))
+    if before:
+        where.append(f"{date_col} < %s")
+        params.append(_iso(before))
+    if after:
+        last_date, last_kind, last_id = after
+        if branch["kind"] > last_kind:
+            where.append(f"{date_col} >= %s")
+            params.append(last_date)
+        elif branch["kind"] < last_kind:
+            where.append(f"{date_col} > %s")
+            params.append(last_date)
+        else:
+            where.append(f"({date_col} > %s OR ({date_col} = %s AND {id_col} > %s))")
+            params += [last_date, last_date, last_id]
+
+    sql = (
+        f"SELECT {date_col} AS mdate, {branch['kind']} AS kind, {id_col} AS mid, "
+        f"{debit} AS debit, {credit} AS credit, {note} AS note "
+        f"FROM {qn(meta.db_table)} WHERE {' AND '.join(where)}"
+    )
+    if limit:
+        sql = f"SELECT * FROM ({sql} ORDER BY {date_col}, {id_col} LIMIT {int(limit)}) AS b{branch['kind']}"
+    return sql, params
+
+
+def _union(spec, party_id, **kwargs):
+    parts, params = [], []
+    for branch in spec["branches"]:
+        sql, p = _branch(branch, spec["party_field"], party_id, **kwargs)
+        parts.append(sql)
+        params += p
+    return " UNION ALL ".join(parts), params
+
+
+def opening_balance(kind, party_id, date_from):
+    """الرصيد قبل date_from (استعلام واحد)."""
+    if not date_from:
+        return ZERO
+    spec = STATEMENTS[kind]
+    union_sql, params = _union(spec, party_id, before=date_from)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COALESCE(SUM(debit - credit), 0) FROM ({union_sql}) AS m", params)
+        (cents,) = cursor.fetchone()
+    return spec["sign"] * _from_cents(cents)
+
+
+def _first_state(kind, party_id, date_from, date_to):
+    opening = opening_balance(kind, party_id, date_from)
+    return {
+        "filters": _filters_key(kind, party_id, date_from, date_to),
+        "after": None,
+        "page": 1,
+        "count": 0,
+        "opening": str(opening),
+        "running": str(opening),
+    }
+
+
+def statement_page(kind, party_id, date_from=None, date_to=None, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    ترجع dict:
+      rows (date, kind, doc, ref, note, debit, credit, balance, n), next_cursor (أو None),
+      page, opening_balance
+
+    cursor: نص من next_cursor لصفحة سابقة (بنفس الفلاتر)، وإلا بنبدأ من الأول.
+    """
+    spec = STATEMENTS[kind]
+    state = decode_cursor(cursor)
+    if not state or state.get("filters") != _filters_key(kind, party_id, date_from, date_to):
+        state = _first_state(kind, party_id, date_from, date_to)
+
+    # ✅ سطر زيادة عشان نعرف إذا في صفحة بعدها بدون COUNT
+    limit = page_size + 1
+    union_sql, params = _union(
+        spec, party_id, date_from=date_from, date_to=date_to,
+        after=state["after"], limit=limit,
+    )
+    sql = (
+        "SELECT mdate, kind, mid, debit, credit, note, "
+        "SUM(debit - credit) OVER (ORDER BY mdate, kind, mid ROWS UNBOUNDED PRECEDING) AS running "
+        f"FROM ({union_sql}) AS m ORDER BY mdate, kind, mid LIMIT {limit}"
+    )
+    with connection.cursor() as db:
+        db.execute(sql, params)
+        lines = db.fetchall()
+
+    has_next = len(lines) > page_size
+    lines = lines[:page_size]
+
+    branches = {b["kind"]: b for b in spec["branches"]}
+    start = Decimal(state["running"])
+    count = state["count"]
+    rows = []
+    for mdate, mkind, mid, debit, credit, note, running in lines:
+        branch = branches[mkind]
+        count += 1
+        rows.append({
+            "n": count,
+            "date": mdate if isinstance(mdate, datetime.date) else datetime.date.fromisoformat(str(mdate)),
+            "kind": mkind,
+            "id": mid,
+            "doc": branch["doc"],
+            "ref": f"{branch['prefix']}-{mid}",
+            "note": note or "",
+            "debit": _from_cents(debit),
+            "credit": _from_cents(credit),
+            "balance": start + spec["sign"] * _from_cents(running),
+        })
+
+    next_cursor = None
+    if has_next:
+        last = rows[-1]
+        next_cursor = encode_cursor(dict(
+            state,
+            after=[last["date"].isoformat(), last["kind"], last["id"]],
+            page=state["page"] + 1,
+            count=count,
+            running=str(last["balance"]),
+        ))
+
+    return {
+        "rows": rows,
+        "next_cursor": next_cursor,
+        "page": state["page"],
+        "opening_balance": Decimal(state["opening"]),
+    }
+
+
+def iter_statement(kind, party_id, date_from=None, date_to=None, page_size=MAX_PAGE_SIZE):
+    """
+    يرجع (الرصيد الافتتاحي، generator لكل سطور الكشف).
+    الـ generator lazy: بيجيب صفحة ورا صفحة (للـ PDF/التصدير).
+    """
+    first = statement_page(kind, party_id, date_from, date_to, page_size=page_size)
+
+    def rows():
+        page = first
+        while True:
+            yield from page["rows"]
+            if not page["next_cursor"]:
+                return
+            page = statement_page(
+                kind, party_id, date_from, date_to, cursor=page["next_cursor"], page_size=page_size
+            )
+
+    return first["opening_balance"], rows()
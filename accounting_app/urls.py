@@ -46,6 +46,8 @@ urlpatterns = [
     # Cash
     # =========================
     path("cash_management/", views.cash_management, name="cash_management"),
+    path("cash_position/", views.cash_position, name="cash_position"),
+    path("search/", views.global_search, name="global_search"),
 
     # =========================
     # Customers / Suppliers
@@ -89,6 +91,7 @@ urlpatterns = [
 
     # مستندات غير مرحّلة + عكس مستندات
     path("reports/unposted/", views.unposted_documents, name="unposted_documents"),
+    path("reports/unposted/post/", views.post_pending_documents, name="post_pending_documents"),
     path("sales-invoices/<int:invoice_id>/reverse/", views.reverse_sales_invoice, name="reverse_sales_invoice"),
     path("purchase-invoices/<int:invoice_id>/reverse/", views.reverse_purchase_invoice, name="reverse_purchase_invoice"),
     path("payments/<int:payment_id>/reverse/", views.reverse_payment, name="reverse_payment"),
@@ -115,6 +118,13 @@ urlpatterns = [
     path("ajax/account-name/", views.get_account_name, name="get_account_name"),
     path("reports/customer-statement/<int:customer_id>/", views.customer_statement, name="customer_statement"),
     path("reports/supplier-statement/<int:supplier_id>/", views.supplier_statement, name="supplier_statement"),
+    path("reports/aging/", views.aging_report, name="aging_report"),
+
+    # تصدير بالخلفية
+    path("exports/", views.export_jobs, name="export_jobs"),
+    path("exports/new/", views.export_job_create, name="export_job_create"),
+    path("exports/<int:pk>/status/", views.export_job_status, name="export_job_status"),
+    path("exports/<int:pk>/download/", views.export_job_download, name="export_job_download"),
 
 ]
 
@@ -1,19 +1,40 @@
 
+from datetime import timedelta
+from decimal import Decimal
+
 from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse, FileResponse, HttpResponse
 from .models import JournalEntry, JournalLine, Account, AccountingPeriod
-from .models import Customer, Supplier, SalesInvoice, PurchaseInvoice, Payment
+from .models import Customer, Supplier, SalesInvoice, PurchaseInvoice, Payment, PartyBalance
 from .forms import CustomerForm, SupplierForm, SalesInvoiceForm, PurchaseInvoiceForm, SalesItemFormSet, PurchaseItemFormSet, PaymentForm
 from django.core.exceptions import ValidationError
 
 from .forms import JournalEntryForm, JournalLineFormSet, AccountForm
+from .balances import trial_balance_rows, trial_balance_totals
+from .account_tree import account_tree, section_total, tree_roots
+from .journal_export import SYNC_PDF_MAX_LINES, journal_line_count, journal_pdf_tempfile, journal_xlsx_tempfile
+from .ledger import clamp_page_size, ledger_page
+from .statements import clamp_page_size as statement_page_size, iter_statement, statement_page
+from .aging import (
+    AGING, BUCKETS as AGING_BUCKETS, SORTS as AGING_SORTS,
+    aging_rows, aging_totals, aging_xlsx_tempfile, sort_rows as sort_aging_rows,
+)
+from .posting import post_pending
+from .closing import close_period as close_period_entry, preview_closing
+from .cash_position import MAX_DAYS as CASH_MAX_DAYS, cash_accounts, cash_position as cash_position_data
+from .report_cache import cached_report
+from .search import KIND_CHOICES as SEARCH_KINDS, PAGE_SIZE as SEARCH_PAGE_SIZE, matching_ids, search as search_documents
 
 
 from django.views.decorators.http import require_POST
+from django.urls import reverse
+from urllib.parse import urlencode
 
 
 # ==================================
@@ -38,15 +59,62 @@ def unposted_documents(request):
         purchase_qs = purchase_qs.filter(date__lte=date_to)
         payments_qs = payments_qs.filter(date__lte=date_to)
 
+    payments = list(payments_qs.order_by("-date", "-id")[:2000])
+
     return render(request, "accounting_app/unposted_documents.html", {
         "date_from": request.GET.get("date_from", ""),
         "date_to": request.GET.get("date_to", ""),
-        "sales_invoices": sales_qs.order_by("-date", "-id")[:2000],
-        "purchase_invoices": purchase_qs.order_by("-date", "-id")[:2000],
-        "payments": payments_qs.order_by("-date", "-id")[:2000],
+        "sales_unposted": sales_qs.order_by("-date", "-id")[:2000],
+        "purchase_unposted": purchase_qs.order_by("-date", "-id")[:2000],
+        "receipts_unposted": [p for p in payments if p.payment_type == Payment.RECEIPT],
+        "disburse_unposted": [p for p in payments if p.payment_type != Payment.RECEIPT],
     })
 
 
+@login_required
+@require_POST
+def post_pending_documents(request):
+    """ترحيل جماعي: المستندات المحددة، أو كل غير المرحّل ضمن فلترة التاريخ."""
+    back = redirect(f"{reverse('account:unposted_documents')}?{urlencode({k: request.POST.get(k, '') for k in ('date_from', 'date_to')})}")
+
+    def selected(name):
+        return [int(x) for x in request.POST.getlist(name) if x.isdigit()]
+
+    ids = None
+    if request.POST.get("scope") != "all":
+        ids = {
+            "sales": selected("sales_ids"),
+            "purchases": selected("purchase_ids"),
+            "payments": selected("payment_ids"),
+        }
+        if not any(ids.values()):
+            messages.info(request, "لم يتم تحديد أي مستند.")
+            return back
+
+    try:
+        result = post_pending(
+            date_from=_parse_date(request.POST.get("date_from")),
+            date_to=_parse_date(request.POST.get("date_to")),
+            ids=ids,
+            user=request.user,
+        )
+    except ValidationError as e:
+        messages.error(request, "; ".join(e.messages))
+        return back
+
+    posted = result["posted"]
+    messages.success(
+        request,
+        f"تم ترحيل {sum(posted.values())} مستند "
+        f"(مشتريات {posted['purchases']}، مبيعات {posted['sales']}، سندات {posted['payments']}).",
+    )
+    for kind, doc_id, message in result["errors"][:20]:
+        messages.error(request, f"{kind} #{doc_id}: {message}")
+    if len(result["errors"]) > 20:
+        messages.error(request, f"و {len(result['errors']) - 20} أخطاء أخرى.")
+    return back
+
+
 # ==================================
 # عكس مستندات (فواتير/سندات)
 # ==================================
@@ -114,15 +182,11 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
 from reportlab.platypus import Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from bidi.algorithm import get_display
-import arabic_reshaper
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
 from datetime import datetime
 import openpyxl
 
 from .models import JournalEntry, JournalLine, Account
+from .pdf_toolkit import ar as _ar, arabic_font, arabic_style
 
 
 
@@ -223,11 +287,15 @@ def accounting_home(request):
         {"name": "فواتير المشتريات", "url": "purchase_invoices"},
         {"name": "حسابات العملاء", "url": "customer_accounts"},
         {"name": "حسابات الموردين", "url": "supplier_accounts"},
+        {"name": "أعمار الذمم", "url": "aging_report"},
         {"name": "شجرة الحسابات", "url": "chart_of_accounts"},
         {"name": "إدارة النقدية", "url": "cash_management"},
+        {"name": "مركز النقدية (كل الحسابات)", "url": "cash_position"},
+        {"name": "البحث الشامل", "url": "global_search"},
         {"name": "سندات القبض والصرف", "url": "payments"},
 
         {"name": "مستندات غير مرحّلة", "url": "unposted_documents"},
+        {"name": "التصدير بالخلفية", "url": "export_jobs"},
 
         {"name": "الأرصدة الافتتاحية", "url": "opening_balances"},
         {"name": "إدارة الفترات المحاسبية", "url": "periods_list"},
@@ -322,11 +390,8 @@ def journal_entries(request):
         )
 
         if q:
-            qs = qs.filter(
-                Q(serial_number__icontains=q) |
-                Q(reference__icontains=q) |
-                Q(description__icontains=q)
-            )
+            # ✅ من فهرس البحث (FTS/trigram) بدل icontains على كل القيود
+            qs = qs.filter(id__in=matching_ids("journal_entry", q))
 
         if date_from:
             qs = qs.filter(date__gte=date_from)
@@ -403,6 +468,9 @@ def reverse_journal_entry(request, entry_id):
     entry.reversed_entry = rev
     entry.save(update_fields=["is_reversed", "reversed_entry"])
 
+    # ✅ المستند المرتبط (فاتورة/سند) بيطلع من رصيد العميل/المورد
+    PartyBalance.apply_entry(entry.id, sign=-1)
+
     messages.success(request, f"تم إنشاء القيد العكسي للقيد {ref} بنجاح.")
     return redirect("account:journal_entries")
 
@@ -413,88 +481,17 @@ def reverse_journal_entry(request, entry_id):
 @login_required
 @login_required
 def export_journal_pdf(request):
-    entries = (JournalEntry.objects.prefetch_related("lines__account").order_by("-id")[:2000] )  # حد أعلى للتصدير
-
-
-
-    buffer = io.BytesIO()
-    width, height = landscape(A4)
-    pdf = canvas.Canvas(buffer, pagesize=landscape(A4))
-
-    pdfmetrics.registerFont(TTFont('Arial', 'arial.ttf'))
-
-    pdf.setFont("Arial", 18)
-    header_text = get_display(arabic_reshaper.reshape("مصنع المحبة للصناعات الغذائية"))
-    pdf.drawCentredString(width / 2, height - 40, header_text)
-
-    pdf.setFont("Arial", 14)
-    date_text = get_display(
-        arabic_reshaper.reshape(f"تاريخ الطباعة: {datetime.today().strftime('%Y-%m-%d')}")
-    )
-    pdf.drawCentredString(width / 2, height - 65, date_text)
-
-    styles = getSampleStyleSheet()
-    arabic_style = ParagraphStyle(
-        'arabic',
-        parent=styles['Normal'],
-        fontName='Arial',
-        fontSize=12,
-        alignment=1,
-        leading=14
-    )
-
-    headers = ["الرقم المسلسل", "تاريخ المستند", "رقم الحساب", "اسم الحساب", "البيان", "مدين", "دائن"]
-    data = [[Paragraph(get_display(arabic_reshaper.reshape(h)), arabic_style) for h in headers]]
-
-    for entry in entries:
-        for line in entry.lines.all():
-            row = [
-                Paragraph(str(entry.serial_number), arabic_style),
-                Paragraph(entry.date.strftime("%Y-%m-%d"), arabic_style),
-                Paragraph(str(line.account.code), arabic_style),
-                Paragraph(get_display(arabic_reshaper.reshape(line.account.name)), arabic_style),
-                Paragraph(
-                    get_display(arabic_reshaper.reshape(line.note or entry.description)),
-                    arabic_style
-                ),
-                Paragraph(str(line.debit), arabic_style),
-                Paragraph(str(line.credit), arabic_style),
-            ]
-            data.append(row)
-
-    col_widths = [
-        width * 0.08,
-        width * 0.12,
-        width * 0.12,
-        width * 0.20,
-        width * 0.20,
-        width * 0.14,
-        width * 0.14,
-    ]
-
-    table = Table(data, colWidths=col_widths, repeatRows=1)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.whitesmoke),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('BOX', (0, 0), (-1, -1), 1, colors.grey),
-    ]))
-
-    table.wrapOn(pdf, width, height)
-    table_height = table._height
-    table.drawOn(pdf, (width - sum(col_widths)) / 2, height - 100 - table_height)
-
-    pdf.setFont("Arial", 10)
-    page_text = get_display(arabic_reshaper.reshape("صفحة 1"))
-    pdf.drawCentredString(width / 2, 20, page_text)
-
-    pdf.showPage()
-    pdf.save()
-
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename='journal_entries.pdf')
+    # ✅ صفحات حقيقية (جداول صغيرة + "صفحة X من Y") بدل جدول واحد على صفحة وحدة
+    # ⚠️ جوا الطلب بحد أعلى SYNC_PDF_MAX_LINES، والأكبر بيتحوّل لطابور التصدير (journal_pdf)
+    if getattr(request, "export_job", None) is None and journal_line_count() > SYNC_PDF_MAX_LINES:
+        job, _created = enqueue("journal_pdf", {}, user=request.user)
+        messages.info(
+            request,
+            f"القيود أكثر من {SYNC_PDF_MAX_LINES} سطر، فالـ PDF انحط بطابور التصدير (#{job.id}) وبتلاقيه هون لما يجهز.",
+        )
+        return redirect("account:export_jobs")
+    tmp = journal_pdf_tempfile()
+    return FileResponse(tmp, as_attachment=True, filename="journal_entries.pdf", content_type="application/pdf")
 
 
 import io
@@ -510,42 +507,15 @@ from django.contrib.auth.decorators import login_required
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-
-import arabic_reshaper
-from bidi.algorithm import get_display
 
 from .models import JournalEntry
 
 
-def _ar(txt):
-    return get_display(arabic_reshaper.reshape(str(txt or "")))
-
-
-def _register_arabic_font():
-    candidates = [
-        os.path.join(settings.BASE_DIR, "accounting_app", "static", "fonts", "Amiri-Regular.ttf"),
-        os.path.join(settings.BASE_DIR, "inventory", "static", "fonts", "Amiri-Regular.ttf"),
-        os.path.join(settings.BASE_DIR, "static", "fonts", "Amiri-Regular.ttf"),
-        r"C:\Windows\Fonts\arial.ttf",
-    ]
-    for p in candidates:
-        if p and os.path.exists(p):
-            try:
-                pdfmetrics.registerFont(TTFont("AR_FONT", p))
-                return "AR_FONT"
-            except Exception:
-                continue
-    return "Helvetica"
-
-
 @login_required
 def export_single_journal_pdf(request, entry_id):
     entry = get_object_or_404(JournalEntry.objects.prefetch_related('lines', 'lines__account'), id=entry_id)
 
-    font_name = _register_arabic_font()
+    font_name = arabic_font()
 
     company_name = "شركة المحبة للصناعات الغذائية"
     company_address = "الأردن - عمّان - أبو علندا"
@@ -558,10 +528,9 @@ def export_single_journal_pdf(request, entry_id):
         leftMargin=24, rightMargin=24, topMargin=70, bottomMargin=45
     )
 
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle("title_ar", parent=styles["Title"], fontName=font_name, fontSize=16, alignment=1)
-    small_style = ParagraphStyle("small_ar", parent=styles["Normal"], fontName=font_name, fontSize=10, alignment=1)
-    cell_style = ParagraphStyle("cell_ar", parent=styles["Normal"], fontName=font_name, fontSize=11, alignment=1)
+    title_style = arabic_style(16, alignment=1, parent="Title")
+    small_style = arabic_style(10, alignment=1)
+    cell_style = arabic_style(11, alignment=1)
 
     def header_footer(canvas, doc_):
         canvas.saveState()
@@ -657,7 +626,7 @@ def export_sales_invoice_pdf(request, invoice_id):
         id=invoice_id
     )
 
-    font_name = _register_arabic_font()
+    font_name = arabic_font()
 
     company_name = "شركة المحبة للصناعات الغذائية"
     company_address = "الأردن - عمّان - أبو علندا"
@@ -670,10 +639,9 @@ def export_sales_invoice_pdf(request, invoice_id):
         leftMargin=24, rightMargin=24, topMargin=70, bottomMargin=45
     )
 
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle("title_ar", parent=styles["Title"], fontName=font_name, fontSize=18, alignment=1)
-    small_style = ParagraphStyle("small_ar", parent=styles["Normal"], fontName=font_name, fontSize=11, alignment=2)
-    cell_style = ParagraphStyle("cell_ar", parent=styles["Normal"], fontName=font_name, fontSize=11, alignment=1)
+    title_style = arabic_style(18, alignment=1, parent="Title")
+    small_style = arabic_style(11, alignment=2)
+    cell_style = arabic_style(11, alignment=1)
 
     def header_footer(canvas, doc_):
         canvas.saveState()
@@ -752,7 +720,7 @@ def export_purchase_invoice_pdf(request, invoice_id):
         id=invoice_id
     )
 
-    font_name = _register_arabic_font()
+    font_name = arabic_font()
 
     company_name = "شركة المحبة للصناعات الغذائية"
     company_address = "الأردن - عمّان - أبو علندا"
@@ -765,10 +733,9 @@ def export_purchase_invoice_pdf(request, invoice_id):
         leftMargin=24, rightMargin=24, topMargin=70, bottomMargin=45
     )
 
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle("title_ar", parent=styles["Title"], fontName=font_name, fontSize=18, alignment=1)
-    small_style = ParagraphStyle("small_ar", parent=styles["Normal"], fontName=font_name, fontSize=11, alignment=2)
-    cell_style = ParagraphStyle("cell_ar", parent=styles["Normal"], fontName=font_name, fontSize=11, alignment=1)
+    title_style = arabic_style(18, alignment=1, parent="Title")
+    small_style = arabic_style(11, alignment=2)
+    cell_style = arabic_style(11, alignment=1)
 
     def header_footer(canvas, doc_):
         canvas.saveState()
@@ -843,34 +810,14 @@ def export_purchase_invoice_pdf(request, invoice_id):
 @login_required
 @login_required
 def export_journal_excel(request):
-    entries = (JournalEntry.objects.prefetch_related("lines__account").order_by("-id")[:20000])
-
-
-    workbook = openpyxl.Workbook()
-    sheet = workbook.active
-    sheet.title = "Journal Entries"
-
-    headers = ["الرقم المسلسل", "تاريخ المستند", "رقم الحساب", "اسم الحساب", "البيان", "مدين", "دائن"]
-    sheet.append(headers)
-
-    for entry in entries:
-        for line in entry.lines.all():
-            sheet.append([
-                entry.serial_number,
-                entry.date.strftime("%Y-%m-%d"),
-                line.account.code,
-                line.account.name,
-                line.note or entry.description,
-                line.debit,
-                line.credit,
-            ])
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # ✅ كل السطور (بدون حد 20000) على ملف مؤقت write-only، وبتنبعث على أجزاء
+    tmp = journal_xlsx_tempfile()
+    return FileResponse(
+        tmp,
+        as_attachment=True,
+        filename="journal_entries.xlsx",
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
-    response['Content-Disposition'] = 'attachment; filename=journal_entries.xlsx'
-    workbook.save(response)
-    return response
 
 
 # ===============================
@@ -891,8 +838,22 @@ def get_account_name(request):
 # ===============================
 @login_required
 def chart_of_accounts(request):
-    accounts = Account.objects.all().order_by("code")
-    return render(request, "accounting_app/chart_of_accounts.html", {"accounts": accounts})
+    # ✅ الشجرة كاملة مع أرصدتها المجمّعة باستعلام واحد (بدل children.all لكل عقدة)
+    nodes = account_tree(include_zero=True)
+    return render(request, "accounting_app/chart_of_accounts.html", {"roots": tree_roots(nodes)})
+
+
+def _tree_level(request):
+    """مستوى التجميع من ?level= (None = كل المستويات)"""
+    try:
+        level = int(request.GET.get("level") or 0)
+    except ValueError:
+        return None
+    return level if level > 0 else None
+
+
+def _level_choices(nodes):
+    return list(range(1, max((n["level"] for n in nodes), default=0) + 1))
 
 
 # ===============================
@@ -903,6 +864,7 @@ def chart_of_accounts(request):
 def general_ledger(request):
     period_id = (request.GET.get("period") or "").strip()
     account_id = (request.GET.get("account") or "").strip()
+    page_size = clamp_page_size(request.GET.get("size"))
 
     periods = AccountingPeriod.objects.all().order_by("-start_date")
     accounts = Account.objects.all().order_by("code")
@@ -911,208 +873,87 @@ def general_ledger(request):
     if period_id:
         selected_period = AccountingPeriod.objects.filter(id=period_id).first()
 
-    # ✅ إذا ما اختار حساب: هذا "دفتر الأستاذ العام" (قائمة قيود/سطور حسب الفترة)
-    if not account_id:
-        lines = JournalLine.objects.select_related("entry", "account")
-
-        if selected_period:
-            lines = lines.filter(
-                entry__date__gte=selected_period.start_date,
-                entry__date__lte=selected_period.end_date
-            )
-
-        lines = lines.order_by("entry__date", "entry__id", "id")[:2000]  # حدّ للحماية
-
-        rows = []
-        total_debit = 0.0
-        total_credit = 0.0
-
-        for line in lines:
-            debit = float(line.debit or 0)
-            credit = float(line.credit or 0)
-            total_debit += debit
-            total_credit += credit
-
-            entry = line.entry
-            rows.append({
-                "mode": "gl",
-                "date": entry.date,
-                "entry_serial": entry.serial_number or entry.id,
-                "entry_id": entry.id,
-                "reference": entry.reference or "-",
-                "description": entry.description,
-                "account_code": line.account.code,
-                "account_name": line.account.name,
-                "note": line.note or "",
-                "debit": debit,
-                "credit": credit,
-            })
-
-        return render(request, "accounting_app/general_ledger.html", {
-            "mode": "gl",
-            "periods": periods,
-            "accounts": accounts,
-            "selected_period": str(period_id),
-            "selected_account": "",
-            "rows": rows,
-            "total_debit": f"{total_debit:.2f}",
-            "total_credit": f"{total_credit:.2f}",
-            "hint": "اختاري حساب لو بدك دفتر أستاذ (حساب) مع رصيد جاري.",
-            # حقول وضع الحساب نخليها صفر
-            "opening_balance_text": "0.00",
-            "opening_balance_class": "",
-        })
-
-    # ✅ إذا اختار حساب: هذا "دفتر أستاذ (حساب)" بنفس الصفحة + رصيد جاري
-    base_lines = JournalLine.objects.select_related("entry", "account").filter(account_id=account_id)
-
-    opening_balance = 0.0
-    if selected_period:
-        opening_sum = base_lines.filter(entry__date__lt=selected_period.start_date).aggregate(
-            d=Sum("debit"), c=Sum("credit")
-        )
-        opening_balance = float(opening_sum["d"] or 0) - float(opening_sum["c"] or 0)
-
-        lines = base_lines.filter(
-            entry__date__gte=selected_period.start_date,
-            entry__date__lte=selected_period.end_date,
-        ).order_by("entry__date", "entry__id", "id")
-    else:
-        lines = base_lines.order_by("entry__date", "entry__id", "id")
+    # ✅ صفحات بالـ cursor (keyset) بدل حد 2000 سطر:
+    # بدون حساب = دفتر الأستاذ العام، مع حساب = دفتر أستاذ (حساب) + رصيد جاري
+    page = ledger_page(
+        account_id=account_id or None,
+        start_date=selected_period.start_date if selected_period else None,
+        end_date=selected_period.end_date if selected_period else None,
+        cursor=request.GET.get("cursor"),
+        page_size=page_size,
+    )
 
-    def fmt_balance(bal: float):
+    def fmt_balance(bal):
         if bal > 0:
             return f"{bal:.2f} مدين", "text-success fw-bold"
         if bal < 0:
             return f"{abs(bal):.2f} دائن", "text-danger fw-bold"
         return "0.00", ""
 
-    opening_text, opening_class = fmt_balance(opening_balance)
-
-    rows = []
-    total_debit = 0.0
-    total_credit = 0.0
-    running_balance = opening_balance
-
-    for line in lines:
-        debit = float(line.debit or 0)
-        credit = float(line.credit or 0)
-        total_debit += debit
-        total_credit += credit
-        running_balance += (debit - credit)
+    mode = "account" if account_id else "gl"
+    rows = page["rows"]
+    for r in rows:
+        r["mode"] = mode
+        if mode == "account":
+            r["balance_text"], r["balance_class"] = fmt_balance(r["balance"])
 
-        bal_text, bal_class = fmt_balance(running_balance)
+    opening_text, opening_class = fmt_balance(page["opening_balance"])
 
-        entry = line.entry
-        rows.append({
-            "mode": "account",
-            "date": entry.date,
-            "entry_serial": entry.serial_number or entry.id,
-            "entry_id": entry.id,
-            "reference": entry.reference or "-",
-            "description": entry.description,
-            "note": line.note or "",
-            "debit": debit,
-            "credit": credit,
-            "balance_text": bal_text,
-            "balance_class": bal_class,
-        })
+    # روابط الصفحات بنفس الفلاتر
+    params = {"size": page_size}
+    if period_id:
+        params["period"] = period_id
+    if account_id:
+        params["account"] = account_id
+    first_page_query = urlencode(params)
+    next_page_query = urlencode(dict(params, cursor=page["next_cursor"])) if page["next_cursor"] else ""
 
     return render(request, "accounting_app/general_ledger.html", {
-        "mode": "account",
+        "mode": mode,
         "periods": periods,
         "accounts": accounts,
         "selected_period": str(period_id),
         "selected_account": str(account_id),
         "rows": rows,
-        "opening_balance_text": opening_text,
-        "opening_balance_class": opening_class,
-        "total_debit": f"{total_debit:.2f}",
-        "total_credit": f"{total_credit:.2f}",
-        "hint": "",
+        "opening_balance_text": opening_text if mode == "account" else "0.00",
+        "opening_balance_class": opening_class if mode == "account" else "",
+        "total_debit": f"{page['total_debit']:.2f}",
+        "total_credit": f"{page['total_credit']:.2f}",
+        "hint": "" if mode == "account" else "اختاري حساب لو بدك دفتر أستاذ (حساب) مع رصيد جاري.",
+        "page_number": page["page"],
+        "page_size": page_size,
+        "line_count": page["line_count"],
+        "first_page_query": first_page_query,
+        "next_page_query": next_page_query,
     })
 
-    # -------------------------------------------------------
-    # Opening balance = مجموع (مدين - دائن) قبل بداية الفترة
-    # -------------------------------------------------------
-    opening_balance = 0
-
-    base_lines = JournalLine.objects.select_related("entry", "account").filter(account_id=account_id)
-
-    if selected_period:
-        opening_qs = base_lines.filter(entry__date__lt=selected_period.start_date)
-        opening_sum = opening_qs.aggregate(
-            d=Sum("debit"),
-            c=Sum("credit"),
-        )
-        opening_balance = float(opening_sum["d"] or 0) - float(opening_sum["c"] or 0)
-
-        # خطوط الفترة
-        lines = base_lines.filter(
-            entry__date__gte=selected_period.start_date,
-            entry__date__lte=selected_period.end_date,
-        ).order_by("entry__date", "entry__id", "id")
-    else:
-        # بدون فترة: نعتبر الافتتاحي = 0 ونجيب كل الخطوط
-        lines = base_lines.order_by("entry__date", "entry__id", "id")
-
-    # -------------------------------------------------------
-    # Build rows + running balance
-    # -------------------------------------------------------
-    rows = []
-    total_debit = 0.0
-    total_credit = 0.0
-    running_balance = opening_balance
 
-    def fmt_balance(bal: float):
-        if bal > 0:
-            return f"{bal:.2f} مدين", "text-success fw-bold"
-        elif bal < 0:
-            return f"{abs(bal):.2f} دائن", "text-danger fw-bold"
-        return "0.00", ""
 
-    opening_text, opening_class = fmt_balance(opening_balance)
-
-    for line in lines:
-        debit = float(line.debit or 0)
-        credit = float(line.credit or 0)
 
-        total_debit += debit
-        total_credit += credit
-        running_balance += (debit - credit)
+# ترتيب قوائم العملاء/الموردين: الرصيد من PartyBalance (join واحد، بدون كشف حساب لكل سطر)
+PARTY_SORTS = {
+    "name": ("name", "id"),
+    "balance_desc": (F("party_balance__balance").desc(nulls_last=True), "name"),
+    "balance_asc": (F("party_balance__balance").asc(nulls_first=True), "name"),
+}
 
-        bal_text, bal_class = fmt_balance(running_balance)
 
-        entry = line.entry
-        rows.append({
-            "date": entry.date,
-            "entry_serial": entry.serial_number or entry.id,
-            "entry_id": entry.id,
-            "reference": entry.reference or "-",
-            "description": entry.description,
-            "note": line.note or "",
-            "debit": debit,
-            "credit": credit,
-            "balance_text": bal_text,
-            "balance_class": bal_class,
-        })
-
-    context = {
-        "periods": periods,
-        "accounts": accounts,
-        "selected_period": str(period_id),
-        "selected_account": str(account_id),
-        "rows": rows,
-        "opening_balance_value": opening_balance,
-        "opening_balance_text": opening_text,
-        "opening_balance_class": opening_class,
-        "total_debit": f"{total_debit:.2f}",
-        "total_credit": f"{total_credit:.2f}",
-        "hint": "",
-    }
-    return render(request, "accounting_app/general_ledger.html", context)
+def _party_list(request, model):
+    """صفحة من العملاء/الموردين مع الرصيد الجاهز. يرجع (page_obj, sort, query بدون page)."""
+    sort = request.GET.get("sort") if request.GET.get("sort") in PARTY_SORTS else "name"
+    q = (request.GET.get("q") or "").strip()
 
+    qs = model.objects.annotate(
+        balance=Coalesce(F("party_balance__balance"), Value(Decimal("0.00")), output_field=DecimalField()),
+    ).order_by(*PARTY_SORTS[sort])
+    if q:
+        qs = qs.filter(name__icontains=q)
 
+    page_obj = Paginator(qs, 100).get_page(request.GET.get("page"))
+    params = {"sort": sort}
+    if q:
+        params["q"] = q
+    return page_obj, sort, urlencode(params)
 
 
 @login_required
@@ -1126,8 +967,13 @@ def customer_accounts(request):
     else:
         form = CustomerForm()
 
-    customers = Customer.objects.all().order_by("name")
-    return render(request, "accounting_app/customer_accounts.html", {"form": form, "customers": customers})
+    customers, sort, page_query = _party_list(request, Customer)
+    return render(request, "accounting_app/customer_accounts.html", {
+        "form": form,
+        "customers": customers,
+        "sort": sort,
+        "page_query": page_query,
+    })
 
 
 @login_required
@@ -1141,8 +987,13 @@ def supplier_accounts(request):
     else:
         form = SupplierForm()
 
-    suppliers = Supplier.objects.all().order_by("name")
-    return render(request, "accounting_app/supplier_accounts.html", {"form": form, "suppliers": suppliers})
+    suppliers, sort, page_query = _party_list(request, Supplier)
+    return render(request, "accounting_app/supplier_accounts.html", {
+        "form": form,
+        "suppliers": suppliers,
+        "sort": sort,
+        "page_query": page_query,
+    })
 
 
 # ===============================
@@ -1160,8 +1011,8 @@ def sales_invoices(request):
                 with transaction.atomic():
                     inv = form.save()
                     formset.instance = inv
+                    # ✅ البنود دفعة وحدة والإجمالي مرة وحدة (BaseInvoiceItemFormSet)
                     formset.save()
-                    inv.recalc_total()
                     inv.post_to_journal(user=request.user)
                 messages.success(request, f"تمت إضافة فاتورة مبيعات وترحيلها ({inv.invoice_number})")
                 return redirect("account:sales_invoices")
@@ -1240,8 +1091,8 @@ def purchase_invoices(request):
                 with transaction.atomic():
                     inv = form.save()
                     formset.instance = inv
+                    # ✅ البنود دفعة وحدة والإجمالي مرة وحدة (BaseInvoiceItemFormSet)
                     formset.save()
-                    inv.recalc_total()
                     inv.post_to_journal(user=request.user)
                 messages.success(request, f"تمت إضافة فاتورة مشتريات وترحيلها ({inv.invoice_number})")
                 return redirect("account:purchase_invoices")
@@ -1289,123 +1140,104 @@ def post_purchase_invoice(request, invoice_id):
 
 @login_required
 def income_statement(request):
-    revenues = []
-    expenses = []
+    level = _tree_level(request)
+    # ✅ من الكاش إذا ما تغيّر الدفتر من آخر مرة (report_cache.py)
+    context = cached_report("income_statement", {"level": level}, lambda: _income_statement_data(level))
+    return render(request, 'accounting_app/income_statement.html', context)
 
-    total_revenue = 0
-    total_expense = 0
 
-    accounts = Account.objects.all().order_by('code')
+def _income_statement_data(level):
+    # ✅ الشجرة كاملة بمجاميع كل مستوى (استعلام واحد + تجميع بالذاكرة)
+    # التصنيف حسب نوع الحساب الجذر بدل أول رقم من الكود
+    nodes = account_tree()
+    shown = [n for n in nodes if not level or n["level"] <= level]
 
-    for acc in accounts:
-        sums = JournalLine.objects.filter(account=acc).aggregate(
-            debit_sum=Sum('debit'),
-            credit_sum=Sum('credit')
-        )
-
-        debit = sums['debit_sum'] or 0
-        credit = sums['credit_sum'] or 0
-
-        # إيرادات (غالبًا دائن)
-        if acc.code.startswith('4'):
-            amount = credit - debit
-            if amount != 0:
-                revenues.append({
-                    'code': acc.code,
-                    'name': acc.name,
-                    'amount': amount
-                })
-                total_revenue += amount
-
-        # مصاريف (غالبًا مدين)
-        elif acc.code.startswith('5'):
-            amount = debit - credit
-            if amount != 0:
-                expenses.append({
-                    'code': acc.code,
-                    'name': acc.name,
-                    'amount': amount
-                })
-                total_expense += amount
+    revenues = []
+    expenses = []
+    for n in shown:
+        if n["root_type"] == Account.REVENUE:
+            amount = n["move_credit"] - n["move_debit"]
+            target = revenues
+        elif n["root_type"] == Account.EXPENSE:
+            amount = n["move_debit"] - n["move_credit"]
+            target = expenses
+        else:
+            continue
+        if amount != 0:
+            target.append({
+                'code': n["code"],
+                'name': n["name"],
+                'amount': amount,
+                'level': n["level"],
+                'is_leaf': n["is_leaf"] or n["level"] == level,
+            })
 
+    total_revenue = -section_total(nodes, Account.REVENUE, "closing_balance")
+    total_expense = section_total(nodes, Account.EXPENSE, "closing_balance")
     net_income = total_revenue - total_expense
 
-    context = {
+    return {
         'revenues': revenues,
         'expenses': expenses,
         'total_revenue': total_revenue,
         'total_expense': total_expense,
         'net_income': net_income,
+        'levels': _level_choices(nodes),
+        'selected_level': level,
     }
-    return render(request, 'accounting_app/income_statement.html', context)
-
-
-from django.db.models import Sum
-from .models import JournalLine, Account
 
 
 @login_required
 def balance_sheet(request):
+    level = _tree_level(request)
+    context = cached_report("balance_sheet", {"level": level}, lambda: _balance_sheet_data(level))
+    return render(request, 'accounting_app/balance_sheet.html', context)
+
+
+def _balance_sheet_data(level):
+    nodes = account_tree()
+    shown = [n for n in nodes if not level or n["level"] <= level]
+
     assets = []
     liabilities = []
     equity = []
 
-    total_assets = 0
-    total_liabilities = 0
-    total_equity = 0
+    # أصول رصيدها مدين، خصوم وحقوق ملكية رصيدها دائن
+    sections = {
+        Account.ASSET: (assets, 1),
+        Account.LIABILITY: (liabilities, -1),
+        Account.EQUITY: (equity, -1),
+    }
+    for n in shown:
+        if n["root_type"] not in sections:
+            continue
+        target, sign = sections[n["root_type"]]
+        balance = sign * n["closing_balance"]
+        if balance != 0:
+            target.append({
+                'code': n["code"],
+                'name': n["name"],
+                'balance': balance,
+                'level': n["level"],
+                'is_leaf': n["is_leaf"] or n["level"] == level,
+            })
 
-    accounts = Account.objects.all().order_by('code')
+    total_assets = section_total(nodes, Account.ASSET, "closing_balance")
+    total_liabilities = -section_total(nodes, Account.LIABILITY, "closing_balance")
+    total_equity = -section_total(nodes, Account.EQUITY, "closing_balance")
 
-    # ✅ حساب صافي الربح (حسابات 4 و 5)
-    net_income = 0
-    for acc in accounts:
-        sums = JournalLine.objects.filter(account=acc).aggregate(
-            debit_sum=Sum('debit'),
-            credit_sum=Sum('credit')
-        )
-        debit = sums['debit_sum'] or 0
-        credit = sums['credit_sum'] or 0
-
-        if str(acc.code).startswith('4'):  # إيرادات
-            net_income += (credit - debit)
-        elif str(acc.code).startswith('5'):  # مصاريف
-            net_income -= (debit - credit)
-
-    # ✅ تجميع الأصول/الخصوم/حقوق الملكية
-    for acc in accounts:
-        sums = JournalLine.objects.filter(account=acc).aggregate(
-            debit_sum=Sum('debit'),
-            credit_sum=Sum('credit')
-        )
-        debit = sums['debit_sum'] or 0
-        credit = sums['credit_sum'] or 0
-
-        if str(acc.code).startswith('1'):  # أصول
-            balance = debit - credit
-            if balance != 0:
-                assets.append({'code': acc.code, 'name': acc.name, 'balance': balance})
-                total_assets += balance
-
-        elif str(acc.code).startswith('2'):  # خصوم
-            balance = credit - debit
-            if balance != 0:
-                liabilities.append({'code': acc.code, 'name': acc.name, 'balance': balance})
-                total_liabilities += balance
-
-        elif str(acc.code).startswith('3'):  # حقوق ملكية
-            balance = credit - debit
-            if balance != 0:
-                equity.append({'code': acc.code, 'name': acc.name, 'balance': balance})
-                total_equity += balance
-
-    # ✅ أضف صافي الربح لحقوق الملكية عشان تتوازن الميزانية
+    # ✅ صافي الربح (إيرادات - مصاريف) لحقوق الملكية عشان تتوازن الميزانية
+    net_income = -(
+        section_total(nodes, Account.REVENUE, "closing_balance")
+        + section_total(nodes, Account.EXPENSE, "closing_balance")
+    )
     if net_income != 0:
-        equity.append({'code': '-', 'name': 'صافي الربح/الخسارة', 'balance': net_income})
+        equity.append({'code': '-', 'name': 'صافي الربح/الخسارة', 'balance': net_income, 'level': 1, 'is_leaf': True})
         total_equity += net_income
 
     is_balanced = (round(float(total_assets), 2) == round(float(total_liabilities + total_equity), 2))
 
-    context = {
+    return {
         'assets': assets,
         'liabilities': liabilities,
         'equity': equity,
@@ -1413,101 +1245,69 @@ def balance_sheet(request):
         'total_liabilities': total_liabilities,
         'total_equity': total_equity,
         'is_balanced': is_balanced,
+        'levels': _level_choices(nodes),
+        'selected_level': level,
     }
-    return render(request, 'accounting_app/balance_sheet.html', context)
-
-
-from django.db.models import Sum
-from .models import JournalLine, Account
 
 
 @login_required
 def trial_balance(request):
     period_id = (request.GET.get("period") or "").strip()
     periods = AccountingPeriod.objects.all().order_by("-start_date")
-    accounts = Account.objects.all().order_by("code")
 
     selected_period = None
     if period_id:
         selected_period = AccountingPeriod.objects.filter(id=period_id).first()
 
-    rows = []
-
-    # Totals
-    total_opening_debit = 0.0
-    total_opening_credit = 0.0
-    total_move_debit = 0.0
-    total_move_credit = 0.0
-    total_closing_debit = 0.0
-    total_closing_credit = 0.0
-
-    for acc in accounts:
-        base = JournalLine.objects.filter(account=acc)
-
-        # Opening = قبل بداية الفترة (إذا في فترة)
-        opening_bal = 0.0
-        if selected_period:
-            o = base.filter(entry__date__lt=selected_period.start_date).aggregate(
-                d=Sum("debit"), c=Sum("credit")
-            )
-            opening_bal = float(o["d"] or 0) - float(o["c"] or 0)
-
-        # Movement = داخل الفترة (أو كل شيء إذا ما في فترة)
-        move_qs = base
-        if selected_period:
-            move_qs = move_qs.filter(
-                entry__date__gte=selected_period.start_date,
-                entry__date__lte=selected_period.end_date,
-            )
-
-        m = move_qs.aggregate(d=Sum("debit"), c=Sum("credit"))
-        move_debit = float(m["d"] or 0)
-        move_credit = float(m["c"] or 0)
-
-        closing_bal = opening_bal + (move_debit - move_credit)
-
-        # تجاهل الحسابات اللي صفر بالكامل
-        if opening_bal == 0 and move_debit == 0 and move_credit == 0 and closing_bal == 0:
-            continue
+    level = _tree_level(request)
 
-        # تحويل opening/closing إلى (مدين/دائن)
-        opening_debit = opening_bal if opening_bal > 0 else 0.0
-        opening_credit = abs(opening_bal) if opening_bal < 0 else 0.0
-
-        closing_debit = closing_bal if closing_bal > 0 else 0.0
-        closing_credit = abs(closing_bal) if closing_bal < 0 else 0.0
+    context = cached_report(
+        "trial_balance",
+        {"period": selected_period.id if selected_period else None, "level": level},
+        lambda: _trial_balance_data(selected_period, level),
+    )
+    context.update({"periods": periods, "selected_period": period_id})
+    return render(request, "accounting_app/trial_balance.html", context)
 
-        total_opening_debit += opening_debit
-        total_opening_credit += opening_credit
-        total_move_debit += move_debit
-        total_move_credit += move_credit
-        total_closing_debit += closing_debit
-        total_closing_credit += closing_credit
 
-        rows.append({
-            "code": acc.code,
-            "name": acc.name,
-            "opening_debit": opening_debit,
-            "opening_credit": opening_credit,
-            "move_debit": move_debit,
-            "move_credit": move_credit,
-            "closing_debit": closing_debit,
-            "closing_credit": closing_credit,
-        })
+def _trial_balance_data(selected_period, level):
+    # Opening = قبل بداية الفترة، Movement = داخل الفترة (أو كل شيء إذا ما في فترة)
+    if selected_period:
+        all_rows = trial_balance_rows(selected_period.start_date, selected_period.end_date, include_zero=True)
+    else:
+        all_rows = trial_balance_rows(include_zero=True)
+
+    # المجاميع دايمًا من الحسابات نفسها (بدون تكرار الأب مع أبنائه)
+    totals = trial_balance_totals(all_rows)
+
+    nodes = account_tree(rows=all_rows)
+    if level:
+        # ✅ ميزان بمجاميع لحد المستوى المختار
+        # بدون children (ما بتلزم للعرض وبتكبّر الكاش)
+        rows = [
+            {k: v for k, v in n.items() if k != "children"}
+            for n in nodes if n["level"] <= level
+        ]
+        for n in rows:
+            n["is_leaf"] = n["is_leaf"] or n["level"] == level
+    else:
+        rows = [
+            r for r in all_rows
+            if r["opening_balance"] != 0 or r["move_debit"] != 0 or r["move_credit"] != 0
+        ]
 
-    context = {
-        "periods": periods,
-        "selected_period": period_id,
+    return {
         "rows": rows,
-
-        "total_opening_debit": f"{total_opening_debit:.2f}",
-        "total_opening_credit": f"{total_opening_credit:.2f}",
-        "total_move_debit": f"{total_move_debit:.2f}",
-        "total_move_credit": f"{total_move_credit:.2f}",
-        "total_closing_debit": f"{total_closing_debit:.2f}",
-        "total_closing_credit": f"{total_closing_credit:.2f}",
+        "levels": _level_choices(nodes),
+        "selected_level": level,
+
+        "total_opening_debit": f"{totals['opening_debit']:.2f}",
+        "total_opening_credit": f"{totals['opening_credit']:.2f}",
+        "total_move_debit": f"{totals['move_debit']:.2f}",
+        "total_move_credit": f"{totals['move_credit']:.2f}",
+        "total_closing_debit": f"{totals['closing_debit']:.2f}",
+        "total_closing_credit": f"{totals['closing_credit']:.2f}",
     }
-    return render(request, "accounting_app/trial_balance.html", context)
 
 from django.db.models import Sum
 
@@ -1613,6 +1413,118 @@ def cash_management(request):
     })
 
 
+@login_required
+def cash_position(request):
+    """
+    مركز النقدية لكل حسابات الصندوق/البنوك (cash_position.py: استعلام واحد مجمّع).
+    ?period= أو ?date_from=&date_to= ، ?account= (أكثر من واحد) لتقييد الحسابات،
+    ?format=json للسلسلة اليومية.
+    """
+    periods = AccountingPeriod.objects.all().order_by("-start_date")
+    period_id = (request.GET.get("period") or "").strip()
+    selected_period = AccountingPeriod.objects.filter(id=period_id).first() if period_id.isdigit() else None
+
+    if selected_period:
+        date_from, date_to = selected_period.start_date, selected_period.end_date
+    else:
+        date_to = _parse_date(request.GET.get("date_to")) or timezone.localdate()
+        date_from = _parse_date(request.GET.get("date_from")) or date_to - timedelta(days=29)
+    if date_from > date_to:
+        date_from, date_to = date_to, date_from
+    if (date_to - date_from).days >= CASH_MAX_DAYS:
+        date_from = date_to - timedelta(days=CASH_MAX_DAYS - 1)
+        messages.warning(request, f"أقصى مدة {CASH_MAX_DAYS} يوم، تم عرض آخر {CASH_MAX_DAYS} يوم فقط.")
+
+    all_accounts = cash_accounts()
+    selected_ids = {int(a) for a in request.GET.getlist("account") if a.isdigit()}
+    accounts = [a for a in all_accounts if a.id in selected_ids] if selected_ids else all_accounts
+
+    data = cash_position_data(date_from, date_to, accounts)
+
+    if request.GET.get("format") == "json":
+        return JsonResponse({
+            "date_from": date_from.isoformat(),
+            "date_to": date_to.isoformat(),
+            "totals": {k: str(v) for k, v in data["totals"].items()},
+            "accounts": [
+                {k: (str(v) if isinstance(v, Decimal) else v) for k, v in r.items() if k != "account"}
+                for r in data["accounts"]
+            ],
+            "daily": [
+                {"date": d["date"].isoformat(), **{k: str(d[k]) for k in ("receipts", "disbursements", "net", "balance")}}
+                for d in data["daily"]
+            ],
+        })
+
+    # ✅ السلسلة اليومية منسّقة هون (floatformat على مئات الأيام بطيء بالقالب)
+    daily = [
+        {
+            "date": d["date"].isoformat(),
+            "receipts": f"{d['receipts']:.2f}",
+            "disbursements": f"{d['disbursements']:.2f}",
+            "net": f"{d['net']:.2f}",
+            "balance": f"{d['balance']:.2f}",
+            "quiet": not d["receipts"] and not d["disbursements"],
+        }
+        for d in data["daily"]
+    ]
+
+    return render(request, "accounting_app/cash_position.html", {
+        "periods": periods,
+        "selected_period": period_id,
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "all_accounts": all_accounts,
+        "selected_ids": selected_ids,
+        "hint": "" if all_accounts else "لا يوجد حساب نقدية بالإعدادات (AccountingConfig.cash_account).",
+        "accounts": data["accounts"],
+        "totals": data["totals"],
+        "daily": daily,
+    })
+
+
+@login_required
+def global_search(request):
+    """
+    بحث واحد بالقيود والفواتير والسندات والعملاء والموردين والمنتجات (search.py).
+    ?q= ، ?kind= لنوع واحد، ?format=json للإكمال التلقائي (أول صفحة بس).
+    """
+    q = (request.GET.get("q") or "").strip()
+    kind = (request.GET.get("kind") or "").strip()
+
+    results = search_documents(q, kind)
+    page_obj = Paginator(results, SEARCH_PAGE_SIZE).get_page(request.GET.get("page")) if q else None
+
+    if request.GET.get("format") == "json":
+        return JsonResponse({
+            "q": q,
+            "count": results.count(),
+            "results": [
+                {
+                    "kind": d.kind,
+                    "kind_label": d.kind_label,
+                    "id": d.object_id,
+                    "title": d.title,
+                    "subtitle": d.subtitle,
+                    "date": d.date.isoformat() if d.date else None,
+                    "url": d.url,
+                }
+                for d in (page_obj or [])
+            ],
+        })
+
+    params = {"q": q}
+    if kind:
+        params["kind"] = kind
+    return render(request, "accounting_app/search.html", {
+        "q": q,
+        "kind": kind,
+        "kinds": SEARCH_KINDS,
+        "page_obj": page_obj,
+        "page_query": urlencode(params),
+    })
+
+
 @login_required
 def add_account(request):
     if request.method == "POST":
@@ -1781,90 +1693,37 @@ def post_opening_to_journal(request, period_id):
 
 
 @login_required
-@require_POST
-@transaction.atomic
 def close_period(request, period_id):
+    """
+    GET: معاينة قيد الإقفال (dry-run، بدون أي كتابة)
+    POST: إنشاء قيد الإقفال وإقفال الفترة (closing.py)
+    """
     period = get_object_or_404(AccountingPeriod, id=period_id)
+    back = redirect(f"/account/opening-balances/?period={period.id}")
 
     if period.is_closed:
         messages.info(request, "الفترة مقفلة مسبقًا.")
-        return redirect("account:opening_balances")
-
-    # لازم config موجود + retained موجود
-    cfg = AccountingConfig.get_config()
-    if not cfg.retained_earnings_account_id:
-        messages.error(request, "لا يوجد حساب الأرباح المرحلة داخل AccountingConfig.")
-        return redirect("account:opening_balances")
-
-    # اجمع الإيرادات/المصاريف داخل الفترة من القيود
-    rev_accounts = Account.objects.filter(account_type=Account.REVENUE)
-    exp_accounts = Account.objects.filter(account_type=Account.EXPENSE)
-
-    def sums_for(acc):
-        s = JournalLine.objects.filter(
-            account=acc,
-            entry__date__gte=period.start_date,
-            entry__date__lte=period.end_date,
-        ).aggregate(d=Sum("debit"), c=Sum("credit"))
-        d = float(s["d"] or 0)
-        c = float(s["c"] or 0)
-        return d, c
-
-    # قيد الإقفال بتاريخ نهاية الفترة
-    je = JournalEntry.objects.create(
-        period=period,
-        date=period.end_date,
-        reference=f"CLOSE-{period.name}",
-        description=f"قيد إقفال الفترة {period.name}",
-        created_by=request.user,
-    )
+        return back
 
-    total_income = 0.0
-
-    # الإيرادات: عادةً رصيدها دائن => لإقفالها نعمل (مدين الإيراد) بقيمة صافيها
-    for acc in rev_accounts:
-        d, c = sums_for(acc)
-        net = c - d  # صافي الإيراد
-        if net <= 0:
-            continue
-        JournalLine.objects.create(entry=je, account=acc, debit=net, credit=0, note="إقفال إيراد")
-        total_income += net
-
-    # المصاريف: عادةً رصيدها مدين => لإقفالها نعمل (دائن المصروف) بقيمة صافيها
-    total_exp = 0.0
-    for acc in exp_accounts:
-        d, c = sums_for(acc)
-        net = d - c  # صافي المصروف
-        if net <= 0:
-            continue
-        JournalLine.objects.create(entry=je, account=acc, debit=0, credit=net, note="إقفال مصروف")
-        total_exp += net
+    if request.method != "POST":
+        try:
+            plan = preview_closing(period)
+        except ValidationError as e:
+            messages.error(request, "; ".join(e.messages))
+            return back
+        return render(request, "accounting_app/close_period_preview.html", {"period": period, **plan})
 
-    net_profit = total_income - total_exp
+    try:
+        je, plan = close_period_entry(period, user=request.user)
+    except ValidationError as e:
+        messages.error(request, "; ".join(e.messages))
+        return back
 
-    # إقفال على retained earnings:
-    # لو ربح => retained دائن
-    # لو خسارة => retained مدين
-    if net_profit > 0:
-        JournalLine.objects.create(
-            entry=je, account=cfg.retained_earnings_account,
-            debit=0, credit=net_profit, note="ترحيل صافي الربح للأرباح المرحلة"
-        )
-    elif net_profit < 0:
-        JournalLine.objects.create(
-            entry=je, account=cfg.retained_earnings_account,
-            debit=abs(net_profit), credit=0, note="ترحيل صافي الخسارة للأرباح المرحلة"
-        )
+    if je:
+        messages.success(request, f"تم إنشاء قيد الإقفال ({je.serial_number}) بـ {len(plan['lines'])} سطر وإقفال الفترة {period.name}.")
     else:
-        # صفر: نلغي القيد إذا ما فيه سطور
-        if not je.lines.exists():
-            je.delete()
-
-    period.is_closed = True
-    period.save(update_fields=["is_closed"])
-
-    messages.success(request, f"تم إنشاء قيد الإقفال وإقفال الفترة {period.name}.")
-    return redirect(f"/account/opening-balances/?period={period.id}")
+        messages.success(request, f"لا توجد أرصدة إيرادات/مصاريف. تم إقفال الفترة {period.name}.")
+    return back
 
 from django.contrib.admin.views.decorators import staff_member_required
 
@@ -1929,7 +1788,7 @@ def payment_print(request, pk):
 def payment_pdf(request, pk):
     payment = get_object_or_404(Payment.objects.select_related("customer", "supplier", "journal_entry"), pk=pk)
 
-    font_name = _register_arabic_font()
+    font_name = arabic_font()
 
     company_name = "شركة المحبة للصناعات الغذائية"
     company_address = "الأردن - عمّان - أبو علندا"
@@ -1947,10 +1806,9 @@ def payment_pdf(request, pk):
         leftMargin=24, rightMargin=24, topMargin=70, bottomMargin=45
     )
 
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle("title_ar", parent=styles["Title"], fontName=font_name, fontSize=18, alignment=1)
-    small_style = ParagraphStyle("small_ar", parent=styles["Normal"], fontName=font_name, fontSize=11, alignment=1)
-    cell_style = ParagraphStyle("cell_ar", parent=styles["Normal"], fontName=font_name, fontSize=11, alignment=1)
+    title_style = arabic_style(18, alignment=1, parent="Title")
+    small_style = arabic_style(11, alignment=1)
+    cell_style = arabic_style(11, alignment=1)
 
     def header_footer(canvas, doc_):
         canvas.saveState()
@@ -2058,7 +1916,6 @@ from django.http import FileResponse
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 import io
 from datetime import datetime
 
@@ -2239,7 +2096,7 @@ from openpyxl.styles import Alignment, Font
 from openpyxl.utils import get_column_letter
 
 # -------- Helpers for Excel --------
-def _export_payments_excel(filename, title, qs):
+def _export_payments_excel(filename, title, qs, type_label="", filters_line=""):
     wb = openpyxl.Workbook()
     ws = wb.active
     ws.title = "Report"
@@ -2251,7 +2108,7 @@ def _export_payments_excel(filename, title, qs):
     ws.merge_cells("A1:G1")
 
     now_str = timezone.localtime(timezone.now()).strftime("%Y-%m-%d %H:%M")
-    ws["A2"] = f"تاريخ الطباعة: {now_str}"
+    ws["A2"] = f"تاريخ الطباعة: {now_str}" + (f" | {filters_line}" if filters_line else "")
     ws.merge_cells("A2:G2")
 
     headers = ["#", "رقم السند", "التاريخ", "الطرف", "حساب الصندوق/البنك", "المبلغ", "القيد"]
@@ -2303,39 +2160,20 @@ def _export_payments_excel(filename, title, qs):
 
 
 # -------- PDF report (your function) --------
-def _export_payments_pdf(filename, title, qs):
+def _export_payments_pdf(filename, title, qs, type_label="", filters_line=""):
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=24, leftMargin=24, topMargin=36, bottomMargin=24)
-    font_name = _register_arabic_font()
-
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        "title",
-        parent=styles["Title"],
-        fontName=font_name,
-        fontSize=16,
-        alignment=1,
-        spaceAfter=12,
-    )
-    small = ParagraphStyle(
-        "small",
-        parent=styles["Normal"],
-        fontName=font_name,
-        fontSize=10,
-        alignment=2,
-    )
-    cell = ParagraphStyle(
-        "cell",
-        parent=styles["Normal"],
-        fontName=font_name,
-        fontSize=10,
-        alignment=1,
-        leading=12,
-    )
+    font_name = arabic_font()
+
+    title_style = arabic_style(16, alignment=1, parent="Title", space_after=12)
+    small = arabic_style(10, alignment=2)
+    cell = arabic_style(10, alignment=1, leading=12)
 
     elements = []
     elements.append(Paragraph(_ar(title), title_style))
     elements.append(Paragraph(_ar(f"تاريخ الطباعة: {timezone.localtime(timezone.now()).strftime('%Y-%m-%d %H:%M')}"), small))
+    if filters_line:
+        elements.append(Paragraph(_ar(filters_line), small))
     elements.append(Spacer(1, 10))
 
     data = [[Paragraph(_ar(h), cell) for h in ["#", "رقم السند", "التاريخ", "الطرف", "حساب الصندوق/البنك", "المبلغ", "القيد"]]]
@@ -2657,7 +2495,6 @@ from django.utils import timezone
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 
 from accounting_app.models import Customer, Supplier, SalesInvoice, PurchaseInvoice, Payment
 
@@ -2695,14 +2532,14 @@ def _period_text(date_from: str, date_to: str) -> str:
 def _statement_pdf(
     title: str,
     party_name: str,
-    rows: list[dict],
+    rows,
     filename: str,
     date_from: str = "",
     date_to: str = ""
 ) -> HttpResponse:
     """
-    rows: list of dict keys:
-      date, doc, ref, note, debit, credit, balance
+    rows: iterable of dict keys (generator من _statement_display_rows):
+      n, date, doc, ref, note, debit, credit, balance
     Uses the same Arabic font + Paragraph/Table approach used in other PDFs.
     """
     buffer = io.BytesIO()
@@ -2714,58 +2551,14 @@ def _statement_pdf(
         topMargin=30,
         bottomMargin=24
     )
-    font_name = _register_arabic_font()
+    font_name = arabic_font()
 
-    styles = getSampleStyleSheet()
-
-    company_style = ParagraphStyle(
-        "company",
-        parent=styles["Title"],
-        fontName=font_name,
-        fontSize=14,
-        alignment=1,
-        spaceAfter=2,
-    )
-    addr_style = ParagraphStyle(
-        "addr",
-        parent=styles["Normal"],
-        fontName=font_name,
-        fontSize=10,
-        alignment=1,
-        spaceAfter=8,
-    )
-    title_style = ParagraphStyle(
-        "title",
-        parent=styles["Title"],
-        fontName=font_name,
-        fontSize=16,
-        alignment=1,
-        spaceAfter=8,
-    )
-    small = ParagraphStyle(
-        "small",
-        parent=styles["Normal"],
-        fontName=font_name,
-        fontSize=10,
-        alignment=2,  # يمين
-        leading=12,
-    )
-    cell = ParagraphStyle(
-        "cell",
-        parent=styles["Normal"],
-        fontName=font_name,
-        fontSize=10,
-        alignment=1,  # وسط
-        leading=12,
-    )
-    cell_right = ParagraphStyle(
-        "cell_right",
-        parent=styles["Normal"],
-        fontName=font_name,
-        fontSize=10,
-        alignment=2,  # يمين
-        leading=12,
-    )
+    company_style = arabic_style(14, alignment=1, parent="Title", space_after=2)
+    addr_style = arabic_style(10, alignment=1, space_after=8)
+    title_style = arabic_style(16, alignment=1, parent="Title", space_after=8)
+    small = arabic_style(10, alignment=2, leading=12)  # يمين
+    cell = arabic_style(10, alignment=1, leading=12)  # وسط
+    cell_right = arabic_style(10, alignment=2, leading=12)  # يمين
 
     # ✅ عدليهم حسب شركتك
     company_name = "شركة المحبة للصناعات الغذائية"
@@ -2791,7 +2584,7 @@ def _statement_pdf(
     total_debit = Decimal("0")
     total_credit = Decimal("0")
 
-    for i, r in enumerate(rows, start=1):
+    for r in rows:
         debit = r.get("debit", "") or ""
         credit = r.get("credit", "") or ""
 
@@ -2808,7 +2601,7 @@ def _statement_pdf(
             pass
 
         data.append([
-            Paragraph(_ar(i), cell),
+            Paragraph(_ar(r.get("n", "")), cell),
             Paragraph(_ar(r.get("date", "")), cell),
             Paragraph(_ar(r.get("doc", "")), cell),
             Paragraph(_ar(r.get("ref", "")), cell_right),
@@ -2863,10 +2656,37 @@ def _statement_pdf(
     return FileResponse(buffer, as_attachment=True, filename=filename)
 
 
-@login_required
-def customer_statement(request, customer_id: int):
-    customer = get_object_or_404(Customer, pk=customer_id)
-
+def _statement_display_rows(opening, rows):
+    """سطر الرصيد الافتتاحي + سطور المحرك بصيغة العرض (PDF/HTML)."""
+    if opening is not None:
+        yield {
+            "n": "",
+            "date": "",
+            "doc": "",
+            "ref": "",
+            "note": "رصيد افتتاحي (قبل الفترة)",
+            "debit": "",
+            "credit": "",
+            "balance": _format_balance_with_label(opening),
+        }
+    for r in rows:
+        yield {
+            "n": r["n"],
+            "date": str(r["date"]),
+            "doc": r["doc"],
+            "ref": r["ref"],
+            "note": r["note"],
+            "debit": _money(r["debit"]) if r["debit"] else "",
+            "credit": _money(r["credit"]) if r["credit"] else "",
+            "balance": _format_balance_with_label(r["balance"]),
+        }
+
+
+def _party_statement(request, kind, party, title, template, filename):
+    """
+    كشف حساب عميل/مورد من محرك statements.py:
+    HTML بصفحات (cursor)، PDF بكل السطور (lazy صفحة ورا صفحة).
+    """
     date_from_obj = _parse_date(request.GET.get("date_from"))
     date_to_obj = _parse_date(request.GET.get("date_to"))
     fmt = request.GET.get("format")
@@ -2875,204 +2695,105 @@ def customer_statement(request, customer_id: int):
     date_from_str = request.GET.get("date_from", "") or ""
     date_to_str = request.GET.get("date_to", "") or ""
 
-    inv_qs = SalesInvoice.objects.filter(customer=customer).order_by("date", "id")
-
-    # Receipts for this customer (قبض)
-    pay_qs = (
-        Payment.objects.filter(customer=customer, payment_type=Payment.RECEIPT).order_by("date", "id")
-        if hasattr(Payment, "RECEIPT")
-        else Payment.objects.filter(customer=customer).order_by("date", "id")
-    )
-
-    # Opening balance (before date_from)
-    opening = 0.0
-    if date_from_obj:
-        for inv in inv_qs.filter(date__lt=date_from_obj):
-            opening += float(getattr(inv, "total", 0) or 0)
-        for p in pay_qs.filter(date__lt=date_from_obj):
-            opening -= float(getattr(p, "amount", 0) or 0)
-
-    inv_range = inv_qs
-    pay_range = pay_qs
-    if date_from_obj:
-        inv_range = inv_range.filter(date__gte=date_from_obj)
-        pay_range = pay_range.filter(date__gte=date_from_obj)
-    if date_to_obj:
-        inv_range = inv_range.filter(date__lte=date_to_obj)
-        pay_range = pay_range.filter(date__lte=date_to_obj)
-
-    movements = []
-
-    for inv in inv_range:
-        movements.append({
-            "date": getattr(inv, "date", None),
-            "doc": "فاتورة بيع",
-            "ref": f"SI-{inv.id}",
-            "note": getattr(inv, "note", "") or getattr(inv, "description", "") or "",
-            "debit": float(getattr(inv, "total", 0) or 0),  # يزيد ذمم العميل (مدين)
-            "credit": 0.0,
-        })
-
-    for p in pay_range:
-        movements.append({
-            "date": getattr(p, "date", None),
-            "doc": "سند قبض",
-            "ref": f"RC-{p.id}",
-            "note": getattr(p, "note", "") or "",
-            "debit": 0.0,
-            "credit": float(getattr(p, "amount", 0) or 0),  # يقلل ذمم العميل
-        })
-
-    movements.sort(key=lambda x: (x["date"] or date.min, x["ref"]))
-
-    rows = []
-    balance = Decimal(str(opening))
-
-    # opening row
-    rows.append({
-        "date": "",
-        "doc": "",
-        "ref": "",
-        "note": "رصيد افتتاحي (قبل الفترة)",
-        "debit": "",
-        "credit": "",
-        "balance": _format_balance_with_label(balance),
-    })
-
-    for m in movements:
-        balance = balance + Decimal(str(m["debit"])) - Decimal(str(m["credit"]))
-        rows.append({
-            "date": str(m["date"] or ""),
-            "doc": m["doc"],
-            "ref": m["ref"],
-            "note": m["note"],
-            "debit": _money(m["debit"]) if m["debit"] else "",
-            "credit": _money(m["credit"]) if m["credit"] else "",
-            "balance": _format_balance_with_label(balance),
-        })
-
     if fmt == "pdf":
+        opening, rows = iter_statement(kind, party.pk, date_from_obj, date_to_obj)
         return _statement_pdf(
-            title="كشف حساب عميل",
-            party_name=getattr(customer, "name", str(customer)),
-            rows=rows,
-            filename=f"customer_statement_{customer_id}.pdf",
+            title=title,
+            party_name=getattr(party, "name", str(party)),
+            rows=_statement_display_rows(opening, rows),
+            filename=filename,
             date_from=date_from_str,
             date_to=date_to_str,
         )
 
-    return render(request, "accounting_app/customer_statement.html", {
-        "customer": customer,
-        "rows": rows,
+    page_size = statement_page_size(request.GET.get("size"))
+    page = statement_page(
+        kind, party.pk, date_from_obj, date_to_obj,
+        cursor=request.GET.get("cursor"),
+        page_size=page_size,
+    )
+    # الرصيد الافتتاحي بأول صفحة بس
+    opening = page["opening_balance"] if page["page"] == 1 else None
+
+    # روابط الصفحات بنفس الفلاتر
+    params = {"size": page_size}
+    if date_from_str:
+        params["date_from"] = date_from_str
+    if date_to_str:
+        params["date_to"] = date_to_str
+    first_page_query = urlencode(params)
+    next_page_query = urlencode(dict(params, cursor=page["next_cursor"])) if page["next_cursor"] else ""
+
+    return render(request, template, {
+        kind: party,
+        "rows": list(_statement_display_rows(opening, page["rows"])),
         "date_from": date_from_str,
         "date_to": date_to_str,
+        "page_number": page["page"],
+        "first_page_query": first_page_query,
+        "next_page_query": next_page_query,
     })
 
 
 @login_required
-def supplier_statement(request, supplier_id: int):
-    supplier = get_object_or_404(Supplier, pk=supplier_id)
-
-    date_from_obj = _parse_date(request.GET.get("date_from"))
-    date_to_obj = _parse_date(request.GET.get("date_to"))
-    fmt = request.GET.get("format")
-
-    date_from_str = request.GET.get("date_from", "") or ""
-    date_to_str = request.GET.get("date_to", "") or ""
-
-    inv_qs = PurchaseInvoice.objects.filter(supplier=supplier).order_by("date", "id")
-
-    # Disbursements for this supplier (صرف)
-    pay_qs = (
-        Payment.objects.filter(supplier=supplier, payment_type=Payment.DISBURSE).order_by("date", "id")
-        if hasattr(Payment, "DISBURSE")
-        else Payment.objects.filter(supplier=supplier).order_by("date", "id")
+def customer_statement(request, customer_id: int):
+    customer = get_object_or_404(Customer, pk=customer_id)
+    return _party_statement(
+        request, "customer", customer,
+        title="كشف حساب عميل",
+        template="accounting_app/customer_statement.html",
+        filename=f"customer_statement_{customer_id}.pdf",
     )
 
-    # "مستحق للمورد" يزيد مع فاتورة شراء (credit) ويقل مع سند صرف (debit)
-    opening = 0.0
-    if date_from_obj:
-        for inv in inv_qs.filter(date__lt=date_from_obj):
-            opening += float(getattr(inv, "total", 0) or 0)
-        for p in pay_qs.filter(date__lt=date_from_obj):
-            opening -= float(getattr(p, "amount", 0) or 0)
-
-    inv_range = inv_qs
-    pay_range = pay_qs
-    if date_from_obj:
-        inv_range = inv_range.filter(date__gte=date_from_obj)
-        pay_range = pay_range.filter(date__gte=date_from_obj)
-    if date_to_obj:
-        inv_range = inv_range.filter(date__lte=date_to_obj)
-        pay_range = pay_range.filter(date__lte=date_to_obj)
-
-    movements = []
-
-    for inv in inv_range:
-        movements.append({
-            "date": getattr(inv, "date", None),
-            "doc": "فاتورة شراء",
-            "ref": f"PI-{inv.id}",
-            "note": getattr(inv, "note", "") or getattr(inv, "description", "") or "",
-            "debit": 0.0,
-            "credit": float(getattr(inv, "total", 0) or 0),  # يزيد مستحق المورد
-        })
-
-    for p in pay_range:
-        movements.append({
-            "date": getattr(p, "date", None),
-            "doc": "سند صرف",
-            "ref": f"PV-{p.id}",
-            "note": getattr(p, "note", "") or "",
-            "debit": float(getattr(p, "amount", 0) or 0),   # يقلل مستحق المورد
-            "credit": 0.0,
-        })
-
-    movements.sort(key=lambda x: (x["date"] or date.min, x["ref"]))
-
-    rows = []
-    balance = Decimal(str(opening))
-
-    rows.append({
-        "date": "",
-        "doc": "",
-        "ref": "",
-        "note": "رصيد افتتاحي (قبل الفترة)",
-        "debit": "",
-        "credit": "",
-        "balance": _format_balance_with_label(balance),
-    })
 
-    for m in movements:
-        # ✅ نفس منطقك: يزيد مع credit ويقل مع debit
-        balance = balance + Decimal(str(m["credit"])) - Decimal(str(m["debit"]))
-        rows.append({
-            "date": str(m["date"] or ""),
-            "doc": m["doc"],
-            "ref": m["ref"],
-            "note": m["note"],
-            "debit": _money(m["debit"]) if m["debit"] else "",
-            "credit": _money(m["credit"]) if m["credit"] else "",
-            "balance": _format_balance_with_label(balance),
-        })
+@login_required
+def supplier_statement(request, supplier_id: int):
+    supplier = get_object_or_404(Supplier, pk=supplier_id)
+    # "مستحق للمورد" يزيد مع فاتورة شراء (credit) ويقل مع سند صرف (debit)
+    return _party_statement(
+        request, "supplier", supplier,
+        title="كشف حساب مورد",
+        template="accounting_app/supplier_statement.html",
+        filename=f"supplier_statement_{supplier_id}.pdf",
+    )
 
-    if fmt == "pdf":
-        return _statement_pdf(
-            title="كشف حساب مورد",
-            party_name=getattr(supplier, "name", str(supplier)),
-            rows=rows,
-            filename=f"supplier_statement_{supplier_id}.pdf",
-            date_from=date_from_str,
-            date_to=date_to_str,
+@login_required
+def aging_report(request):
+    """
+    أعمار الذمم لكل العملاء أو كل الموردين (aging.py: استعلام واحد + FIFO).
+    ?kind=customer|supplier&as_of=YYYY-MM-DD&sort=total|name|over120&format=excel
+    """
+    kind = request.GET.get("kind") if request.GET.get("kind") in AGING else "customer"
+    as_of = _parse_date(request.GET.get("as_of")) or timezone.localdate()
+    sort = request.GET.get("sort") if request.GET.get("sort") in AGING_SORTS else "total"
+
+    if request.GET.get("format") == "excel":
+        return FileResponse(
+            aging_xlsx_tempfile(kind, as_of, sort),
+            as_attachment=True,
+            filename=f"aging_{kind}_{as_of.isoformat()}.xlsx",
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
 
-    return render(request, "accounting_app/supplier_statement.html", {
-        "supplier": supplier,
-        "rows": rows,
-        "date_from": date_from_str,
-        "date_to": date_to_str,
+    rows = sort_aging_rows(aging_rows(kind, as_of), sort)
+    totals = aging_totals(rows)
+    page_obj = Paginator(rows, 100).get_page(request.GET.get("page"))
+
+    params = {"kind": kind, "as_of": as_of.isoformat(), "sort": sort}
+    return render(request, "accounting_app/aging_report.html", {
+        "kind": kind,
+        "kinds": [(k, spec["label"]) for k, spec in AGING.items()],
+        "title": AGING[kind]["label"],
+        "as_of": as_of.isoformat(),
+        "sort": sort,
+        "bucket_labels": [label for _, label in AGING_BUCKETS],
+        "page_obj": page_obj,
+        "totals": totals,
+        "party_count": len(rows),
+        "base_query": urlencode(params),
     })
 
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
 from django.shortcuts import render, redirect
@@ -3092,3 +2813,68 @@ def period_create(request):
 
     return render(request, "accounting_app/period_form.html", {"form": form})
 
+
+
+# ===============================
+# تصدير بالخلفية (طابور ExportJob)
+# ===============================
+from .export_jobs import EXPORT_KINDS, enqueue, kind_label, visible_jobs
+from .models import ExportJob
+
+
+@login_required
+@require_POST
+def export_job_create(request):
+    """يحط التصدير بالطابور (أو يرجع نفس الـ job إذا نفس الطلب موجود) ويروح لصفحة المتابعة."""
+    kind = request.POST.get("kind", "")
+    try:
+        job, created = enqueue(kind, request.POST, user=request.user)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect("account:export_jobs")
+
+    if created:
+        messages.success(request, f"تمت إضافة «{kind_label(kind)}» لطابور التصدير (#{job.id}).")
+    else:
+        messages.info(request, f"نفس التصدير موجود بالطابور (#{job.id}).")
+    return redirect("account:export_jobs")
+
+
+@login_required
+def export_jobs(request):
+    jobs = list(visible_jobs(request.user).select_related("created_by").defer("content")[:50])
+    for job in jobs:
+        job.label = kind_label(job.kind)
+    return render(request, "accounting_app/export_jobs.html", {
+        "jobs": jobs,
+        "kinds": EXPORT_KINDS,
+        "any_active": any(job.is_active for job in jobs),
+    })
+
+
+@login_required
+def export_job_status(request, pk):
+    job = get_object_or_404(visible_jobs(request.user).defer("content"), pk=pk)
+    return JsonResponse({
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "status_label": job.get_status_display(),
+        "size": job.size,
+        "error": job.error,
+        "download_url": reverse("account:export_job_download", args=[job.id]) if job.status == ExportJob.DONE else "",
+    })
+
+
+@login_required
+def export_job_download(request, pk):
+    job = get_object_or_404(visible_jobs(request.user), pk=pk)
+    if job.status != ExportJob.DONE or job.content is None:
+        messages.error(request, "الملف لسا مش جاهز.")
+        return redirect("account:export_jobs")
+    return FileResponse(
+        io.BytesIO(bytes(job.content)),
+        as_attachment=True,
+        filename=job.filename or f"export_{job.id}",
+        content_type=job.content_type or "application/octet-stream",
+    )
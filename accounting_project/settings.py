@@ -113,6 +113,36 @@ else:
         }
     }
 
+# ✅ أرقام المستندات من SEQUENCE أصلي على PostgreSQL بدل قفل صف DocumentSequence
+# (بيشتغل بس مع DATABASE_URL = postgres، ممكن تصير فجوات بالأرقام مع rollback)
+DOCUMENT_SEQUENCE_NATIVE = os.getenv("DOCUMENT_SEQUENCE_NATIVE", "False").lower() in ("1", "true", "yes", "on")
+
+# ✅ عدد الـ processes لرسم PDF كل المستودعات بطابور التصدير (1 = بدون توازي)
+# حد صغير ثابت (وما بيزيد عن عدد الـ CPU)، وطلبات الويب المباشرة دايماً بدون توازي
+WAREHOUSE_PDF_WORKERS = int(os.getenv("WAREHOUSE_PDF_WORKERS", "2"))
+
+# ✅ كاش نتائج التقارير (الميزان/الدخل/الميزانية) بمفتاح نسخة الدفتر (LedgerVersion)
+# الافتراضي بالذاكرة لكل process، و REPORT_CACHE_DIR = كاش ملفات مشترك بين الـ processes
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "")
+REPORT_CACHE_TIMEOUT = int(os.getenv("REPORT_CACHE_TIMEOUT", "3600"))
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "chips-accounting",
+    },
+    "reports": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": REPORT_CACHE_DIR,
+        "TIMEOUT": REPORT_CACHE_TIMEOUT,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    } if REPORT_CACHE_DIR else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "chips-accounting-reports",
+        "TIMEOUT": REPORT_CACHE_TIMEOUT,
+        "OPTIONS": {"MAX_ENTRIES": 500},
+    },
+}
+
 
 
 # Password validation
@@ -1,6 +1,6 @@
 # inventory/admin.py
 from django.contrib import admin
-from .models import Product, Warehouse, WarehouseStock, WarehouseMovement
+from .models import Product, ProductStockSummary, StockLayerConsumption, Warehouse, WarehouseStock, WarehouseMovement
 
 
 @admin.register(Product)
@@ -28,3 +28,30 @@ class WarehouseMovementAdmin(admin.ModelAdmin):
     list_display = ("id", "warehouse", "product", "movement_type", "quantity", "date")
     list_filter = ("warehouse", "movement_type")
     search_fields = ("warehouse__name", "product__name", "notes")
+
+
+@admin.register(ProductStockSummary)
+class ProductStockSummaryAdmin(admin.ModelAdmin):
+    # جدول مشتق من طبقات FIFO: للعرض فقط (يتعدل من الترحيل أو reconcile_stock)
+    list_display = ("product", "qty_on_hand", "total_value", "updated_at")
+    search_fields = ("product__name", "product__sku")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockLayerConsumption)
+class StockLayerConsumptionAdmin(admin.ModelAdmin):
+    # سجل تدقيق FIFO: بينكتب من الترحيل بس
+    list_display = ("movement", "layer", "qty", "unit_cost", "qty_after")
+    list_select_related = ("movement", "layer")
+    search_fields = ("movement__related_invoice", "movement__product__name")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,51 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import warehouse_pdf
+
+
+class Command(BaseCommand):
+    help = 'قياس زمن PDF كل المستودعات: رسم عادي (process واحد) مقابل رسم بالتوازي + دمج'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--warehouses", type=int, default=80, help="عدد المستودعات")
+        parser.add_argument("--skus", type=int, default=10000, help="عدد المنتجات المختلفة")
+        parser.add_argument("--per-sku", type=int, default=2, help="بكم مستودع موجود كل منتج")
+        parser.add_argument("--workers", type=int, default=0, help="عدد الـ processes (0 = WAREHOUSE_PDF_WORKERS)")
+
+    def _data(self, warehouses, skus, per_sku):
+        data = {f"مستودع {w + 1}": [] for w in range(warehouses)}
+        names = list(data)
+        for i in range(skus):
+            for k in range(per_sku):
+                data[names[(i + k * 7) % warehouses]].append({
+                    "product_name": f"منتج تجريبي رقم {i}",
+                    "quantity": (i * 13) % 500,
+                    "code": f"SKU-{i:05d}",
+                })
+        return data
+
+    def _run(self, label, data, workers):
+        started = time.perf_counter()
+        pdf = warehouse_pdf.build_all_warehouses_pdf(data, workers=workers)
+        elapsed = time.perf_counter() - started
+        pages = pdf.count(b"/Type /Page\n") or pdf.count(b"/Type /Page ")
+        self.stdout.write(f"{label}: {elapsed:.2f} s | {len(pdf) / 1024 / 1024:.1f} MB | ~{pages} صفحة")
+        return elapsed
+
+    def handle(self, *args, **options):
+        if options["warehouses"] < 1 or options["skus"] < 1:
+            raise CommandError("--warehouses و --skus لازم يكونوا 1 أو أكثر")
+        if warehouse_pdf.PdfWriter is None:
+            raise CommandError("pypdf مش منزّل (pip install -r requirements.txt)")
+
+        data = self._data(options["warehouses"], options["skus"], max(1, options["per_sku"]))
+        workers = options["workers"] or warehouse_pdf.pdf_workers()
+        rows = sum(len(r) for r in data.values())
+        self.stdout.write(f"مستودعات: {len(data)} | سطور: {rows} | CPU: {os.cpu_count()} | workers: {workers}")
+
+        serial = self._run("process واحد", data, 1)
+        parallel = self._run(f"بالتوازي ({workers})", data, max(2, workers))
+        self.stdout.write(self.style.SUCCESS(f"✅ التسريع: {serial / parallel:.2f}x"))
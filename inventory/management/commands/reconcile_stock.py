@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import ProductStockSummary
+
+QTY_TOLERANCE = Decimal("0.0001")
+VALUE_TOLERANCE = Decimal("0.01")
+
+
+class Command(BaseCommand):
+    help = 'تسوية ملخص المخزون (ProductStockSummary) مع طبقات FIFO وإعادة بنائه عند الحاجة'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="تحقق فقط (بدون إصلاح): يفشل إذا الملخص مش مطابق للطبقات",
+        )
+
+    def _diff(self):
+        """يرجع list بالمنتجات اللي ملخصها مختلف عن الطبقات."""
+        expected = ProductStockSummary.compute_from_layers()
+        current = {
+            s["product_id"]: (s["qty_on_hand"], s["total_value"])
+            for s in ProductStockSummary.objects.values("product_id", "qty_on_hand", "total_value")
+        }
+
+        zero = (Decimal("0"), Decimal("0"))
+        diffs = []
+        for pid in set(expected) | set(current):
+            exp_qty, exp_value = expected.get(pid, zero)
+            cur_qty, cur_value = current.get(pid, zero)
+            if abs(exp_qty - cur_qty) > QTY_TOLERANCE or abs(exp_value - cur_value) > VALUE_TOLERANCE:
+                diffs.append((pid, (exp_qty, exp_value), (cur_qty, cur_value)))
+        return diffs
+
+    def handle(self, *args, **options):
+        diffs = self._diff()
+        if diffs:
+            self.stdout.write(self.style.WARNING(f"عدد المنتجات غير المطابقة للطبقات: {len(diffs)}"))
+            for pid, exp, cur in diffs[:20]:
+                self.stdout.write(f"  product={pid} expected={exp} current={cur}")
+        else:
+            self.stdout.write("ملخص المخزون مطابق للطبقات.")
+
+        if options["check"]:
+            if diffs:
+                raise CommandError("ملخص المخزون غير مطابق. شغّلي reconcile_stock بدون --check.")
+            return
+
+        if not diffs:
+            return
+
+        count = ProductStockSummary.rebuild()
+        if self._diff():
+            raise CommandError("فشل التحقق بعد إعادة البناء.")
+
+        self.stdout.write(self.style.SUCCESS(f"تمت إعادة بناء ملخص {count} منتج بنجاح"))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_alter_product_price_alter_product_quantity_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stocklayer',
+            index=models.Index(condition=models.Q(('qty_remaining__gt', 0)), fields=['product', 'created_at', 'id'], name='stocklayer_open_fifo_idx'),
+        ),
+    ]
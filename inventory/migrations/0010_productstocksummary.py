@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def populate_summaries(apps, schema_editor):
+    """تعبئة أولية من الطبقات المفتوحة (نفس منطق ProductStockSummary.rebuild)."""
+    StockLayer = apps.get_model("inventory", "StockLayer")
+    ProductStockSummary = apps.get_model("inventory", "ProductStockSummary")
+
+    rows = (
+        StockLayer.objects.filter(qty_remaining__gt=0)
+        .values("product_id")
+        .annotate(
+            qty=Sum("qty_remaining"),
+            value=Sum(F("qty_remaining") * F("cost"), output_field=models.DecimalField(max_digits=24, decimal_places=8)),
+        )
+        .order_by()
+    )
+    ProductStockSummary.objects.bulk_create(
+        [ProductStockSummary(product_id=r["product_id"], qty_on_hand=r["qty"], total_value=r["value"]) for r in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_stocklayer_open_fifo_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStockSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty_on_hand', models.DecimalField(decimal_places=4, default=0, max_digits=18, verbose_name='الكمية المتاحة')),
+                ('total_value', models.DecimalField(decimal_places=8, default=0, max_digits=24, verbose_name='قيمة المخزون (FIFO)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_summary', to='inventory.product')),
+            ],
+            options={
+                'verbose_name': 'ملخص مخزون منتج',
+                'verbose_name_plural': 'ملخصات مخزون المنتجات',
+            },
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_productstocksummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLayerConsumption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='الكمية المصروفة')),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='تكلفة الوحدة')),
+                ('qty_after', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='المتبقي بالطبقة بعد الصرف')),
+                ('layer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumptions', to='inventory.stocklayer')),
+                ('movement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumptions', to='inventory.stockmovement')),
+            ],
+            options={
+                'verbose_name': 'صرف من طبقة مخزون',
+                'verbose_name_plural': 'الصرف من طبقات المخزون',
+                'ordering': ['movement', 'id'],
+            },
+        ),
+    ]
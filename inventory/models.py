@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from decimal import Decimal
 from django.contrib.auth.models import User
 
@@ -39,11 +39,104 @@ class StockLayer(models.Model):
         ordering = ['created_at']
         verbose_name = "طبقة مخزون"
         verbose_name_plural = "طبقات المخزون"
+        indexes = [
+            # ✅ FIFO: الطبقات المفتوحة فقط لكل منتج بترتيب الإنشاء (partial index)
+            models.Index(
+                fields=["product", "created_at", "id"],
+                condition=models.Q(qty_remaining__gt=0),
+                name="stocklayer_open_fifo_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Layer {self.id} - {self.product.sku} ({self.qty_remaining})"
 
 
+class ProductStockSummary(models.Model):
+    """
+    ملخص المخزون لكل منتج (الكمية المتاحة + قيمة FIFO)
+    يتحدث بنفس الـ transaction مع _stock_in / _FifoBook،
+    بدل ما نجمع qty_remaining * cost على كل الطبقات.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name="stock_summary")
+    qty_on_hand = models.DecimalField(max_digits=18, decimal_places=4, default=0, verbose_name="الكمية المتاحة")
+    # 8 خانات = كمية (4) × تكلفة (4) بدون تقريب تراكمي
+    total_value = models.DecimalField(max_digits=24, decimal_places=8, default=0, verbose_name="قيمة المخزون (FIFO)")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "ملخص مخزون منتج"
+        verbose_name_plural = "ملخصات مخزون المنتجات"
+
+    def __str__(self):
+        return f"{self.product.name}: {self.qty_on_hand} / {self.total_value}"
+
+    @property
+    def avg_cost(self):
+        if not self.qty_on_hand:
+            return Decimal("0")
+        return self.total_value / self.qty_on_hand
+
+    @classmethod
+    def apply(cls, product_id, qty_delta, value_delta):
+        """
+        يضيف فرق كمية/قيمة على ملخص المنتج (موجب = وارد، سالب = صادر).
+        لازم يتنادى داخل transaction.atomic (نفس transaction تعديل الطبقات).
+        """
+        summary, _ = cls.objects.select_for_update().get_or_create(product_id=product_id)
+        cls.objects.filter(pk=summary.pk).update(
+            qty_on_hand=models.F("qty_on_hand") + qty_delta,
+            total_value=models.F("total_value") + value_delta,
+        )
+
+    @staticmethod
+    def compute_from_layers():
+        """{product_id: (qty, value)} محسوبة من الطبقات المفتوحة (للتسوية/إعادة البناء)"""
+        rows = (
+            StockLayer.objects.filter(qty_remaining__gt=0)
+            .values("product_id")
+            .annotate(
+                qty=models.Sum("qty_remaining"),
+                value=models.Sum(
+                    models.F("qty_remaining") * models.F("cost"),
+                    output_field=models.DecimalField(max_digits=24, decimal_places=8),
+                ),
+            )
+        )
+        return {r["product_id"]: (r["qty"] or Decimal("0"), r["value"] or Decimal("0")) for r in rows}
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls):
+        """
+        إعادة بناء الجدول كامل من الطبقات. ترجع عدد المنتجات اللي إلها طبقات.
+        ✅ بنقفل بنفس ترتيب _FifoBook (الطبقات المفتوحة ثم الملخص حسب product_id)،
+        وبنعدّل الصفوف مكانها بدل delete + insert: ترحيل شغال بنفس الوقت بيستنى
+        القفل وبيضيف فرقه على الرقم الجديد، وما في لحظة الجدول فيها فاضي
+        """
+        zero = Decimal("0")
+        list(
+            StockLayer.objects.select_for_update()
+            .filter(qty_remaining__gt=0)
+            .order_by("product_id", "created_at", "id")
+            .values_list("id", flat=True)
+        )
+        existing = list(cls.objects.select_for_update().order_by("product_id"))
+        data = cls.compute_from_layers()
+
+        for s in existing:
+            s.qty_on_hand, s.total_value = data.get(s.product_id, (zero, zero))
+        cls.objects.bulk_update(existing, ["qty_on_hand", "total_value"], batch_size=1000)
+
+        have = {s.product_id for s in existing}
+        cls.objects.bulk_create([
+            cls(product_id=pid, qty_on_hand=qty, total_value=value)
+            for pid, (qty, value) in data.items()
+            if pid not in have
+        ], batch_size=1000)
+        return len(data)
+
+
 class StockMovement(models.Model):
     MOVEMENT_TYPE = [('in', 'IN'), ('out', 'OUT')]
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='movements')
@@ -62,6 +155,26 @@ class StockMovement(models.Model):
         return f"{self.movement_type} {self.product.sku} {self.qty}"
 
 
+class StockLayerConsumption(models.Model):
+    """
+    سجل التدقيق لصرف FIFO: كل طبقة صرفت منها حركة "out" (كمية + تكلفة الطبقة).
+    بينكتب bulk مع الحركات نفسها (_fifo_consume_lines / الترحيل الجماعي).
+    """
+    movement = models.ForeignKey(StockMovement, on_delete=models.CASCADE, related_name="consumptions")
+    layer = models.ForeignKey(StockLayer, on_delete=models.CASCADE, related_name="consumptions")
+    qty = models.DecimalField(max_digits=14, decimal_places=4, verbose_name="الكمية المصروفة")
+    unit_cost = models.DecimalField(max_digits=14, decimal_places=4, verbose_name="تكلفة الوحدة")
+    qty_after = models.DecimalField(max_digits=14, decimal_places=4, verbose_name="المتبقي بالطبقة بعد الصرف")
+
+    class Meta:
+        ordering = ["movement", "id"]
+        verbose_name = "صرف من طبقة مخزون"
+        verbose_name_plural = "الصرف من طبقات المخزون"
+
+    def __str__(self):
+        return f"movement {self.movement_id} <- layer {self.layer_id} ({self.qty})"
+
+
 class Warehouse(models.Model):
     code = models.CharField("الكود", max_length=20, unique=True)
     name = models.CharField("اسم المستودع", max_length=100)
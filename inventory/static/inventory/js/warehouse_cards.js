@@ -1,3 +1,33 @@
+// أرقام بطاقات المستودعات من ملخص المخزون (warehouses_summary_json)
+// بتتحدث لما نرجع للصفحة (زر رجوع / تبويب) بعد إضافة أو سحب صنف، بدون إعادة تحميل
+function refreshWarehouseCards() {
+    const container = document.getElementById('warehouse-cards');
+    if (!container || !container.dataset.summaryUrl) {
+        return;
+    }
+
+    fetch(container.dataset.summaryUrl, { headers: { 'Accept': 'application/json' } })
+        .then(response => (response.ok ? response.json() : null))
+        .then(data => {
+            if (!data) {
+                return;
+            }
+            data.warehouses.forEach(wh => {
+                const card = container.querySelector(`[data-warehouse-id="${wh.id}"]`);
+                if (!card) {
+                    return;
+                }
+                card.querySelectorAll('[data-field]').forEach(el => {
+                    const value = wh[el.dataset.field];
+                    if (value !== undefined && value !== null) {
+                        el.textContent = value;
+                    }
+                });
+            });
+        })
+        .catch(() => {});
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     // بيع
     document.querySelectorAll('.btn-sell').forEach(btn => {
@@ -23,3 +53,15 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 });
+
+// الصفحة رجعت من الـ cache (زر رجوع) أو التبويب رجع ظاهر => نحدّث الأرقام
+window.addEventListener('pageshow', event => {
+    if (event.persisted) {
+        refreshWarehouseCards();
+    }
+});
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'visible') {
+        refreshWarehouseCards();
+    }
+});
@@ -0,0 +1,113 @@
+# inventory/stock_summary.py
+"""
+ملخص أرصدة المستودعات (مصدر واحد للصفحة الرئيسية والتصديرات)
+
+  - warehouse_summaries(): كل المستودعات مع عدد الأصناف وإجمالي الكمية
+    باستعلام واحد (GROUP BY) بدل aggregate + count لكل مستودع
+  - product_breakdown=True: أرصدة الأصناف لكل مستودع باستعلام ثاني واحد
+  - warehouse_csv_rows(): generator لسطور CSV (StreamingHttpResponse)
+"""
+import csv
+from itertools import groupby
+
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Warehouse, WarehouseStock
+
+BATCH_SIZE = 5000
+
+SUMMARY_HEADERS = ["اسم المستودع", "عدد الأصناف", "إجمالي الكمية"]
+BREAKDOWN_HEADERS = ["اسم المستودع", "رمز المنتج", "اسم المنتج", "الكمية"]
+
+
+def warehouse_queryset():
+    """Warehouse مع item_count/total_qty محسوبين بالداتابيس."""
+    return Warehouse.objects.annotate(
+        item_count=Count("warehousestock"),
+        total_qty=Coalesce(Sum("warehousestock__quantity"), 0),
+    )
+
+
+def stock_lines(warehouse_ids=None):
+    """
+    Generator: (warehouse_id, [{"product_id", "product_name", "code", "quantity"}, ...])
+    مجمّعة حسب المستودع، من استعلام واحد (على دفعات iterator).
+    """
+    qs = WarehouseStock.objects.order_by("warehouse_id", "id")
+    if warehouse_ids is not None:
+        qs = qs.filter(warehouse_id__in=warehouse_ids)
+    rows = qs.values_list("warehouse_id", "product_id", "product__name", "product__sku", "quantity")
+
+    for warehouse_id, lines in groupby(rows.iterator(chunk_size=BATCH_SIZE), key=lambda r: r[0]):
+        yield warehouse_id, [
+            {"product_id": product_id, "product_name": name or "", "code": sku or "", "quantity": qty}
+            for _, product_id, name, sku, qty in lines
+        ]
+
+
+def warehouse_summaries(product_breakdown=False, order_by="id"):
+    """
+    list of dict: id, code, name, location, item_count, total_qty
+    (+ products: أرصدة الأصناف إذا product_breakdown=True).
+    """
+    summaries = list(
+        warehouse_queryset()
+        .order_by(order_by)
+        .values("id", "code", "name", "location", "item_count", "total_qty")
+    )
+    if product_breakdown:
+        by_id = {s["id"]: s for s in summaries}
+        for s in summaries:
+            s["products"] = []
+        for warehouse_id, lines in stock_lines():
+            if warehouse_id in by_id:
+                by_id[warehouse_id]["products"] = lines
+    return summaries
+
+
+def product_totals():
+    """{product_id: إجمالي الكمية بكل المستودعات} باستعلام واحد."""
+    return dict(
+        WarehouseStock.objects.values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("product_id", "total")
+    )
+
+
+def warehouse_rows(product_breakdown=False):
+    """
+    Generator للسطور (بدون العناوين):
+      - ملخص: [اسم المستودع، عدد الأصناف، إجمالي الكمية]
+      - تفصيلي: [اسم المستودع، رمز المنتج، اسم المنتج، الكمية]
+    """
+    if not product_breakdown:
+        for s in warehouse_summaries():
+            yield [s["name"], s["item_count"], s["total_qty"]]
+        return
+
+    names = dict(Warehouse.objects.values_list("id", "name"))
+    for warehouse_id, lines in stock_lines():
+        name = names.get(warehouse_id, "")
+        for line in lines:
+            yield [name, line["code"], line["product_name"], line["quantity"]]
+
+
+class _Echo:
+    """csv.writer بيكتب هون وبيرجع السطر بدل ما يخزّنه."""
+
+    def write(self, value):
+        return value
+
+
+def warehouse_csv_rows(product_breakdown=False):
+    """
+    Generator لسطور CSV جاهزة (أول سطر فيه BOM عشان Excel يقرأ العربي).
+    ⚠️ الـ response لازم يكون charset=utf-8 مش utf-8-sig
+       (utf-8-sig بيحط BOM مع كل جزء بينكتب).
+    """
+    writer = csv.writer(_Echo())
+    headers = BREAKDOWN_HEADERS if product_breakdown else SUMMARY_HEADERS
+    yield "\ufeff" + writer.writerow(headers)
+    for row in warehouse_rows(product_breakdown):
+        yield writer.writerow(row)
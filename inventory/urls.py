@@ -11,6 +11,8 @@ urlpatterns = [
     path('product/<int:pk>/', views.product_detail, name='product_detail'),
     path('product/<int:pk>/edit/', views.product_edit, name='product_edit'),
     path('product/<int:pk>/delete/', views.product_delete, name='product_delete'),
+    path('product/<int:pk>/layers/', views.stock_layers, name='stock_layers'),
+    path('stock/', views.current_stock, name='current_stock'),
 
    # inventory/urls.py
     path("products/export/csv/", views.export_products_csv, name="export_products_csv"),
@@ -22,6 +24,7 @@ urlpatterns = [
     path('export_all_warehouses/', views.export_all_warehouses, name='export_all_warehouses'),
 
     path('warehouses/', views.warehouse_list, name='warehouse_list'),
+    path('warehouses/summary/', views.warehouses_summary_json, name='warehouses_summary_json'),
     path('warehouses/add/', views.warehouse_add, name='warehouse_add'),
     path('warehouses/<int:pk>/edit/', views.warehouse_edit, name='warehouse_edit'),
     path('warehouses/<int:pk>/delete/', views.warehouse_delete, name='warehouse_delete'),
@@ -1,25 +1,14 @@
 # inventory/utils.py
 import io
-import os
 from datetime import datetime
 
-import arabic_reshaper
-from bidi.algorithm import get_display
-
 from django.http import HttpResponse
-from django.conf import settings
 
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-
 
-def _ar(text: str) -> str:
-    """شكل عربي + اتجاه صحيح"""
-    return get_display(arabic_reshaper.reshape(str(text)))
+from accounting_app.pdf_toolkit import ar as _ar, arabic_font, arabic_style
 
 
 class NumberedCanvasMixin:
@@ -65,31 +54,9 @@ def export_warehouse_pdf_build(warehouse, rows):
         bottomMargin=50,
     )
 
-    # --- Register Arabic font ---
-    font_path = os.path.join(settings.BASE_DIR, "inventory", "static", "inventory", "fonts", "Amiri-Regular.ttf")
-    if not os.path.exists(font_path):
-        # fallback to Windows Arial if font not found
-        font_path = r"C:\Windows\Fonts\arial.ttf"
-
-    pdfmetrics.registerFont(TTFont("AR_FONT", font_path))
-
-    styles = getSampleStyleSheet()
-    arabic_style = ParagraphStyle(
-        "arabic",
-        parent=styles["Normal"],
-        fontName="AR_FONT",
-        fontSize=12,
-        leading=16,
-        alignment=1,  # center
-    )
-    arabic_small = ParagraphStyle(
-        "arabic_small",
-        parent=styles["Normal"],
-        fontName="AR_FONT",
-        fontSize=10,
-        leading=14,
-        alignment=1,
-    )
+    font_name = arabic_font()
+    normal_style = arabic_style(12, alignment=1, leading=16)  # center
+    arabic_small = arabic_style(10, alignment=1, leading=14)
 
     company_name = "شركة المحبة للصناعات الغذائية"
     company_address = "الأردن - عمّان - أبو علندا"
@@ -98,16 +65,16 @@ def export_warehouse_pdf_build(warehouse, rows):
     elements = []
 
     # عنوان
-    elements.append(Paragraph(_ar(company_name), arabic_style))
+    elements.append(Paragraph(_ar(company_name), normal_style))
     elements.append(Paragraph(_ar(company_address), arabic_small))
     elements.append(Spacer(1, 10))
-    elements.append(Paragraph(_ar(f"تقرير مخزون المستودع: {warehouse.name}"), arabic_style))
+    elements.append(Paragraph(_ar(f"تقرير مخزون المستودع: {warehouse.name}"), normal_style))
     elements.append(Paragraph(_ar(f"تاريخ ووقت الطباعة: {now}"), arabic_small))
     elements.append(Spacer(1, 14))
 
     # جدول
     headers = [_ar("رقم المادة"), _ar("اسم المادة"), _ar("الكمية")]
-    data = [[Paragraph(h, arabic_style) for h in headers]]
+    data = [[Paragraph(h, normal_style) for h in headers]]
 
     total_qty = 0
     for r in rows:
@@ -121,8 +88,8 @@ def export_warehouse_pdf_build(warehouse, rows):
     # سطر إجمالي
     data.append([
         Paragraph("", arabic_small),
-        Paragraph(_ar("الإجمالي"), arabic_style),
-        Paragraph(_ar(total_qty), arabic_style),
+        Paragraph(_ar("الإجمالي"), normal_style),
+        Paragraph(_ar(total_qty), normal_style),
     ])
 
     table = Table(data, colWidths=[120, 380, 140], repeatRows=1)
@@ -140,7 +107,7 @@ def export_warehouse_pdf_build(warehouse, rows):
     # --- header/footer + page numbers ---
     def draw_header_footer(canvas, doc):
         canvas.saveState()
-        canvas.setFont("AR_FONT", 10)
+        canvas.setFont(font_name, 10)
 
         # Header line
         canvas.setStrokeColor(colors.grey)
@@ -157,7 +124,7 @@ def export_warehouse_pdf_build(warehouse, rows):
     class NumberedCanvas(NumberedCanvasMixin):
         def _draw_page_number(self, page_count):
             self.saveState()
-            self.setFont("AR_FONT", 10)
+            self.setFont(font_name, 10)
             page_text = _ar(f"صفحة {self.getPageNumber()} من {page_count}")
             self.drawString(24, 44, page_text)  # فوق خط الفوتر
             self.restoreState()
@@ -222,163 +189,21 @@ from django.http import HttpResponse
 
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4, landscape
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 
-import arabic_reshaper
-from bidi.algorithm import get_display
 
-
-def _ar(txt: str) -> str:
-    """Render Arabic correctly for ReportLab."""
-    if txt is None:
-        txt = ""
-    reshaped = arabic_reshaper.reshape(str(txt))
-    return get_display(reshaped)
-
-
-def export_all_warehouses_pdf(warehouses_data: dict):
+def export_all_warehouses_pdf(warehouses_data: dict, workers=None):
     """
     warehouses_data format:
     {
       "Warehouse Name": [{"product_name": "...", "quantity": 10, "code": "..."}, ...],
       ...
     }
+    ✅ الرسم بالتوازي (processes) + دمج بترقيم متصل: inventory/warehouse_pdf.py
+    workers=None => WAREHOUSE_PDF_WORKERS، و 1 => بدون توازي
     """
-    buffer = io.BytesIO()
-
-    # --- Register Arabic font (prefer Amiri) ---
-    font_path = os.path.join(settings.BASE_DIR, "inventory", "static", "inventory", "fonts", "Amiri-Regular.ttf")
-    if not os.path.exists(font_path):
-        font_path = r"C:\Windows\Fonts\arial.ttf"
-
-    pdfmetrics.registerFont(TTFont("AR_FONT", font_path))
-
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=landscape(A4),
-        leftMargin=24,
-        rightMargin=24,
-        topMargin=60,
-        bottomMargin=50,
-        title="All Warehouses Report"
-    )
-
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        "title_ar",
-        parent=styles["Normal"],
-        fontName="AR_FONT",
-        fontSize=16,
-        leading=20,
-        alignment=1,
-    )
-    normal_center = ParagraphStyle(
-        "normal_center_ar",
-        parent=styles["Normal"],
-        fontName="AR_FONT",
-        fontSize=11,
-        leading=15,
-        alignment=1,
-    )
-    normal_right = ParagraphStyle(
-        "normal_right_ar",
-        parent=styles["Normal"],
-        fontName="AR_FONT",
-        fontSize=11,
-        leading=15,
-        alignment=2,  # right
-    )
-
-    company_name = "شركة المحبة للصناعات الغذائية"
-    company_address = "الأردن - عمّان - أبو علندا"
-    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    elements = []
-
-    # محتوى التقرير: لكل مستودع جدول
-    for w_name, rows in (warehouses_data or {}).items():
-
-        elements.append(Paragraph(_ar(company_name), title_style))
-        elements.append(Paragraph(_ar(company_address), normal_center))
-        elements.append(Spacer(1, 8))
-
-        elements.append(Paragraph(_ar(f"تقرير مخزون المستودع: {w_name}"), title_style))
-        elements.append(Paragraph(_ar(f"تاريخ ووقت الطباعة: {now_str}"), normal_center))
-        elements.append(Spacer(1, 14))
+    from .warehouse_pdf import build_all_warehouses_pdf
 
-        headers = [_ar("رمز المنتج"), _ar("اسم المنتج"), _ar("الكمية")]
-        data = [[Paragraph(h, normal_center) for h in headers]]
-
-        total_qty = 0
-        for r in rows:
-            qty = r.get("quantity", 0) or 0
-            try:
-                qty_int = int(qty)
-            except Exception:
-                qty_int = 0
-            total_qty += qty_int
-
-            data.append([
-                Paragraph(_ar(r.get("code", "")), normal_center),
-                Paragraph(_ar(r.get("product_name", "")), normal_right),
-                Paragraph(_ar(str(qty)), normal_center),
-            ])
-
-        data.append([
-            Paragraph("", normal_center),
-            Paragraph(_ar("الإجمالي"), normal_center),
-            Paragraph(_ar(str(total_qty)), normal_center),
-        ])
-
-        table = Table(data, colWidths=[140, 420, 140], repeatRows=1)
-        table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#2f3b46")),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-            ("BACKGROUND", (0, 1), (-1, -2), colors.whitesmoke),
-            ("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#e9ecef")),
-        ]))
-        elements.append(table)
-        elements.append(Spacer(1, 16))
-
-        # صفحة جديدة بين المستودعات
-        from reportlab.platypus import PageBreak
-        elements.append(PageBreak())
-
-    # Header/Footer + Page X of Y
-    def draw_header_footer(canvas, doc):
-        canvas.saveState()
-        canvas.setFont("AR_FONT", 10)
-
-        # خطوط
-        canvas.setStrokeColor(colors.grey)
-        canvas.line(doc.leftMargin, doc.pagesize[1] - 45, doc.pagesize[0] - doc.rightMargin, doc.pagesize[1] - 45)
-        canvas.line(doc.leftMargin, 38, doc.pagesize[0] - doc.rightMargin, 38)
-
-        # فوتر ثابت
-        canvas.drawCentredString(doc.pagesize[0] / 2, 22, _ar(f"{company_name} - {company_address}"))
-        canvas.restoreState()
-
-    class NumberedCanvas(NumberedCanvasMixin):
-        def _draw_page_number(self, page_count):
-            self.saveState()
-            self.setFont("AR_FONT", 10)
-            page_text = _ar(f"صفحة {self.getPageNumber()} من {page_count}")
-            self.drawString(24, 44, page_text)
-            self.restoreState()
-
-    doc.build(
-        elements,
-        onFirstPage=draw_header_footer,
-        onLaterPages=draw_header_footer,
-        canvasmaker=NumberedCanvas,
-    )
-
-    pdf = buffer.getvalue()
-    buffer.close()
+    pdf = build_all_warehouses_pdf(warehouses_data, workers=workers)
 
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = 'attachment; filename="all_warehouses.pdf"'
@@ -1,65 +1,19 @@
 # inventory/utils_exports.py
-import os
 import io
 import csv
 
-from django.conf import settings
 from django.http import HttpResponse
 from django.utils import timezone
 
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-
-import arabic_reshaper
-from bidi.algorithm import get_display
 
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 
-
-# =========================
-# ARABIC / PDF HELPERS
-# =========================
-
-def _ar(txt) -> str:
-    return get_display(arabic_reshaper.reshape(str(txt or "")))
-
-
-def _register_arabic_font() -> str:
-    """
-    Register Arabic font for ReportLab.
-    Tries multiple known paths (including your old working one),
-    and falls back to Windows Arial if missing.
-    Returns the font name key to use in PDF ("AR_FONT").
-    """
-    # أهم مسار عندك كان شغّال (static/inventory/fonts)
-    candidates = [
-        os.path.join(settings.BASE_DIR, "inventory", "static", "inventory", "fonts", "Amiri-Regular.ttf"),
-        os.path.join(settings.BASE_DIR, "inventory", "static", "fonts", "Amiri-Regular.ttf"),
-        os.path.join(settings.BASE_DIR, "static", "fonts", "Amiri-Regular.ttf"),
-    ]
-
-    font_path = None
-    for p in candidates:
-        if os.path.exists(p):
-            font_path = p
-            break
-
-    # fallback: Windows Arial (عشان ما يوقف التصدير)
-    if not font_path:
-        font_path = r"C:\Windows\Fonts\arial.ttf"
-
-    # Register once
-    try:
-        pdfmetrics.getFont("AR_FONT")
-    except Exception:
-        pdfmetrics.registerFont(TTFont("AR_FONT", font_path))
-
-    return "AR_FONT"
+# ✅ الخط + _ar + الـ styles من الأدوات المشتركة (accounting_app/pdf_toolkit.py)
+from accounting_app.pdf_toolkit import ar as _ar, arabic_font, arabic_style
 
 
 # =========================
@@ -70,7 +24,7 @@ def build_products_pdf(rows, title="تقرير المنتجات"):
     """
     rows: list of dicts: {name, sku, unit, type_label}
     """
-    font_name = _register_arabic_font()
+    font_name = arabic_font()
 
     company_name = "شركة المحبة للصناعات الغذائية"
     company_address = "الأردن - عمّان - أبو علندا"
@@ -83,31 +37,9 @@ def build_products_pdf(rows, title="تقرير المنتجات"):
         leftMargin=24, rightMargin=24, topMargin=70, bottomMargin=45
     )
 
-    styles = getSampleStyleSheet()
-    arabic_style = ParagraphStyle(
-        "arabic",
-        parent=styles["Normal"],
-        fontName=font_name,
-        fontSize=12,
-        leading=16,
-        alignment=1  # center
-    )
-    arabic_title = ParagraphStyle(
-        "arabic_title",
-        parent=styles["Title"],
-        fontName=font_name,
-        fontSize=18,
-        leading=22,
-        alignment=1
-    )
-    arabic_small = ParagraphStyle(
-        "arabic_small",
-        parent=styles["Normal"],
-        fontName=font_name,
-        fontSize=10,
-        leading=14,
-        alignment=1
-    )
+    normal_style = arabic_style(12, alignment=1, leading=16)  # center
+    arabic_title = arabic_style(18, alignment=1, leading=22, parent="Title")
+    arabic_small = arabic_style(10, alignment=1, leading=14)
 
     def header_footer(canvas, doc_):
         canvas.saveState()
@@ -126,15 +58,15 @@ def build_products_pdf(rows, title="تقرير المنتجات"):
     elements.append(Spacer(1, 12))
 
     headers = ["#", "اسم المنتج", "النوع", "SKU", "الوحدة"]
-    data = [[Paragraph(_ar(h), arabic_style) for h in headers]]
+    data = [[Paragraph(_ar(h), normal_style) for h in headers]]
 
     for i, r in enumerate(rows, start=1):
         data.append([
-            Paragraph(_ar(i), arabic_style),
-            Paragraph(_ar(r.get("name")), arabic_style),
-            Paragraph(_ar(r.get("type_label")), arabic_style),
-            Paragraph(_ar(r.get("sku")), arabic_style),
-            Paragraph(_ar(r.get("unit")), arabic_style),
+            Paragraph(_ar(i), normal_style),
+            Paragraph(_ar(r.get("name")), normal_style),
+            Paragraph(_ar(r.get("type_label")), normal_style),
+            Paragraph(_ar(r.get("sku")), normal_style),
+            Paragraph(_ar(r.get("unit")), normal_style),
         ])
 
     # ✅ ===== تعديل تنسيق الجدول (عرض أقل + توسيط + نسب أعمدة) =====
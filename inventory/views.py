@@ -1,10 +1,12 @@
 # inventory/views.py
+from decimal import Decimal
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.db import transaction
 from django.db.models import Sum
-from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.paginator import Paginator
 from .utils import build_warehouse_excel
@@ -13,20 +15,27 @@ from .utils import build_warehouse_excel
 
 from openpyxl import Workbook
 
-from .models import Product, Warehouse, WarehouseStock, WarehouseMovement, StockMovement
+from .models import Product, Warehouse, WarehouseStock, WarehouseMovement, StockMovement, StockLayer
 from .forms import ProductForm, WarehouseForm, WarehouseStockForm, WarehouseMovementForm
 from .utils import export_warehouse_pdf_build, export_all_warehouses_pdf
+from .stock_summary import (
+    BREAKDOWN_HEADERS, SUMMARY_HEADERS,
+    product_totals, warehouse_csv_rows, warehouse_queryset, warehouse_rows, warehouse_summaries,
+)
 
 
 # =========================
 # Home
 # =========================
 def inventory_home(request):
-    warehouses = Warehouse.objects.all()
-    total_stock = WarehouseStock.objects.aggregate(total=Sum('quantity'))['total'] or 0
+    # ✅ بطاقات المستودعات/المنتجات من ملخص واحد (stock_summary) بدل استعلام لكل بطاقة
+    warehouses = warehouse_queryset().select_related("manager").order_by("name")
+    totals = product_totals()
     return render(request, 'inventory/home.html', {
         'warehouses': warehouses,
-        'total_stock': total_stock,
+        'products': Product.objects.order_by("name"),
+        'totals': totals,
+        'total_stock': sum(totals.values()),
     })
 
 
@@ -78,6 +87,43 @@ def product_delete(request, pk):
     return render(request, 'inventory/product_confirm_delete.html', {'product': product})
 
 
+@login_required
+def current_stock(request):
+    """المخزون الحالي لكل منتج من الملخص (O(منتجات) بدل جمع كل الطبقات)."""
+    products = Product.objects.select_related("stock_summary").order_by("name")
+
+    rows = []
+    total_value = Decimal("0")
+    for product in products:
+        summary = getattr(product, "stock_summary", None)
+        qty = summary.qty_on_hand if summary else Decimal("0")
+        value = summary.total_value if summary else Decimal("0")
+        total_value += value
+        rows.append({
+            "product": product,
+            "qty": qty,
+            "value": value,
+            "avg_cost": summary.avg_cost if summary else Decimal("0"),
+        })
+
+    return render(request, 'inventory/current_stock.html', {
+        'rows': rows,
+        'total_value': total_value,
+    })
+
+
+@login_required
+def stock_layers(request, pk):
+    """الطبقات المفتوحة لمنتج + ملخصه."""
+    product = get_object_or_404(Product.objects.select_related("stock_summary"), pk=pk)
+    layers = StockLayer.objects.filter(product=product, qty_remaining__gt=0).order_by("created_at", "id")
+    return render(request, 'inventory/stock_layers.html', {
+        'product': product,
+        'summary': getattr(product, "stock_summary", None),
+        'layers': layers,
+    })
+
+
 def stock_movements(request, pk):
     """stock_movements.html"""
     product = get_object_or_404(Product, pk=pk)
@@ -161,9 +207,7 @@ def warehouse_list(request):
     page_number = request.GET.get('page', 1)
 
     # ✅ العلاقة عندك: warehousestock
-    qs = Warehouse.objects.annotate(
-        total_qty=Coalesce(Sum('warehousestock__quantity'), 0)
-    )
+    qs = warehouse_queryset()
 
     # فرز مسموح
     if sort == 'name':
@@ -463,32 +507,35 @@ def export_warehouse_pdf(request, pk):
 # =========================
 # Export ALL warehouses
 # =========================
-def export_all_warehouses_csv(request):
-    warehouses = Warehouse.objects.all()
-    response = HttpResponse(content_type='text/csv; charset=utf-8-sig')
-    response['Content-Disposition'] = 'attachment; filename="warehouses_all.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['اسم المستودع', 'عدد الأصناف', 'إجمالي الكمية'])
+def _product_breakdown(request):
+    # ?products=1 : سطر لكل صنف بكل مستودع بدل سطر لكل مستودع
+    return request.GET.get("products") in ("1", "true", "yes", "on")
+
 
-    for w in warehouses:
-        stock = WarehouseStock.objects.filter(warehouse=w)
-        total_qty = stock.aggregate(total=Sum('quantity'))['total'] or 0
-        writer.writerow([w.name, stock.count(), total_qty])
+def warehouses_summary_json(request):
+    # مصدر بيانات بطاقات المستودعات (warehouse_cards.js): ?products=1 مع أرصدة الأصناف
+    summaries = warehouse_summaries(product_breakdown=_product_breakdown(request))
+    return JsonResponse({"warehouses": summaries}, json_dumps_params={"ensure_ascii": False})
 
+
+def export_all_warehouses_csv(request):
+    # ✅ ملخص بالداتابيس (GROUP BY) + السطور بتنبعث generator (ما بنبني الملف بالذاكرة)
+    response = StreamingHttpResponse(
+        warehouse_csv_rows(product_breakdown=_product_breakdown(request)),
+        content_type='text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'attachment; filename="warehouses_all.csv"'
     return response
 
 
 def export_all_warehouses_excel(request):
-    warehouses = Warehouse.objects.all()
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "المستودعات"
-    ws.append(['اسم المستودع', 'عدد الأصناف', 'إجمالي الكمية'])
+    breakdown = _product_breakdown(request)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("المستودعات")
+    ws.append(BREAKDOWN_HEADERS if breakdown else SUMMARY_HEADERS)
 
-    for w in warehouses:
-        stock = WarehouseStock.objects.filter(warehouse=w)
-        total_qty = stock.aggregate(total=Sum('quantity'))['total'] or 0
-        ws.append([w.name, stock.count(), total_qty])
+    for row in warehouse_rows(product_breakdown=breakdown):
+        ws.append(row)
 
     response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
     response['Content-Disposition'] = 'attachment; filename="warehouses_all.xlsx"'
@@ -497,21 +544,13 @@ def export_all_warehouses_excel(request):
 
 
 from .utils import export_all_warehouses_pdf as export_all_warehouses_pdf_util
+from .warehouse_pdf import stock_by_warehouse
 
 def export_all_warehouses_pdf(request):
-    warehouses = Warehouse.objects.all()
-    data = {}
-
-    for w in warehouses:
-        stock = WarehouseStock.objects.filter(warehouse=w).select_related("product")
-        rows = [{
-            'product_name': getattr(s.product, "name", ""),
-            'quantity': s.quantity,
-            'code': getattr(s.product, 'code', getattr(s.product, 'sku', '')),
-        } for s in stock]
-        data[w.name] = rows
-
-    return export_all_warehouses_pdf_util(data)
+    # ✅ استعلام واحد لأرصدة كل المستودعات (بدل استعلام لكل مستودع)
+    # ⚠️ الرسم بالتوازي (processes) بس من طابور التصدير، والطلب المباشر بنفس الـ process
+    workers = None if getattr(request, "export_job", None) is not None else 1
+    return export_all_warehouses_pdf_util(stock_by_warehouse(), workers=workers)
 
 
 # للتوافق إذا عندك رابط قديم بالـ template:
@@ -586,39 +625,25 @@ def export_warehouse_movements_pdf(request, pk):
     warehouse = get_object_or_404(Warehouse, pk=pk)
     movements = WarehouseMovement.objects.filter(warehouse=warehouse).select_related("product").order_by("-date")
 
-    # إذا عندك في utils دوال عربي جاهزة، بنستفيد منها
-    # هون رح نعمل PDF سريع بنفس reportlab لكن بدون تعقيد
-    import os, io
+    # ✅ الخط والعربي من الأدوات المشتركة
+    import io
     from datetime import datetime
-    from django.conf import settings
-    
+
     from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
     from reportlab.lib.pagesizes import A4, landscape
     from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
-    import arabic_reshaper
-    from bidi.algorithm import get_display
-
-    def ar(t):
-        return get_display(arabic_reshaper.reshape(str(t or "")))
+    from accounting_app.pdf_toolkit import ar, arabic_font, arabic_style
 
     company_name = "شركة المحبة للصناعات الغذائية"
     company_address = "الأردن - عمّان - أبو علندا"
     now_str = datetime.now().strftime("%Y-%m-%d %H:%M")
 
-    # خط عربي
-    font_path = os.path.join(settings.BASE_DIR, "inventory", "static", "inventory", "fonts", "Amiri-Regular.ttf")
-    if not os.path.exists(font_path):
-        font_path = r"C:\Windows\Fonts\arial.ttf"
-    pdfmetrics.registerFont(TTFont("AR", font_path))
+    font_name = arabic_font()
 
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), leftMargin=24, rightMargin=24, topMargin=70, bottomMargin=50)
-    styles = getSampleStyleSheet()
-    s_title = ParagraphStyle("t", parent=styles["Title"], fontName="AR", fontSize=18, alignment=1)
-    s_norm = ParagraphStyle("n", parent=styles["Normal"], fontName="AR", fontSize=11, alignment=1)
+    s_title = arabic_style(18, alignment=1, parent="Title")
+    s_norm = arabic_style(11, alignment=1)
 
     elements = []
     elements.append(Paragraph(ar(company_name), s_title))
@@ -640,7 +665,7 @@ def export_warehouse_movements_pdf(request, pk):
 
     table = Table(data, colWidths=[120, 200, 120, 90, 260], repeatRows=1)
     table.setStyle(TableStyle([
-        ("FONTNAME", (0,0), (-1,-1), "AR"),
+        ("FONTNAME", (0,0), (-1,-1), font_name),
         ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#2f3b46")),
         ("TEXTCOLOR", (0,0), (-1,0), colors.white),
         ("ALIGN", (0,0), (-1,-1), "CENTER"),
@@ -0,0 +1,265 @@
+# inventory/warehouse_pdf.py
+"""
+PDF مخزون كل المستودعات (بالتوازي)
+
+  - stock_by_warehouse(): أرصدة كل المستودعات من stock_summary.stock_lines
+    (استعلام واحد مجمّع حسب المستودع بدل استعلام WarehouseStock لكل مستودع)
+  - كل مجموعة مستودعات بتنرسم PDF لحالها بـ process منفصل (ProcessPoolExecutor)
+    لأن ReportLab (wrap/split/draw) شغل CPU وما بيستفيد من threads (GIL)
+  - الأجزاء بتندمج بملف واحد (pypdf) وبعدين بنطبع "صفحة X من Y" فوق كل صفحة،
+    فالترقيم متصل على كل الملف
+
+⚠️ pypdf اختياري: إذا مش منزّل أو WAREHOUSE_PDF_WORKERS = 1 بيرجع للرسم العادي
+   (doc.build واحد بنفس الـ process).
+⚠️ التوازي بس بطابور التصدير (run_export_worker): طلب الويب المباشر بيرسم بنفس
+   الـ process، عشان كل request ما يشغّل interpreters جديدة فوق workers الـ gunicorn.
+"""
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas as pdf_canvas
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from accounting_app.pdf_toolkit import ar as _ar, arabic_font, arabic_style, register_fonts
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # pragma: no cover
+    PdfReader = PdfWriter = None
+
+COMPANY_NAME = "شركة المحبة للصناعات الغذائية"
+COMPANY_ADDRESS = "الأردن - عمّان - أبو علندا"
+
+PAGE_SIZE = landscape(A4)
+MARGIN = 24
+
+# أقل من هيك ما بيستاهل نشغّل processes (تكلفة التشغيل أكبر من الرسم)
+MIN_PARALLEL_ROWS = 2000
+# كم جزء لكل worker (توزيع أحسن لما المستودعات مش بنفس الحجم)
+CHUNKS_PER_WORKER = 3
+
+
+def stock_by_warehouse():
+    """
+    {اسم المستودع: [{"product_name", "quantity", "code"}, ...]} بنفس ترتيب Warehouse.objects.all()
+    (مستودع بدون أرصدة بيطلع بجدول فاضي زي قبل).
+    """
+    from .models import Warehouse
+    from .stock_summary import stock_lines
+
+    warehouses = list(Warehouse.objects.values_list("id", "name"))
+    grouped = dict(stock_lines())
+
+    data = {}
+    for warehouse_id, name in warehouses:
+        data.setdefault(name, []).extend(grouped.get(warehouse_id, []))
+    return data
+
+
+def _warehouse_elements(w_name, rows, now_str):
+    title_style = arabic_style(16, alignment=1, leading=20)
+    normal_center = arabic_style(11, alignment=1, leading=15)
+    normal_right = arabic_style(11, alignment=2, leading=15)
+
+    elements = [
+        Paragraph(_ar(COMPANY_NAME), title_style),
+        Paragraph(_ar(COMPANY_ADDRESS), normal_center),
+        Spacer(1, 8),
+        Paragraph(_ar(f"تقرير مخزون المستودع: {w_name}"), title_style),
+        Paragraph(_ar(f"تاريخ ووقت الطباعة: {now_str}"), normal_center),
+        Spacer(1, 14),
+    ]
+
+    headers = [_ar("رمز المنتج"), _ar("اسم المنتج"), _ar("الكمية")]
+    data = [[Paragraph(h, normal_center) for h in headers]]
+
+    total_qty = 0
+    for r in rows:
+        qty = r.get("quantity", 0) or 0
+        try:
+            qty_int = int(qty)
+        except Exception:
+            qty_int = 0
+        total_qty += qty_int
+
+        data.append([
+            Paragraph(_ar(r.get("code", "")), normal_center),
+            Paragraph(_ar(r.get("product_name", "")), normal_right),
+            Paragraph(_ar(str(qty)), normal_center),
+        ])
+
+    data.append([
+        Paragraph("", normal_center),
+        Paragraph(_ar("الإجمالي"), normal_center),
+        Paragraph(_ar(str(total_qty)), normal_center),
+    ])
+
+    table = Table(data, colWidths=[140, 420, 140], repeatRows=1)
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#2f3b46")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("BACKGROUND", (0, 1), (-1, -2), colors.whitesmoke),
+        ("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#e9ecef")),
+    ]))
+    elements.append(table)
+    elements.append(Spacer(1, 16))
+    return elements
+
+
+def _draw_page_number(canvas, page, page_count):
+    canvas.saveState()
+    canvas.setFont(arabic_font(), 10)
+    canvas.drawString(MARGIN, 44, _ar(f"صفحة {page} من {page_count}"))
+    canvas.restoreState()
+
+
+class _PageCountCanvas(pdf_canvas.Canvas):
+    """بيأجّل الصفحات لآخر الملف عشان يعرف العدد الكلي (رسم بـ process واحد)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._saved_page_states = []
+
+    def showPage(self):
+        self._saved_page_states.append(dict(self.__dict__))
+        self._startPage()
+
+    def save(self):
+        page_count = len(self._saved_page_states)
+        for state in self._saved_page_states:
+            self.__dict__.update(state)
+            _draw_page_number(self, self.getPageNumber(), page_count)
+            super().showPage()
+        super().save()
+
+
+def render_section(warehouses, now_str, numbered=False):
+    """
+    يرسم مجموعة مستودعات [(name, rows), ...] ويرجع (pdf bytes, عدد الصفحات).
+    top-level عشان ينبعث لـ process ثاني (pickle).
+    """
+    font_name = arabic_font()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=PAGE_SIZE,
+        leftMargin=MARGIN,
+        rightMargin=MARGIN,
+        topMargin=60,
+        bottomMargin=50,
+        title="All Warehouses Report",
+    )
+
+    elements = []
+    for w_name, rows in warehouses:
+        if elements:
+            # صفحة جديدة بين المستودعات
+            elements.append(PageBreak())
+        elements.extend(_warehouse_elements(w_name, rows, now_str))
+
+    footer = _ar(f"{COMPANY_NAME} - {COMPANY_ADDRESS}")
+
+    def draw_header_footer(canvas, doc_):
+        canvas.saveState()
+        canvas.setFont(font_name, 10)
+
+        # خطوط
+        canvas.setStrokeColor(colors.grey)
+        canvas.line(doc_.leftMargin, doc_.pagesize[1] - 45, doc_.pagesize[0] - doc_.rightMargin, doc_.pagesize[1] - 45)
+        canvas.line(doc_.leftMargin, 38, doc_.pagesize[0] - doc_.rightMargin, 38)
+
+        # فوتر ثابت
+        canvas.drawCentredString(doc_.pagesize[0] / 2, 22, footer)
+        canvas.restoreState()
+
+    doc.build(
+        elements,
+        onFirstPage=draw_header_footer,
+        onLaterPages=draw_header_footer,
+        canvasmaker=_PageCountCanvas if numbered else pdf_canvas.Canvas,
+    )
+    return buffer.getvalue(), doc.page
+
+
+def _page_numbers_pdf(page_count):
+    """PDF شفاف فيه بس "صفحة X من Y" لكل صفحة (بينطبع فوق الملف المدموج)."""
+    buffer = io.BytesIO()
+    c = pdf_canvas.Canvas(buffer, pagesize=PAGE_SIZE)
+    for page in range(1, page_count + 1):
+        _draw_page_number(c, page, page_count)
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def merge_sections(parts):
+    """parts: [pdf bytes, ...] بالترتيب -> PDF واحد بترقيم صفحات متصل."""
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(PdfReader(io.BytesIO(part)))
+
+    numbers = PdfReader(io.BytesIO(_page_numbers_pdf(len(writer.pages))))
+    for page, overlay in zip(writer.pages, numbers.pages):
+        page.merge_page(overlay)
+        # merge_page بيفك ضغط محتوى الصفحة
+        page.compress_content_streams()
+
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def _chunks(items, count):
+    """يقسم المستودعات لـ count مجموعات متتالية (بالترتيب) متقاربة بعدد السطور."""
+    total = sum(len(rows) for _, rows in items) or 1
+    target = total / count
+    chunk, size = [], 0
+    for item in items:
+        chunk.append(item)
+        size += len(item[1])
+        if size >= target:
+            yield chunk
+            chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+
+def pdf_workers():
+    """WAREHOUSE_PDF_WORKERS (افتراضي 2) بحد أقصى عدد الـ CPU."""
+    workers = int(getattr(settings, "WAREHOUSE_PDF_WORKERS", 2) or 1)
+    return max(1, min(workers, os.cpu_count() or 1))
+
+
+def build_all_warehouses_pdf(warehouses_data, workers=None):
+    """
+    warehouses_data: {اسم المستودع: [{"product_name", "quantity", "code"}, ...]}
+    يرجع bytes الـ PDF.
+    """
+    items = list((warehouses_data or {}).items())
+    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    workers = pdf_workers() if workers is None else max(1, workers)
+
+    total_rows = sum(len(rows) for _, rows in items)
+    if workers == 1 or PdfWriter is None or len(items) < 2 or total_rows < MIN_PARALLEL_ROWS:
+        pdf, _ = render_section(items, now_str, numbered=True)
+        return pdf
+
+    chunks = list(_chunks(items, workers * CHUNKS_PER_WORKER))
+    # spawn: ما بنعمل fork لـ process فيه threads/اتصالات DB (طابور التصدير)
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(chunks)),
+        mp_context=get_context("spawn"),
+        initializer=register_fonts,
+    ) as pool:
+        parts = [pdf for pdf, _ in pool.map(render_section, chunks, [now_str] * len(chunks))]
+
+    return merge_sections(parts)